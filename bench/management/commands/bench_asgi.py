@@ -0,0 +1,209 @@
+import http.client
+import importlib.util
+import json
+import multiprocessing
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from bench.runner import benchmark_database, summarize
+from bench.seeding import make_categories, make_events, make_tickets
+
+HOST = '127.0.0.1'
+
+# name: (server module, catalogue views)
+SERVERS = {
+    'wsgi': ('gunicorn', 'sync'),
+    'asgi': ('uvicorn', 'async'),
+    'asgi-sync': ('uvicorn', 'sync'),
+}
+
+SETTINGS_MODULE = '''from iticket.settings import *
+
+DEBUG = False
+DATABASES = {{'default': {{**DATABASES['default'], 'NAME': {name!r}}}}}
+REST_FRAMEWORK = {{**REST_FRAMEWORK, 'DEFAULT_THROTTLE_CLASSES': []}}
+'''
+NO_CACHE = '''CACHES = {**CACHES, 'catalogue': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+'''
+
+
+def _fire(job):
+    """Load generator process: ``threads`` keep-alive connections working through ``requests``"""
+    port, requests, threads = job
+    pending = list(reversed(requests))
+    results = []
+    lock = threading.Lock()
+
+    def run():
+        conn = http.client.HTTPConnection(HOST, port, timeout=30)
+        while True:
+            with lock:
+                if not pending:
+                    break
+                route, path = pending.pop()
+            started = time.perf_counter()
+            try:
+                conn.request('GET', path, headers={'Accept': 'application/json'})
+                response = conn.getresponse()
+                response.read()
+                code = response.status
+                if response.will_close:
+                    conn.close()
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                code = None
+            with lock:
+                results.append((route, code, time.perf_counter() - started))
+        conn.close()
+
+    pool = [threading.Thread(target=run) for _ in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    return results
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare requests/sec and latency of the catalogue read endpoints under '
+        'uvicorn (native async views) and the WSGI deployment (gunicorn, sync views)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--events', type=int, default=500)
+        parser.add_argument('--tickets', type=int, default=4, help='ticket tiers per event')
+        parser.add_argument('--requests', type=int, default=5000, help='measured requests per server')
+        parser.add_argument('--concurrency', type=int, default=64, help='open client connections')
+        parser.add_argument('--clients', type=int, default=4, help='load generator processes')
+        parser.add_argument('--workers', type=int, default=2, help='server worker processes')
+        parser.add_argument('--threads', type=int, default=8, help='threads per gunicorn worker')
+        parser.add_argument(
+            '--servers', default='wsgi,asgi',
+            help=f"comma-separated, from: {', '.join(SERVERS)} (asgi-sync is uvicorn with the sync views)",
+        )
+        parser.add_argument('--no-cache', action='store_true', help='bypass the catalogue cache')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--json', action='store_true', help='print results as JSON')
+
+    def handle(self, *args, **options):
+        servers = [name.strip() for name in options['servers'].split(',') if name.strip()]
+        unknown = [name for name in servers if name not in SERVERS]
+        if unknown:
+            raise CommandError(f"Unknown server: {', '.join(unknown)}")
+        for name in servers:
+            module = SERVERS[name][0]
+            if importlib.util.find_spec(module) is None:
+                raise CommandError(f'{name} needs {module}: pip install {module}')
+
+        results = {}
+        with benchmark_database(), tempfile.TemporaryDirectory(prefix='iticket-asgi-') as tmpdir:
+            requests = self.seed(options)
+            with open(os.path.join(tmpdir, 'bench_asgi_settings.py'), 'w') as f:
+                f.write(SETTINGS_MODULE.format(name=str(connection.settings_dict['NAME'])))
+                if options['no_cache']:
+                    f.write(NO_CACHE)
+            connection.close()
+            for name in servers:
+                results[name] = self.measure(name, tmpdir, requests, options)
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        self.stdout.write(f"{'server':<10} {'route':<14} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'errors':>6}")
+        for name, routes in results.items():
+            for route, stats in routes.items():
+                self.stdout.write(
+                    f"{name:<10} {route:<14} {stats['rps']:>8.0f} {stats['p50_ms']:>8.1f} "
+                    f"{stats['p99_ms']:>8.1f} {stats['errors']:>6}"
+                )
+
+    def seed(self, options):
+        rng = random.Random(options['seed'])
+        organizer = User.objects.create_user('organizer', password='x', is_staff=True)
+        events = make_events(options['events'], organizer, make_categories(10))
+        make_tickets(events, options['tickets'], quantity=lambda event, j: 100 * (j % 3))
+
+        pages = max(1, min(5, len(events) // 10))
+        routes = [
+            ('event-list', 30, lambda: f'/api/events/?page={rng.randint(1, pages)}'),
+            ('event-detail', 40, lambda: f'/api/events/{rng.choice(events)}/'),
+            ('event-tickets', 25, lambda: f'/api/events/{rng.choice(events)}/tickets/'),
+            ('categories', 5, lambda: '/api/events/categories/'),
+        ]
+        picks = rng.choices(routes, weights=[weight for _, weight, _ in routes], k=options['requests'])
+        return [(route, path()) for route, _, path in picks]
+
+    def start(self, name, port, tmpdir, options):
+        module, views = SERVERS[name]
+        if module == 'uvicorn':
+            command = [
+                sys.executable, '-m', 'uvicorn', 'iticket.asgi:application', '--host', HOST, '--port', str(port),
+                '--workers', str(options['workers']), '--no-access-log', '--log-level', 'warning',
+            ]
+        else:
+            command = [
+                sys.executable, '-m', 'gunicorn', 'iticket.wsgi:application', '--bind', f'{HOST}:{port}',
+                '--workers', str(options['workers']), '--threads', str(options['threads']),
+                '--worker-class', 'gthread', '--log-level', 'warning',
+            ]
+        env = {
+            **os.environ,
+            'PYTHONPATH': os.pathsep.join([tmpdir, str(settings.BASE_DIR), os.environ.get('PYTHONPATH', '')]),
+            'DJANGO_SETTINGS_MODULE': 'bench_asgi_settings',
+            'CATALOGUE_ASYNC_VIEWS': str(views == 'async'),
+        }
+        process = subprocess.Popen(command, cwd=settings.BASE_DIR, env=env)
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise CommandError(f'{name} server exited with {process.returncode}')
+            try:
+                socket.create_connection((HOST, port), timeout=1).close()
+                return process
+            except OSError:
+                time.sleep(0.2)
+        process.terminate()
+        raise CommandError(f'{name} server did not start')
+
+    def measure(self, name, tmpdir, requests, options):
+        with socket.socket() as sock:
+            sock.bind((HOST, 0))
+            port = sock.getsockname()[1]
+        process = self.start(name, port, tmpdir, options)
+        try:
+            clients = max(1, min(options['clients'], options['concurrency']))
+            threads = max(1, options['concurrency'] // clients)
+            with multiprocessing.get_context('fork').Pool(clients) as pool:
+                # Warm-up: every distinct path once, so each run starts from the same cache state
+                pool.map(_fire, [(port, sorted(set(requests))[i::clients], threads) for i in range(clients)])
+                started = time.perf_counter()
+                samples = pool.map(_fire, [(port, requests[i::clients], threads) for i in range(clients)])
+                elapsed = time.perf_counter() - started
+        finally:
+            process.terminate()
+            process.wait()
+
+        samples = [sample for batch in samples for sample in batch]
+        routes = {'all': samples}
+        for sample in samples:
+            routes.setdefault(sample[0], []).append(sample)
+        return {
+            route: {
+                **summarize([seconds for _, _, seconds in rows]),
+                'rps': len(rows) / elapsed,
+                'errors': sum(1 for _, code, _ in rows if code != 200),
+            }
+            for route, rows in routes.items()
+        }
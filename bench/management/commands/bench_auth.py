@@ -0,0 +1,114 @@
+import json
+import random
+import statistics
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+from bench.runner import benchmark_database, summarize
+from bench.traffic import Scale, seed
+from events.views import EventViewSet, OrderViewSet
+from users.authentication import StatelessJWTAuthentication
+from users.serializers import TokenObtainPairSerializer
+
+AUTHENTICATORS = {'database': JWTAuthentication, 'stateless': StatelessJWTAuthentication}
+VIEWSETS = (EventViewSet, OrderViewSet)
+
+
+class Command(BaseCommand):
+    help = (
+        'Cost of JWT authentication: simplejwt loading the user per request against '
+        'StatelessJWTAuthentication, end to end on authenticated reads and on its own'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--requests', type=int, default=300, help='requests per route and authenticator')
+        parser.add_argument('--repeat', type=int, default=5000, help='authenticate() calls per authenticator')
+        parser.add_argument('--json', action='store_true', help='print results as JSON')
+
+    def handle(self, *args, **options):
+        saved = {viewset: (viewset.authentication_classes, viewset.throttle_classes) for viewset in VIEWSETS}
+        try:
+            with benchmark_database():
+                rng = random.Random(24)
+                data = seed(Scale(users=options['users'], events=100, orders=options['users'] * 2), rng)
+                tokens = [
+                    f'Bearer {TokenObtainPairSerializer.get_token(user).access_token}'
+                    for user in User.objects.filter(username__in=data.users)
+                ]
+                results = {
+                    'routes': self.routes(tokens, rng, options),
+                    'authenticate': self.authenticate(tokens, options),
+                }
+        finally:
+            for viewset, (authentication, throttles) in saved.items():
+                viewset.authentication_classes, viewset.throttle_classes = authentication, throttles
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        self.stdout.write(f"{'route':<12} {'auth':<10} {'queries':>8} {'mean':>9} {'p95':>9}")
+        for route, by_auth in results['routes'].items():
+            for name, result in by_auth.items():
+                self.stdout.write(
+                    f"{route:<12} {name:<10} {result['queries']:>8.2f} "
+                    f"{result['mean_ms']:>7.3f}ms {result['p95_ms']:>7.3f}ms"
+                )
+        self.stdout.write('')
+        for name, result in results['authenticate'].items():
+            self.stdout.write(f"authenticate() {name:<10} {result['us']:>8.1f}us {result['queries']:>6.2f} queries")
+
+    def routes(self, tokens, rng, options):
+        paths = {'event-list': reverse('event-list'), 'order-list': reverse('order-list')}
+        results = {}
+        for route, path in paths.items():
+            results[route] = {}
+            for name, authenticator in AUTHENTICATORS.items():
+                for viewset in VIEWSETS:
+                    viewset.authentication_classes, viewset.throttle_classes = [authenticator], []
+                client = APIClient()
+                client.get(path, HTTP_AUTHORIZATION=tokens[0])
+                samples, queries = [], 0
+                for _ in range(options['requests']):
+                    token = rng.choice(tokens)
+                    with CaptureQueriesContext(connection) as captured:
+                        started = time.perf_counter()
+                        response = client.get(path, HTTP_AUTHORIZATION=token)
+                        samples.append(time.perf_counter() - started)
+                    assert response.status_code == 200, response.status_code
+                    queries += len(captured)
+                results[route][name] = {**summarize(samples), 'queries': queries / options['requests']}
+        return results
+
+    def authenticate(self, tokens, options):
+        factory = APIRequestFactory()
+        requests = [factory.get('/', HTTP_AUTHORIZATION=token) for token in tokens]
+        results = {}
+        for name, authenticator in AUTHENTICATORS.items():
+            authenticator = authenticator()
+            timings, queries = [], []
+
+            def count(execute, *args):
+                queries.append(None)
+                return execute(*args)
+
+            # Counted by a wrapper: the query log of CaptureQueriesContext keeps only the last 9000
+            with connection.execute_wrapper(count):
+                for _ in range(5):
+                    started = time.perf_counter()
+                    for i in range(options['repeat']):
+                        user, _ = authenticator.authenticate(requests[i % len(requests)])
+                        user.is_staff
+                    timings.append((time.perf_counter() - started) / options['repeat'])
+            results[name] = {
+                'us': statistics.median(timings) * 1e6,
+                'queries': len(queries) / (5 * options['repeat']),
+            }
+        return results
@@ -0,0 +1,86 @@
+import json
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from bench.runner import benchmark_database
+from bench.seeding import make_event, make_users
+from events.models import Event, Order, OrderItem
+from events.views import OrderViewSet
+
+
+class Command(BaseCommand):
+    help = 'Benchmark order throughput: looping the single-order endpoints vs the bulk endpoints'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=1000)
+        parser.add_argument('--batch-size', type=int, default=500, help='orders per bulk call')
+        parser.add_argument('--tickets', type=int, default=50)
+        parser.add_argument('--lines', type=int, default=3, help='max lines per order')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--json', action='store_true', help='print results as JSON')
+
+    def handle(self, *args, **options):
+        # Measure the endpoints, not the per-user throttle
+        throttle_classes, OrderViewSet.throttle_classes = OrderViewSet.throttle_classes, []
+        try:
+            with benchmark_database():
+                user = make_users(1)[0]
+                client = APIClient()
+                client.force_authenticate(user)
+                results = {
+                    'single': self.run(client, user, options, self.single),
+                    'bulk': self.run(client, user, options, self.bulk),
+                }
+        finally:
+            OrderViewSet.throttle_classes = throttle_classes
+
+        results['speedup'] = results['bulk']['orders_per_sec'] / results['single']['orders_per_sec']
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        for mode in ('single', 'bulk'):
+            result = results[mode]
+            self.stdout.write(
+                f"{mode:>6}: {result['orders_per_sec']:9.1f} orders/s (create + confirm, "
+                f"{result['orders']} orders in {result['seconds']:.2f}s)"
+            )
+        self.stdout.write(f"speedup: {results['speedup']:.1f}x")
+
+    def setup_data(self, user, options):
+        OrderItem.objects.all().delete()
+        Order.objects.all().delete()
+        Event.objects.all().delete()
+        return make_event(user, 'Partner allocation', options['tickets'], price='30.00', quantity=1_000_000)[1]
+
+    def run(self, client, user, options, mode):
+        ticket_ids = self.setup_data(user, options)
+        rng = random.Random(options['seed'])
+        orders = [
+            [
+                {'ticket_id': ticket_id, 'quantity': rng.randint(1, 4)}
+                for ticket_id in rng.sample(ticket_ids, rng.randint(1, options['lines']))
+            ]
+            for _ in range(options['orders'])
+        ]
+        started = time.perf_counter()
+        mode(client, orders, options)
+        seconds = time.perf_counter() - started
+        confirmed = Order.objects.filter(status='completed').count()
+        assert confirmed == len(orders), f"{confirmed} of {len(orders)} orders confirmed"
+        return {'orders': len(orders), 'seconds': seconds, 'orders_per_sec': len(orders) / seconds}
+
+    def single(self, client, orders, options):
+        for items in orders:
+            order_id = client.post(reverse('order-list'), items, format='json').data['id']
+            client.post(reverse('order-confirm', args=[order_id]))
+
+    def bulk(self, client, orders, options):
+        size = options['batch_size']
+        for start in range(0, len(orders), size):
+            response = client.post(reverse('order-bulk'), {'orders': orders[start:start + size]}, format='json')
+            order_ids = [result['order_id'] for result in response.data['results']]
+            client.post(reverse('order-bulk-confirm'), {'order_ids': order_ids}, format='json')
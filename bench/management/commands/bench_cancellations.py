@@ -0,0 +1,88 @@
+import json
+
+from django.core.management.base import BaseCommand
+from django.db.models import Sum
+
+from bench.runner import benchmark_database, run_concurrently, summarize
+from bench.seeding import make_event, make_orders, make_users
+from events.models import Ticket, Order
+from events.orders import cancel_orders
+
+
+class Command(BaseCommand):
+    help = 'Cancel-storm benchmark: per-item ticket.save loop vs the set-based cancellation service'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lines', default='1,10,50,200', help='comma separated line counts per order')
+        parser.add_argument('--orders', type=int, default=50, help='orders canceled per line count and mode')
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--json', action='store_true', help='print results as JSON')
+
+    def handle(self, *args, **options):
+        line_counts = [int(lines) for lines in options['lines'].split(',')]
+        with benchmark_database():
+            self.user = make_users(1)[0]
+            self.seed_tickets(max(line_counts))
+            results = {
+                'latency': {lines: self.run(lines, options) for lines in line_counts},
+                'double_cancel': self.double_cancel(options),
+            }
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        self.stdout.write(f"{'lines':>6} {'loop p50':>10} {'service p50':>12} {'service p95':>12}")
+        for lines, result in results['latency'].items():
+            self.stdout.write(
+                f"{lines:>6} {result['loop']['p50_ms']:8.2f}ms {result['service']['p50_ms']:10.2f}ms "
+                f"{result['service']['p95_ms']:10.2f}ms"
+            )
+        double = results['double_cancel']
+        self.stdout.write(
+            f"concurrent double cancel: {double['canceled']} canceled, {double['rejected']} rejected, "
+            f"stock restored exactly once: {double['inventory_consistent']}"
+        )
+
+    def seed_tickets(self, count):
+        _, self.tickets = make_event(self.user, 'Postponed', count)
+
+    def stock(self):
+        return Ticket.objects.aggregate(total=Sum('quantity_available'))['total']
+
+    def place(self, count, lines):
+        """Pending orders holding stock, without going through the reservation path"""
+        return make_orders(count, self.user, lambda i: [(ticket, 1) for ticket in self.tickets[:lines]])
+
+    def loop_cancel(self, order_id):
+        # What the view, Order.cancel_order and OrderItem.delete used to do
+        order = Order.objects.get(id=order_id)
+        for item in order.order_items.all():
+            ticket = item.ticket
+            ticket.quantity_available += item.quantity
+            ticket.save()
+        order.status = 'canceled'
+        order.save()
+
+    def run(self, lines, options):
+        result = {}
+        for mode, cancel in (('loop', self.loop_cancel), ('service', lambda order_id: cancel_orders([order_id]))):
+            order_ids = self.place(options['orders'], lines)
+            samples, _ = run_concurrently(cancel, order_ids, options['threads'])
+            errors = [outcome for outcome, _ in samples if isinstance(outcome, Exception)]
+            if errors:
+                self.stderr.write(f"{mode} ({lines} lines): {len(errors)} failed, e.g. {errors[0]!r}")
+            result[mode] = summarize([elapsed for outcome, elapsed in samples if not isinstance(outcome, Exception)])
+        return result
+
+    def double_cancel(self, options):
+        order_ids = self.place(options['orders'], 10)
+        before = self.stock()
+        jobs = [order_id for order_id in order_ids for _ in range(2)]
+        samples, _ = run_concurrently(lambda order_id: cancel_orders([order_id])[0], jobs, options['threads'])
+        outcomes = [outcome for outcome, _ in samples]
+        canceled = sum(isinstance(outcome, dict) and 'status' in outcome for outcome in outcomes)
+        return {
+            'canceled': canceled,
+            'rejected': len(outcomes) - canceled,
+            'inventory_consistent': self.stock() - before == len(order_ids) * 10 and canceled == len(order_ids),
+        }
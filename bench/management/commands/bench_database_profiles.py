@@ -0,0 +1,106 @@
+import json
+import random
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import override_settings
+
+from bench.runner import benchmark_database, run_concurrently, summarize
+from bench.seeding import analyze, make_events, make_tickets, make_users
+from events.models import Order
+from events.reservations import reserve_order, ReservationError
+from events.serializers import EventSerializer
+from events.views import EventViewSet
+
+
+def catalogue_page(offset):
+    """A page of the event list, the way EventViewSet builds it"""
+    return EventSerializer(EventViewSet.queryset.order_by('-date', '-id')[offset:offset + 20], many=True).data
+
+
+class Command(BaseCommand):
+    help = (
+        'Mixed catalogue reads and reservations from concurrent threads on each database profile: '
+        'SQLite with its defaults and in WAL mode, or the configured server database'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=3000)
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--writes', type=float, default=0.2, help='share of requests that reserve tickets')
+        parser.add_argument('--events', type=int, default=200)
+        parser.add_argument('--json', action='store_true', help='print results as JSON')
+
+    def handle(self, *args, **options):
+        if connection.vendor == 'sqlite':
+            # Set both ways explicitly, so neither run inherits the other's journal mode
+            profiles = {
+                'sqlite': {'journal_mode': 'delete', 'synchronous': 'full'},
+                'sqlite-wal': settings.SQLITE_WAL_PRAGMAS,
+            }
+        else:
+            profiles = {settings.DB_PROFILE: settings.SQLITE_PRAGMAS}
+
+        results = {}
+        for name, pragmas in profiles.items():
+            with override_settings(SQLITE_PRAGMAS=pragmas), benchmark_database():
+                results[name] = self.run(options)
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        self.stdout.write(
+            f"{'profile':<12} {'req/s':>8} {'read p50':>10} {'read p95':>10} "
+            f"{'write p50':>10} {'write p95':>10} {'errors':>7}"
+        )
+        for name, result in results.items():
+            self.stdout.write(
+                f"{name:<12} {result['requests_per_sec']:>8.1f} "
+                f"{result['reads']['p50_ms']:>8.1f}ms {result['reads']['p95_ms']:>8.1f}ms "
+                f"{result['writes']['p50_ms']:>8.1f}ms {result['writes']['p95_ms']:>8.1f}ms {result['errors']:>7}"
+            )
+
+    def seed(self, options):
+        organizer = User.objects.create_user('organizer', password='x')
+        events = make_events(options['events'], organizer, description='Lorem ipsum dolor sit amet. ' * 10)
+        tickets = make_tickets(events, price=lambda event, j: f'{20 + j * 10}.00', quantity=1_000_000)
+        analyze()
+        return make_users(options['threads'] * 4), tickets
+
+    def run(self, options):
+        users, ticket_ids = self.seed(options)
+        rng = random.Random(19)
+        jobs = [
+            ('write', rng.choice(users), [{'ticket_id': ticket_id, 'quantity': rng.randint(1, 4)}
+                                          for ticket_id in rng.sample(ticket_ids, rng.randint(1, 3))])
+            if rng.random() < options['writes'] else
+            ('read', rng.randrange(0, options['events'] - 20), None)
+            for _ in range(options['requests'])
+        ]
+
+        def work(job):
+            kind, arg, items = job
+            if kind == 'write':
+                reserve_order(arg, items)
+            else:
+                catalogue_page(arg)
+            return kind
+
+        results, elapsed = run_concurrently(work, jobs, options['threads'])
+        # Sold out is a valid answer; anything else (e.g. "database is locked") is an error
+        errors = [outcome for outcome, _ in results if isinstance(outcome, Exception)
+                  and not isinstance(outcome, ReservationError)]
+        result = {
+            'requests_per_sec': (len(results) - len(errors)) / elapsed if elapsed else 0.0,
+            'reads': summarize([t for outcome, t in results if outcome == 'read']),
+            'writes': summarize([t for outcome, t in results if outcome == 'write']),
+            'errors': len(errors),
+            'error_types': sorted({type(error).__name__ for error in errors}),
+            'orders': Order.objects.count(),
+        }
+        if connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                result['journal_mode'] = cursor.execute('PRAGMA journal_mode').fetchone()[0]
+        return result
@@ -0,0 +1,117 @@
+import json
+import random
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+from django.db.models import Sum
+
+from bench.runner import benchmark_database, summarize
+from bench.seeding import analyze, make_event, make_orders, make_users
+from events.cancellations import start_cancellation, run_cancellation
+from events.models import Ticket, Order, OrderItem
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the event cancellation pipeline: throughput, peak memory and resume after interruption'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=500_000, help='orders on the canceled event')
+        parser.add_argument('--other-orders', type=int, default=50_000, help='orders on another event')
+        parser.add_argument('--tickets', type=int, default=20)
+        parser.add_argument('--chunk-size', type=int, default=5000)
+        parser.add_argument('--interrupt-after', type=int, default=10, help='chunks before simulating a crash')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--json', action='store_true', help='print results as JSON')
+
+    def handle(self, *args, **options):
+        with benchmark_database():
+            self.seed(options)
+            results = self.run(options)
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        self.stdout.write(
+            f"{results['orders']} orders in {results['seconds']:.1f}s "
+            f"({results['orders_per_sec']:.0f} orders/s, chunk p95 {results['chunks']['p95_ms']:.0f}ms)"
+        )
+        self.stdout.write(f"peak traced memory: {results['peak_memory_mb']:.1f} MB")
+        self.stdout.write(f"resumed after interruption at order {results['interrupted_at']}")
+        self.stdout.write(f"state consistent: {results['consistent']}")
+
+    def seed(self, options):
+        rng = random.Random(options['seed'])
+        user = make_users(1)[0]
+        self.event, tickets = make_event(user, 'Canceled', options['tickets'], price='40.00', quantity=10_000)
+        self.other, other_tickets = make_event(user, 'Still on', options['tickets'], price='40.00', quantity=10_000)
+
+        # Interleave both events' orders; some orders span both
+        plan = [tickets] * options['orders'] + [other_tickets] * options['other_orders']
+        rng.shuffle(plan)
+
+        def lines(i):
+            order_lines = [(rng.choice(plan[i]), rng.randint(1, 4))]
+            if plan[i] is tickets and rng.random() < 0.05:
+                order_lines.append((rng.choice(other_tickets), 1))
+            return order_lines
+
+        statuses = ['pending', 'completed', 'completed', 'canceled']
+        make_orders(len(plan), user, lines, status=lambda i: rng.choice(statuses))
+        analyze()
+
+    def run(self, options):
+        other_before = self.stock(self.other)
+        # What the other event should get back: every live order touching the canceled event
+        affected = Order.objects.filter(
+            status__in=['pending', 'completed'], order_items__ticket__event=self.event,
+        ).values('id')
+        expected = {
+            'pending': Order.objects.filter(id__in=affected, status='pending').count(),
+            'completed': Order.objects.filter(id__in=affected, status='completed').count(),
+            'other_restock': OrderItem.objects.filter(
+                order_id__in=affected, ticket__event=self.other,
+            ).aggregate(total=Sum('quantity'))['total'] or 0,
+        }
+
+        samples = []
+        last = [time.perf_counter()]
+
+        def progress(job):
+            now = time.perf_counter()
+            samples.append(now - last[0])
+            last[0] = now
+
+        tracemalloc.start()
+        started = time.perf_counter()
+        job = start_cancellation(self.event)
+        # Simulated crash: stop after a few chunks, then resume from the checkpoint
+        job = run_cancellation(job, options['chunk_size'], max_chunks=options['interrupt_after'], progress=progress)
+        interrupted_at = job.last_order_id
+        job = run_cancellation(job, options['chunk_size'], progress=progress)
+        seconds = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        self.event.refresh_from_db()
+        consistent = (
+            job.status == 'completed'
+            and job.orders_canceled == expected['pending']
+            and job.orders_refunded == expected['completed']
+            and not affected.exists()
+            and self.stock(self.event) == 0 == self.event.tickets_remaining
+            and self.stock(self.other) - other_before == expected['other_restock']
+        )
+        orders = job.orders_canceled + job.orders_refunded
+        return {
+            'orders': orders,
+            'seconds': seconds,
+            'orders_per_sec': orders / seconds,
+            'chunks': summarize(samples),
+            'peak_memory_mb': peak / 2 ** 20,
+            'interrupted_at': interrupted_at,
+            'consistent': consistent,
+        }
+
+    def stock(self, event):
+        return Ticket.objects.filter(event=event).aggregate(total=Sum('quantity_available'))['total']
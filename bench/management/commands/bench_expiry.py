@@ -0,0 +1,85 @@
+import json
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils import timezone
+
+from bench.runner import benchmark_database
+from bench.seeding import make_event, make_orders, make_users
+from events.holds import release_expired_holds, expired_holds
+from events.models import Ticket, Order, OrderItem
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the expiry sweeper against the per-item cancel_order loop'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=1_000_000, help='pending orders to seed')
+        parser.add_argument('--expired-ratio', type=float, default=0.5)
+        parser.add_argument('--tickets', type=int, default=200)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--legacy-sample', type=int, default=2000,
+                            help='expired orders released with cancel_order() to time the old loop')
+        parser.add_argument('--json', action='store_true', help='print results as JSON')
+
+    def handle(self, *args, **options):
+        with benchmark_database():
+            self.seed(options)
+            results = self.run(options)
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        self.stdout.write(f"queue plan: {results['queue_plan']}")
+        self.stdout.write(
+            f"legacy cancel_order loop: {results['legacy_orders_per_sec']:10.1f} orders/s "
+            f"({results['legacy_orders']} orders)"
+        )
+        self.stdout.write(
+            f"set-based sweeper:        {results['sweeper_orders_per_sec']:10.1f} orders/s "
+            f"({results['sweeper_orders']} orders in {results['sweeper_seconds']:.2f}s)"
+        )
+        self.stdout.write(f"inventory restored exactly: {results['inventory_consistent']}")
+
+    def seed(self, options):
+        user = make_users(1)[0]
+        _, tickets = make_event(user, 'On-sale', options['tickets'], price='25.00', quantity=0)
+        order_ids = make_orders(options['orders'], user, lambda i: [(tickets[i % len(tickets)], 2)])
+        # auto_now_add ignores explicit values, so backdate the expired share afterwards
+        expired = int(options['orders'] * options['expired_ratio'])
+        if expired:
+            Order.objects.filter(id__lte=order_ids[expired - 1]).update(created_at=timezone.now() - timedelta(hours=1))
+
+    def run(self, options):
+        queryset = expired_holds()
+        with connection.cursor() as cursor:
+            sql, params = queryset.values('id').query.sql_with_params()
+            explain = 'EXPLAIN QUERY PLAN ' if connection.vendor == 'sqlite' else 'EXPLAIN '
+            cursor.execute(explain + sql, params)
+            plan = ' | '.join(str(row[-1]) for row in cursor.fetchall())
+
+        legacy = list(queryset[:options['legacy_sample']])
+        started = time.perf_counter()
+        for order in legacy:
+            order.cancel_order()
+        legacy_seconds = time.perf_counter() - started
+
+        remaining = queryset.count()
+        started = time.perf_counter()
+        released = release_expired_holds(batch_size=options['batch_size'])
+        sweeper_seconds = time.perf_counter() - started
+
+        canceled_items = OrderItem.objects.filter(order__status='canceled').count()
+        stock = sum(Ticket.objects.values_list('quantity_available', flat=True))
+
+        return {
+            'queue_plan': plan,
+            'legacy_orders': len(legacy),
+            'legacy_orders_per_sec': len(legacy) / legacy_seconds if legacy_seconds else 0.0,
+            'sweeper_orders': released,
+            'sweeper_seconds': sweeper_seconds,
+            'sweeper_orders_per_sec': released / sweeper_seconds if sweeper_seconds else 0.0,
+            'inventory_consistent': released == remaining and stock == canceled_items * 2,
+        }
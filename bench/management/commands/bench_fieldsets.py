@@ -0,0 +1,90 @@
+import json
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from bench.runner import benchmark_database, summarize
+from bench.seeding import make_categories, make_events, make_orders, make_tickets
+from events.caching import catalogue_cache
+from events.views import EventViewSet
+
+# (name, url name, query string)
+CASES = [
+    ('events full', 'event-list', ''),
+    ('events mobile', 'event-list', 'fields=id,title,date,min_price'),
+    ('events no nesting', 'event-list',
+     'fields=id,title,description,date,location,is_active,waiting_room,created_at,updated_at,'
+     'min_price,max_price,tickets_remaining'),
+    ('events + tickets', 'event-list', 'fields=id,title,date,min_price&expand=available_tickets'),
+    ('orders', 'order-list', ''),
+    ('orders summary', 'order-list', 'fields=id,status,total_price,created_at'),
+]
+
+
+class Command(BaseCommand):
+    help = 'Compare payload size, query count and response time of full and sparse (?fields= / ?expand=) list pages'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=500, help='events and orders to seed')
+        parser.add_argument('--page-size', type=int, default=100)
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--json', action='store_true', help='print results as JSON')
+
+    def handle(self, *args, **options):
+        with benchmark_database():
+            buyer = self.seed(options['rows'])
+            results = self.run(buyer, options)
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        self.stdout.write(f"{'':<20} {'bytes':>9} {'queries':>8} {'p50':>9}")
+        for name, result in results.items():
+            self.stdout.write(
+                f"{name:<20} {result['bytes']:>9} {result['queries']:>8} "
+                f"{result['latency']['p50_ms']:>7.1f}ms"
+            )
+
+    def seed(self, rows):
+        organizer = User.objects.create_user('organizer', email='organizer@example.com', password='x')
+        buyer = User.objects.create_user('buyer', password='x')
+        events = make_events(
+            rows, organizer, make_categories(10),
+            description='Lorem ipsum dolor sit amet, consectetur adipiscing elit. ' * 20,
+        )
+        tickets = make_tickets(events, quantity=lambda event, j: 100 * (j % 3))
+        make_orders(rows, buyer, lambda i: [(tickets[(i * 3 + j) % len(tickets)], 1) for j in range(3)])
+        return buyer
+
+    def run(self, buyer, options):
+        client = APIClient()
+        client.force_authenticate(buyer)
+        throttle_classes, EventViewSet.throttle_classes = EventViewSet.throttle_classes, []
+        results = {}
+        try:
+            for name, url_name, query in CASES:
+                url = f"{reverse(url_name)}?page_size={options['page_size']}" + (f'&{query}' if query else '')
+                samples = []
+                for _ in range(options['repeat']):
+                    # Measure the work, not the catalogue cache
+                    catalogue_cache().clear()
+                    with CaptureQueriesContext(connection) as queries:
+                        started = time.perf_counter()
+                        response = client.get(url)
+                        samples.append(time.perf_counter() - started)
+                    if response.status_code != 200:
+                        raise CommandError(f"{url} returned {response.status_code}: {response.content[:200]!r}")
+                results[name] = {
+                    'url': url,
+                    'bytes': len(response.content),
+                    'queries': len(queries),
+                    'latency': summarize(samples),
+                }
+        finally:
+            EventViewSet.throttle_classes = throttle_classes
+        return results
@@ -0,0 +1,111 @@
+import json
+import random
+import time
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from bench.runner import benchmark_database, query_plan, summarize
+from bench.seeding import analyze, make_categories, make_events, make_orders, make_tickets, make_users
+from events.models import Category, Event, Ticket, Order
+
+# The indexes added for the hot query shapes (migration 0011); "before" runs without them
+INDEXES = [
+    (Event, 'event_active_category_date_idx'),
+    (Ticket, 'ticket_event_price_idx'),
+    (Order, 'order_user_status_created_idx'),
+]
+
+
+def _index(model, name):
+    return next(index for index in model._meta.indexes if index.name == name)
+
+
+class Command(BaseCommand):
+    help = 'Time the hot catalogue and order history queries at scale, without and with the composite indexes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1_000_000, help='events, tickets and orders to seed')
+        parser.add_argument('--categories', type=int, default=50)
+        parser.add_argument('--repeat', type=int, default=50)
+        parser.add_argument('--json', action='store_true', help='print results as JSON')
+
+    def handle(self, *args, **options):
+        with benchmark_database():
+            self.seed(options)
+            with connection.schema_editor() as editor:
+                for model, name in INDEXES:
+                    editor.remove_index(model, _index(model, name))
+            analyze()
+            before = self.run(options)
+            with connection.schema_editor() as editor:
+                for model, name in INDEXES:
+                    editor.add_index(model, _index(model, name))
+            analyze()
+            after = self.run(options)
+
+        results = {name: {'before': before[name], 'after': after[name]} for name in before}
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        self.stdout.write(f"{'query':<26} {'before p50':>11} {'after p50':>11} {'speedup':>8}")
+        for name, result in results.items():
+            old, new = result['before']['latency']['p50_ms'], result['after']['latency']['p50_ms']
+            self.stdout.write(f"{name:<26} {old:>9.2f}ms {new:>9.2f}ms {old / new if new else 0:>7.1f}x")
+            for when in ('before', 'after'):
+                self.stdout.write(f"    {when}: {' / '.join(result[when]['plan'])}")
+
+    def seed(self, options):
+        rng = random.Random(20)
+        rows = options['rows']
+        organizer = User.objects.create_user('organizer', password='x')
+        categories = make_categories(options['categories'])
+        events = make_events(
+            rows, organizer, spacing=timedelta(minutes=1),
+            category=lambda i: rng.choice(categories), is_active=lambda i: i % 10 != 0,
+        )
+        # Four tiers each on a quarter of the events
+        make_tickets(
+            events[:rows // 4], price=lambda event, j: f'{10 + (j * 7 + event) % 90}.00',
+            quantity=lambda event, j: rng.choice([0, 50]),
+        )
+        # A corporate account holds a tenth of the orders, few of them still pending
+        users = make_users(1000)
+        statuses = ['completed'] * 90 + ['canceled'] * 9 + ['pending']
+        make_orders(
+            rows, lambda i: users[0] if i % 10 == 0 else rng.choice(users), lambda i: [],
+            status=lambda i: rng.choice(statuses), total_price='20.00',
+        )
+
+    def run(self, options):
+        rng = random.Random(21)
+        categories = list(Category.objects.values_list('name', flat=True))
+        event_ids = list(Ticket.objects.order_by().values_list('event_id', flat=True).distinct()[:1000])
+        corporate = User.objects.order_by('id').filter(username__startswith='bench').first()
+        queries = {
+            'events page': lambda: Event.objects.filter(is_active=True).order_by('-date', '-id')[:20],
+            'events page by category': lambda: Event.objects.filter(
+                is_active=True, category__name=rng.choice(categories)
+            ).order_by('-date', '-id')[:20],
+            'tickets of an event': lambda: Ticket.objects.with_stock().filter(event_id=rng.choice(event_ids)).in_stock(),
+            'order history': lambda: Order.objects.filter(user=corporate).order_by('-created_at', '-id')[:20],
+            'order history by status': lambda: Order.objects.filter(
+                user=corporate, status=rng.choice(['pending', 'canceled'])
+            ).order_by('-created_at', '-id')[:20],
+        }
+        results = {}
+        for name, build in queries.items():
+            plan, _, _ = query_plan(*build().query.sql_with_params())
+            for _ in range(5):
+                # Warm the page cache, which building the indexes churned
+                list(build())
+            samples = []
+            for _ in range(options['repeat']):
+                queryset = build()
+                started = time.perf_counter()
+                list(queryset)
+                samples.append(time.perf_counter() - started)
+            results[name] = {'plan': plan, 'latency': summarize(samples)}
+        return results
@@ -0,0 +1,151 @@
+import asyncio
+import json
+import time
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.test.utils import override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from bench.runner import benchmark_database, summarize
+from bench.seeding import make_event
+from events import live
+from events.caching import bump
+from events.reservations import reserve_order
+from events.views import EventViewSet
+
+
+class Command(BaseCommand):
+    help = (
+        'Fan availability changes out to many live watchers through one publisher, '
+        'and compare with every watcher polling the tickets endpoint'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--watchers', type=int, default=10_000)
+        parser.add_argument('--changes', type=int, default=50, help='orders placed while watching')
+        parser.add_argument('--gap', type=float, default=0.1, help='seconds between orders')
+        parser.add_argument('--interval', type=float, default=0.5, help='LIVE_POLL_INTERVAL for the run')
+        parser.add_argument('--poll-every', type=float, default=2.0,
+                            help='seconds between polls of a browser without the stream, for the comparison')
+        parser.add_argument('--json', action='store_true', help='print results as JSON')
+
+    def handle(self, *args, **options):
+        with benchmark_database(), override_settings(LIVE_POLL_INTERVAL=options['interval']):
+            organizer = User.objects.create_user('organizer', password='x')
+            buyer = User.objects.create_user('buyer', password='x')
+            event, tickets = make_event(
+                organizer, 'On-sale', 4, price=lambda event, j: f'{50 + j * 10}.00', quantity=100_000,
+                description='Lorem ipsum', date=timezone.now() + timedelta(days=30),
+            )
+
+            results = asyncio.run(self.watch(event.id, buyer, tickets, options))
+            results['polling'] = self.polling(event.id, results['seconds'], options)
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        latency = results['delivery_latency']
+        polling = results['polling']
+        self.stdout.write(
+            f"stream:  {results['watchers']} watchers, {results['changes']} orders in {results['seconds']:.1f}s -> "
+            f"{results['db_reads']} stock reads, {results['deliveries']} deliveries "
+            f"({results['deltas_per_watcher']:.1f} per watcher); "
+            f"latency p50 {latency['p50_ms']:.0f}ms p99 {latency['p99_ms']:.0f}ms"
+        )
+        self.stdout.write(
+            f"polling: {polling['requests']} requests ({polling['requests_per_sec']:.0f}/s) at "
+            f"{polling['hit_ms']:.2f}ms cached / {polling['miss_ms']:.2f}ms uncached each, "
+            f"about {polling['cpu_seconds']:.1f} CPU-seconds of request handling"
+        )
+
+    async def watch(self, event_id, buyer, tickets, options):
+        publisher = live.get_publisher()
+        watchers = []
+        for _ in range(options['watchers']):
+            watcher, _ = await publisher.subscribe(event_id)
+            watchers.append(watcher)
+        reads_before = publisher.reads
+        commits, deliveries = [], [[] for _ in watchers]
+
+        async def consume(watcher, received):
+            while True:
+                delta = await watcher.wait(3600)
+                if watcher.closed:
+                    return
+                if delta:
+                    received.append(time.perf_counter())
+
+        def place_orders():
+            try:
+                for i in range(options['changes']):
+                    reserve_order(buyer, [{'ticket_id': tickets[i % len(tickets)], 'quantity': 1}])
+                    commits.append(time.perf_counter())
+                    time.sleep(options['gap'])
+            finally:
+                connections.close_all()
+
+        consumers = [asyncio.create_task(consume(w, received)) for w, received in zip(watchers, deliveries)]
+        started = time.perf_counter()
+        await asyncio.to_thread(place_orders)
+        # Let the last change reach everyone
+        await asyncio.sleep(options['interval'] * 2 + 0.5)
+        seconds = time.perf_counter() - started
+        for watcher in watchers:
+            publisher.unsubscribe(event_id, watcher)
+            watcher.close()
+        await asyncio.gather(*consumers)
+
+        # Latency of a change = first delivery after its commit, per watcher
+        latencies = []
+        for received in deliveries:
+            position = 0
+            for committed in commits:
+                while position < len(received) and received[position] < committed:
+                    position += 1
+                if position < len(received):
+                    latencies.append(received[position] - committed)
+        total = sum(len(received) for received in deliveries)
+        return {
+            'watchers': len(watchers),
+            'changes': len(commits),
+            'seconds': seconds,
+            'db_reads': publisher.reads - reads_before,
+            'deliveries': total,
+            'deltas_per_watcher': total / len(watchers),
+            'delivery_latency': summarize(latencies),
+        }
+
+    def polling(self, event_id, seconds, options):
+        """What the same watchers would cost polling the tickets endpoint instead"""
+        client = APIClient()
+        url = reverse('event-tickets', args=[event_id])
+        throttle_classes, EventViewSet.throttle_classes = EventViewSet.throttle_classes, []
+        try:
+            client.get(url)
+            started = time.perf_counter()
+            for _ in range(200):
+                client.get(url)
+            hit = (time.perf_counter() - started) / 200
+            started = time.perf_counter()
+            for _ in range(50):
+                bump(f'event:{event_id}')
+                client.get(url)
+            miss = (time.perf_counter() - started) / 50
+        finally:
+            EventViewSet.throttle_classes = throttle_classes
+
+        requests = int(options['watchers'] * seconds / options['poll_every'])
+        # Every change makes the next poll of each event a miss; the rest are hits
+        misses = min(requests, options['changes'])
+        return {
+            'requests': requests,
+            'requests_per_sec': requests / seconds,
+            'hit_ms': hit * 1000,
+            'miss_ms': miss * 1000,
+            'cpu_seconds': (requests - misses) * hit + misses * miss,
+        }
@@ -0,0 +1,114 @@
+import json
+import random
+import statistics
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+from rest_framework.test import APIClient
+
+from bench.runner import benchmark_database
+from bench.traffic import SCENARIOS, Scale, generate, seed
+from events.caching import catalogue_cache
+from events.metrics import MetricsMiddleware
+from events.views import EventViewSet
+
+METRICS_MIDDLEWARE = 'events.metrics.MetricsMiddleware'
+# Anonymous catalogue reads: the cheapest requests, so the largest relative overhead
+MIX = {
+    key: SCENARIOS[key][0] for key in [
+        ('event-list', 'GET'), ('event-detail', 'GET'), ('event-tickets', 'GET'),
+        ('event-autocomplete', 'GET'), ('event-categories', 'GET'),
+    ]
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Overhead of MetricsMiddleware on catalogue reads: the same requests without it, '
+        'at METRICS_SAMPLE_RATE and with every request sampled'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500, help='requests per round')
+        parser.add_argument('--rounds', type=int, default=10)
+        parser.add_argument('--events', type=int, default=500)
+        parser.add_argument('--no-cache', action='store_true', help='bypass the catalogue cache')
+        parser.add_argument('--json', action='store_true', help='print results as JSON')
+
+    def handle(self, *args, **options):
+        without = [name for name in settings.MIDDLEWARE if name != METRICS_MIDDLEWARE]
+        configs = {
+            'off': (without, 0.0),
+            f'sampled {settings.METRICS_SAMPLE_RATE:g}': ([METRICS_MIDDLEWARE] + without, settings.METRICS_SAMPLE_RATE),
+            'sampled 1': ([METRICS_MIDDLEWARE] + without, 1.0),
+        }
+        throttles = EventViewSet.throttle_classes
+        EventViewSet.throttle_classes = []
+        try:
+            with benchmark_database():
+                rng = random.Random(22)
+                data = seed(Scale(users=10, events=options['events'], orders=100), rng)
+                paths = [request['path'] for request in generate(data, options['requests'], rng, MIX)]
+                results = self.run(configs, paths, options)
+        finally:
+            EventViewSet.throttle_classes = throttles
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        self.stdout.write(f"{'middleware':<14} {'per request':>12} {'overhead':>9} {'own time':>10} {'share':>7}")
+        for name, result in results.items():
+            self.stdout.write(
+                f"{name:<14} {result['mean_ms']:>10.3f}ms {result['overhead']:>8.2%} "
+                f"{result['own_us']:>8.1f}us {result['own_share']:>6.2%}"
+            )
+
+    def run(self, configs, paths, options):
+        clients = {}
+        for name, (middleware, _) in configs.items():
+            # The test client builds its middleware chain on the first request
+            with override_settings(MIDDLEWARE=middleware):
+                clients[name] = APIClient()
+                clients[name].get(paths[0])
+
+        timings = {name: [] for name in configs}
+        order = list(configs)
+        for _ in range(options['rounds']):
+            # Alternate the order, so drift and cache warmth don't favour one configuration
+            random.shuffle(order)
+            for name in order:
+                client, (_, rate) = clients[name], configs[name]
+                with override_settings(METRICS_SAMPLE_RATE=rate):
+                    started = time.perf_counter()
+                    for path in paths:
+                        if options['no_cache']:
+                            # Timed too, but the same for every configuration
+                            catalogue_cache().clear()
+                        client.get(path)
+                    timings[name].append((time.perf_counter() - started) / len(paths))
+
+        baseline = statistics.median(timings['off'])
+        results = {}
+        for name, samples in timings.items():
+            # End to end differences are within the noise of a few percent, so the
+            # middleware is also timed on its own, around a view that does nothing
+            own = self.own_time(clients[name], paths, configs[name][1]) if name != 'off' else 0.0
+            results[name] = {
+                'mean_ms': statistics.median(samples) * 1000,
+                'overhead': statistics.median(samples) / baseline - 1,
+                'own_us': own * 1e6,
+                'own_share': own / baseline,
+            }
+        return results
+
+    def own_time(self, client, paths, rate, repeat=20_000):
+        response = client.get(paths[0])
+        request = response.wsgi_request
+        middleware = MetricsMiddleware(lambda request: response)
+        with override_settings(METRICS_SAMPLE_RATE=rate):
+            started = time.perf_counter()
+            for _ in range(repeat):
+                middleware(request)
+            return (time.perf_counter() - started) / repeat
@@ -0,0 +1,82 @@
+import json
+import random
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Prefetch
+from django.test.utils import CaptureQueriesContext
+from rest_framework.renderers import JSONRenderer
+
+from bench.runner import benchmark_database, summarize
+from bench.seeding import make_events, make_orders, make_tickets
+from events.models import Ticket, Order
+from events.serializers import OrderSerializer, OrderSummarySerializer
+
+
+def nested_page(user, offset, size):
+    """A history page the way the list endpoint built it before the summary columns"""
+    orders = Order.objects.filter(user=user).select_related('user').prefetch_related(
+        'order_items',
+        Prefetch('order_items__ticket', queryset=Ticket.objects.with_stock()),
+        'order_items__ticket__event',
+    ).order_by('-created_at')
+    orders.count()
+    return JSONRenderer().render(OrderSerializer(orders[offset:offset + size], many=True).data)
+
+
+def summary_page(user, offset, size):
+    orders = Order.objects.filter(user=user).order_by('-created_at')
+    orders.count()
+    return JSONRenderer().render(OrderSummarySerializer(orders[offset:offset + size], many=True).data)
+
+
+class Command(BaseCommand):
+    help = "Time a large account's order history pages: nested items vs the order summary columns"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=20_000, help='orders on the account')
+        parser.add_argument('--lines', type=int, default=3, help='lines per order')
+        parser.add_argument('--page-sizes', default='10,100,1000', help='comma separated page sizes')
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--json', action='store_true', help='print results as JSON')
+
+    def handle(self, *args, **options):
+        sizes = [int(size) for size in options['page_sizes'].split(',')]
+        with benchmark_database():
+            user = self.seed(options)
+            results = {}
+            for size in sizes:
+                for name, page in (('nested', nested_page), ('summary', summary_page)):
+                    samples = []
+                    for _ in range(options['repeat']):
+                        with CaptureQueriesContext(connection) as queries:
+                            started = time.perf_counter()
+                            body = page(user, options['orders'] // 2, size)
+                            samples.append(time.perf_counter() - started)
+                    results[f'{name} x{size}'] = {
+                        'queries': len(queries), 'bytes': len(body), 'latency': summarize(samples),
+                    }
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        self.stdout.write(f"{'page':<16} {'queries':>8} {'bytes':>10} {'p50':>10}")
+        for name, result in results.items():
+            self.stdout.write(
+                f"{name:<16} {result['queries']:>8} {result['bytes']:>10} {result['latency']['p50_ms']:>8.1f}ms"
+            )
+
+    def seed(self, options):
+        rng = random.Random(17)
+        organizer = User.objects.create_user('organizer', password='x')
+        user = User.objects.create_user('corporate', password='x')
+        events = make_events(50, organizer, title=lambda i: f'Conference {i}')
+        tickets = make_tickets(events, price=lambda event, j: f'{100 + j * 50}.00', quantity=1_000_000)
+        make_orders(
+            options['orders'], user,
+            lambda i: [(ticket, rng.randint(1, 5)) for ticket in rng.choices(tickets, k=options['lines'])],
+            status='completed',
+        )
+        return user
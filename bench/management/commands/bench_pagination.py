@@ -0,0 +1,89 @@
+import json
+import time
+from datetime import timedelta
+from types import SimpleNamespace
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from bench.runner import benchmark_database, summarize
+from bench.seeding import analyze, make_events, make_users
+from events.models import Event
+from events.pagination import HybridPagination
+
+ORDERING = ('-date', '-id')
+
+
+class Command(BaseCommand):
+    help = 'Benchmark deep pages: PageNumberPagination (COUNT + OFFSET) vs keyset pagination'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--events', type=int, default=110_000)
+        parser.add_argument('--page-size', type=int, default=10)
+        parser.add_argument('--pages', default='1,10,100,1000,10000', help='comma separated page numbers')
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--json', action='store_true', help='print results as JSON')
+
+    def handle(self, *args, **options):
+        pages = [int(page) for page in options['pages'].split(',')]
+        with benchmark_database():
+            self.seed(options)
+            results = self.run(pages, options)
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        self.stdout.write(f"{'page':>8} {'page-number p50':>16} {'keyset p50':>12}")
+        for page, result in results.items():
+            self.stdout.write(
+                f"{page:>8} {result['page_number']['p50_ms']:14.2f}ms {result['keyset']['p50_ms']:10.2f}ms"
+            )
+
+    def seed(self, options):
+        organizer = make_users(1)[0]
+        now = timezone.now()
+        # Every date appears twice so the id tiebreak is exercised
+        make_events(options['events'], organizer, description='', date=lambda i: now + timedelta(minutes=i // 2))
+        analyze()
+
+    def request(self, params):
+        return Request(APIRequestFactory().get('/api/events/', params))
+
+    def run(self, pages, options):
+        queryset = Event.objects.filter(is_active=True).order_by(*ORDERING)
+        view = SimpleNamespace(keyset_ordering=ORDERING)
+        size = options['page_size']
+
+        results = {}
+        for page in pages:
+            offset = (page - 1) * size
+            if offset >= options['events']:
+                continue
+            # The cursor a client would hold after walking to this page
+            cursor = None
+            if offset:
+                previous = queryset[offset - 1]
+                paginator = HybridPagination()
+                paginator.ordering = ORDERING
+                cursor = paginator.make_cursor(previous, reverse=False)
+
+            samples = {'page_number': [], 'keyset': []}
+            for _ in range(options['repeat']):
+                paginator = PageNumberPagination()
+                paginator.page_size = size
+                started = time.perf_counter()
+                list(paginator.paginate_queryset(queryset, self.request({'page': page})))
+                samples['page_number'].append(time.perf_counter() - started)
+
+                paginator = HybridPagination()
+                started = time.perf_counter()
+                list(paginator.paginate_queryset(
+                    queryset, self.request({'cursor': cursor or '', 'page_size': size}), view
+                ))
+                samples['keyset'].append(time.perf_counter() - started)
+
+            results[page] = {mode: summarize(values) for mode, values in samples.items()}
+        return results
@@ -0,0 +1,88 @@
+import json
+import random
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from bench.runner import benchmark_database, summarize
+from bench.seeding import analyze, make_categories, make_events, make_tickets, make_users
+from events.filters import EventFilter
+from events.models import Event
+
+
+def legacy_price_filter(queryset, low, high):
+    """The pre-summary EventFilter: a join over tickets plus DISTINCT per bound"""
+    return queryset.filter(tickets__price__gte=low).distinct().filter(tickets__price__lte=high).distinct()
+
+
+class Command(BaseCommand):
+    help = 'Benchmark price-range browsing: ticket join + DISTINCT vs the denormalized price columns'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--events', type=int, default=100_000)
+        parser.add_argument('--tickets', type=int, default=10, help='tickets per event')
+        parser.add_argument('--queries', type=int, default=20, help='random price ranges per mode')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--json', action='store_true', help='print results as JSON')
+
+    def handle(self, *args, **options):
+        with benchmark_database():
+            self.seed(options)
+            results = self.run(options)
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        for mode, result in results.items():
+            latency = result['latency']
+            self.stdout.write(
+                f"{mode:<18} p50={latency['p50_ms']:8.1f}ms p95={latency['p95_ms']:8.1f}ms  plan: {result['plan']}"
+            )
+
+    def seed(self, options):
+        rng = random.Random(options['seed'])
+        organizer = make_users(1)[0]
+        events = make_events(
+            options['events'], organizer, make_categories(20), spacing=timedelta(minutes=1), description='',
+        )
+        make_tickets(
+            events, options['tickets'], price=lambda event, j: f'{rng.randint(5, 500)}.00',
+            quantity=lambda event, j: rng.randint(0, 500),
+        )
+        analyze()
+
+    def explain(self, queryset):
+        sql, params = queryset.query.sql_with_params()
+        prefix = 'EXPLAIN QUERY PLAN ' if connection.vendor == 'sqlite' else 'EXPLAIN '
+        with connection.cursor() as cursor:
+            cursor.execute(prefix + sql, params)
+            return ' | '.join(str(row[-1]) for row in cursor.fetchall())
+
+    def run(self, options):
+        rng = random.Random(options['seed'])
+        ranges = [sorted((rng.randint(5, 500), rng.randint(5, 500))) for _ in range(options['queries'])]
+        base = Event.objects.filter(is_active=True)
+
+        modes = {
+            'legacy join': lambda low, high: legacy_price_filter(base, low, high).order_by('-date'),
+            'summary columns': lambda low, high: EventFilter(
+                {'min_price': low, 'max_price': high}, queryset=base
+            ).qs.order_by('-date'),
+            'ordering=min_price': lambda low, high: EventFilter(
+                {'min_price': low, 'max_price': high}, queryset=base
+            ).qs.order_by('min_price'),
+        }
+
+        results = {}
+        for mode, build in modes.items():
+            samples = []
+            for low, high in ranges:
+                queryset = build(low, high)
+                started = time.perf_counter()
+                queryset.count()
+                list(queryset.values('id')[:10])
+                samples.append(time.perf_counter() - started)
+            results[mode] = {'latency': summarize(samples), 'plan': self.explain(build(*ranges[0]))}
+        return results
@@ -0,0 +1,105 @@
+import json
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from bench.runner import benchmark_database
+from bench.seeding import make_categories, make_events, make_tickets
+from events.models import Category, Event, Ticket, Order
+from events.reservations import reserve_order
+
+
+class Command(BaseCommand):
+    help = (
+        'Count SQL queries for every route in events/urls.py at two dataset sizes '
+        'and fail if any of them grows with the data (N+1 regression check)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--small', type=int, default=2, help='events/orders in the small dataset')
+        parser.add_argument('--large', type=int, default=20, help='events/orders in the large dataset')
+        parser.add_argument('--json', action='store_true', help='print results as JSON')
+
+    def handle(self, *args, **options):
+        with benchmark_database():
+            small = self.measure(options['small'])
+            large = self.measure(options['large'])
+
+        results = {
+            name: {'small': small[name], 'large': large[name]}
+            for name in small
+        }
+        regressions = [name for name, counts in results.items() if counts['large'] > counts['small']]
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+        else:
+            for name, counts in results.items():
+                flag = '  <-- grows with data' if name in regressions else ''
+                self.stdout.write(f"{name:<24} {counts['small']:>4} {counts['large']:>4}{flag}")
+        if regressions:
+            raise CommandError(f"Query count grows with data on: {', '.join(regressions)}")
+
+    def seed(self, size):
+        for model in (Order, Ticket, Event, Category, User):
+            model.objects.all().delete()
+        admin = User.objects.create_user('admin', password='x', is_staff=True)
+        buyer = User.objects.create_user('buyer', password='x')
+        categories = make_categories(size)
+        events = make_events(size, admin, categories)
+        make_tickets(events, size, quantity=lambda event, j: 1000 * (j % 3))
+        tickets = list(Ticket.objects.filter(quantity_available__gt=0)[:size])
+        orders = [
+            reserve_order(buyer, [{'ticket_id': ticket.id, 'quantity': 1} for ticket in tickets])
+            for _ in range(size)
+        ]
+        return admin, buyer, events[0], categories[0], tickets, orders
+
+    def measure(self, size):
+        admin, buyer, event, category, tickets, orders = self.seed(size)
+        cache.clear()
+        anon, organizer, customer = APIClient(), APIClient(), APIClient()
+        organizer.force_authenticate(admin)
+        customer.force_authenticate(buyer)
+
+        new_order = [{'ticket_id': tickets[0].id, 'quantity': 1}]
+        new_event = {
+            'title': 'New', 'description': 'New', 'date': timezone.now().isoformat(),
+            'location': 'Hall', 'category_id': category.id,
+        }
+        requests = [
+            ('event-list', anon.get, reverse('event-list'), None),
+            ('event-list?filtered', anon.get, reverse('event-list'), {'min_price': 5, 'category': category.name}),
+            ('event-list?sparse', anon.get, reverse('event-list'), {'fields': 'id,title', 'expand': 'available_tickets'}),
+            ('event-detail', anon.get, reverse('event-detail', args=[event]), None),
+            ('event-tickets', anon.get, reverse('event-tickets', args=[event]), None),
+            ('event-categories', anon.get, reverse('event-categories'), None),
+            ('event-create', organizer.post, reverse('event-list'), new_event),
+            ('event-update', organizer.patch, reverse('event-detail', args=[event]), {'location': 'Arena'}),
+            ('category-list', organizer.get, reverse('category-list'), None),
+            ('category-detail', organizer.get, reverse('category-detail', args=[category.id]), None),
+            ('order-list', customer.get, reverse('order-list'), None),
+            ('order-list?sparse', customer.get, reverse('order-list'), {'fields': 'id,status'}),
+            ('order-detail', customer.get, reverse('order-detail', args=[orders[0].id]), None),
+            ('order-detail?sparse', customer.get, reverse('order-detail', args=[orders[0].id]),
+             {'fields': 'id', 'expand': 'order_items.ticket'}),
+            ('order-create', customer.post, reverse('order-list'), new_order),
+            ('order-confirm', customer.post, reverse('order-confirm', args=[orders[0].id]), None),
+            ('order-cancel', customer.post, reverse('order-cancel', args=[orders[1 % size].id]), None),
+            ('event-delete', organizer.delete, reverse('event-detail', args=[event]), None),
+        ]
+
+        counts = {}
+        for name, method, url, data in requests:
+            with CaptureQueriesContext(connection) as queries:
+                response = method(url, data, format='json') if data is not None else method(url)
+            if response.status_code >= 400:
+                raise CommandError(f"{name} returned {response.status_code}: {response.content[:200]!r}")
+            counts[name] = len(queries.captured_queries)
+        return counts
@@ -0,0 +1,76 @@
+import json
+import random
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from bench.runner import benchmark_database
+from bench.seeding import analyze, make_event, make_orders
+from events.models import Order
+from events.orders import reconcile_totals
+
+
+class Command(BaseCommand):
+    help = 'Time reconcile_totals over many orders with a share of wrong totals: one check pass, one repair pass'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=200_000)
+        parser.add_argument('--lines', type=int, default=3, help='lines per order')
+        parser.add_argument('--wrong', type=float, default=0.001, help='share of orders with a wrong total')
+        parser.add_argument('--chunk-size', type=int, default=10_000)
+        parser.add_argument('--json', action='store_true', help='print results as JSON')
+
+    def handle(self, *args, **options):
+        with benchmark_database():
+            wrong = self.seed(options)
+            results = {'orders': options['orders'], 'wrong': wrong}
+            for name, repair in (('check', False), ('repair', True), ('recheck', False)):
+                started = time.perf_counter()
+                result = reconcile_totals(chunk_size=options['chunk_size'], repair=repair)
+                seconds = time.perf_counter() - started
+                results[name] = {
+                    'seconds': seconds,
+                    'orders_per_sec': result['checked'] / seconds,
+                    'mismatched': result['mismatched'],
+                    'repaired': result['repaired'],
+                }
+
+        if results['check']['mismatched'] != wrong or results['recheck']['mismatched']:
+            raise CommandError(f"Expected {wrong} mismatches and none after repair: {results}")
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        for name in ('check', 'repair', 'recheck'):
+            result = results[name]
+            self.stdout.write(
+                f"{name:<8} {result['seconds']:>7.1f}s {result['orders_per_sec']:>9.0f} orders/s, "
+                f"{result['mismatched']} mismatched, {result['repaired']} repaired"
+            )
+
+    def seed(self, options):
+        rng = random.Random(18)
+        organizer = User.objects.create_user('organizer', password='x')
+        user = User.objects.create_user('buyer', password='x')
+        _, tickets = make_event(
+            organizer, 'Festival', 10, price=lambda event, j: f'{j * 7 + 10}.{j * 13 % 100:02d}', quantity=0,
+            description='Lorem ipsum', date=timezone.now() + timedelta(days=30), location='Field', category=None,
+        )
+        order_ids = make_orders(
+            options['orders'], user,
+            lambda i: [(ticket, rng.randint(1, 4)) for ticket in rng.choices(tickets, k=options['lines'])],
+            status='completed',
+        )
+        # e.g. summed in floats, or priced at a later ticket price
+        wrong = [order_id for order_id in order_ids if rng.random() < options['wrong']]
+        for start in range(0, len(wrong), 500):
+            orders = list(Order.objects.filter(id__in=wrong[start:start + 500]).only('id', 'total_price'))
+            for order in orders:
+                order.total_price += rng.choice([1, -1]) * rng.choice([Decimal('0.01'), Decimal('1'), Decimal('5')])
+            Order.objects.bulk_update(orders, ['total_price'])
+        analyze()
+        return len(wrong)
+
@@ -0,0 +1,117 @@
+import json
+import random
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import models as db_models
+from django.db.models import Sum
+
+from bench.runner import benchmark_database, run_concurrently, summarize
+from bench.seeding import make_event, make_users
+from events.models import Event, Ticket, Order, OrderItem
+from events.reservations import reserve_order, ReservationError
+
+
+def legacy_create(user, items):
+    """The pre-engine order path: per-line get, read-modify-write, no transaction"""
+    lines = []
+    for item in items:
+        ticket = Ticket.objects.get(id=item['ticket_id'])
+        if ticket.quantity_available < item['quantity']:
+            raise ReservationError("Not enough tickets available")
+        lines.append((ticket, item['quantity']))
+
+    total_price = sum(float(ticket.price) * quantity for ticket, quantity in lines)
+    order = Order.objects.create(user=user, total_price=total_price, status='pending')
+    for ticket, quantity in lines:
+        ticket = Ticket.objects.get(id=ticket.id)
+        if ticket.quantity_available < quantity:
+            raise ValueError("Not enough tickets available")
+        ticket.quantity_available -= quantity
+        ticket.save()
+        db_models.Model.save(OrderItem(order=order, ticket=ticket, quantity=quantity, unit_price=ticket.price))
+    return order
+
+
+class Command(BaseCommand):
+    help = 'Concurrency stress benchmark for order reservation (legacy path vs reservation engine)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=2000)
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--tickets', type=int, default=20, help='ticket types on sale')
+        parser.add_argument('--stock', type=int, default=100, help='initial stock per ticket type')
+        parser.add_argument('--lines', type=int, default=3, help='max lines per order')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--json', action='store_true', help='print results as JSON')
+
+    def handle(self, *args, **options):
+        with benchmark_database():
+            results = {
+                'legacy': self.run_mode(legacy_create, options),
+                'engine': self.run_mode(reserve_order, options),
+            }
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        for mode, result in results.items():
+            self.stdout.write(
+                f"{mode:>7}: {result['orders_per_sec']:8.1f} orders/s  "
+                f"ok={result['succeeded']} rejected={result['rejected']} errors={result['errors']}  "
+                f"oversold={result['oversold_tickets']} drift={result['inventory_drift']}  "
+                f"p95={result['latency']['p95_ms']:.1f}ms"
+            )
+
+    def setup_data(self, options):
+        OrderItem.objects.all().delete()
+        Order.objects.all().delete()
+        Ticket.objects.all().delete()
+        Event.objects.all().delete()
+
+        users = list(User.objects.filter(username__startswith='bench').order_by('id'))
+        if not users:
+            users = make_users(options['threads'] * 4)
+        _, tickets = make_event(
+            users[0], 'Headline on-sale', options['tickets'], price='49.90', quantity=options['stock'],
+        )
+        return users, tickets
+
+    def run_mode(self, create, options):
+        users, ticket_ids = self.setup_data(options)
+        rng = random.Random(options['seed'])
+        jobs = [
+            (
+                users[i % len(users)],
+                [
+                    {'ticket_id': ticket_id, 'quantity': rng.randint(1, 4)}
+                    for ticket_id in rng.sample(ticket_ids, rng.randint(1, options['lines']))
+                ],
+            )
+            for i in range(options['orders'])
+        ]
+
+        results, elapsed = run_concurrently(lambda job: create(*job), jobs, options['threads'])
+
+        succeeded = [t for outcome, t in results if isinstance(outcome, Order)]
+        rejected = sum(1 for outcome, _ in results if isinstance(outcome, (ReservationError, ValueError)))
+        errors = len(results) - len(succeeded) - rejected
+
+        sold = dict(
+            OrderItem.objects.values('ticket').annotate(total=Sum('quantity')).values_list('ticket', 'total')
+        )
+        oversold = drift = 0
+        for ticket_id, remaining in Ticket.objects.values_list('id', 'quantity_available'):
+            taken = sold.get(ticket_id, 0)
+            oversold += taken > options['stock']
+            drift += options['stock'] - taken != remaining
+
+        return {
+            'orders_per_sec': len(succeeded) / elapsed if elapsed else 0.0,
+            'succeeded': len(succeeded),
+            'rejected': rejected,
+            'errors': errors,
+            'oversold_tickets': oversold,
+            'inventory_drift': drift,
+            'latency': summarize(succeeded),
+        }
@@ -0,0 +1,97 @@
+import json
+import random
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from bench.runner import benchmark_database, summarize
+from bench.seeding import make_events, make_users
+from events.models import Event
+from events.search import get_backend
+
+SYLLABLES = 'ka lo mi ne ru sa ti vo ze ba do fe gi ju ko la me no pe ri'.split()
+
+
+def vocabulary(rng, size):
+    """Synthetic words with Zipf-like frequencies, so queries hit realistic match counts"""
+    words = sorted({''.join(rng.choices(SYLLABLES, k=rng.randint(2, 4))) for _ in range(size * 2)})[:size]
+    rng.shuffle(words)
+    cum_weights, total = [], 0.0
+    for rank in range(1, len(words) + 1):
+        total += 1 / rank
+        cum_weights.append(total)
+    return words, cum_weights
+
+
+class Command(BaseCommand):
+    help = 'Benchmark event search: icontains (DRF SearchFilter) vs the full-text backend'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--events', type=int, default=50_000)
+        parser.add_argument('--description-words', type=int, default=120)
+        parser.add_argument('--vocabulary', type=int, default=20_000)
+        parser.add_argument('--queries', type=int, default=30)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--json', action='store_true', help='print results as JSON')
+
+    def handle(self, *args, **options):
+        with benchmark_database():
+            self.seed(options)
+            results = self.run(options)
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        self.stdout.write(f"backend: {results.pop('backend')}")
+        for mode, latency in results.items():
+            self.stdout.write(
+                f"{mode:<20} p50={latency['p50_ms']:8.2f}ms p95={latency['p95_ms']:8.2f}ms "
+                f"p99={latency['p99_ms']:8.2f}ms"
+            )
+
+    def seed(self, options):
+        rng = random.Random(options['seed'])
+        words, weights = vocabulary(rng, options['vocabulary'])
+        organizer = make_users(1)[0]
+        make_events(
+            options['events'], organizer, spacing=timedelta(minutes=1),
+            title=lambda i: ' '.join(rng.choices(words, cum_weights=weights, k=4)).title(),
+            description=lambda i: ' '.join(rng.choices(words, cum_weights=weights, k=options['description_words'])),
+        )
+
+    def run(self, options):
+        rng = random.Random(options['seed'])
+        words, _ = vocabulary(rng, options['vocabulary'])
+        base = Event.objects.filter(is_active=True)
+        backend = get_backend()
+        # Skip the few stop-word-like heads of the distribution
+        searchable = words[20:2000]
+        terms = [' '.join(rng.sample(searchable, rng.randint(1, 2))) for _ in range(options['queries'])]
+        prefixes = [rng.choice(searchable)[:4] for _ in range(options['queries'])]
+
+        def icontains(text):
+            query = Q()
+            for token in text.split():
+                query &= Q(title__icontains=token) | Q(description__icontains=token)
+            return base.filter(query).order_by('-date')
+
+        modes = {
+            'icontains': (terms, icontains),
+            'full-text': (terms, lambda text: backend.search(base, text).order_by('-search_rank', '-date')),
+            'icontains prefix': (prefixes, icontains),
+            'full-text prefix': (prefixes, lambda text: backend.search(base, text).order_by('-search_rank')),
+        }
+
+        results = {'backend': type(backend).__name__}
+        for mode, (queries, build) in modes.items():
+            samples = []
+            for text in queries:
+                queryset = build(text)
+                started = time.perf_counter()
+                queryset.count()
+                list(queryset.values('id', 'title')[:10])
+                samples.append(time.perf_counter() - started)
+            results[mode] = summarize(samples)
+        return results
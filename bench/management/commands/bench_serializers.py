@@ -0,0 +1,108 @@
+import json
+import statistics
+import time
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Prefetch
+from django.test.utils import override_settings
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from bench.runner import benchmark_database
+from bench.seeding import make_categories, make_events, make_orders, make_tickets
+from events.models import Ticket, Order
+from events.renderers import FastJSONRenderer
+from events.serializers import EventSerializer, TicketSerializer, OrderSerializer
+from events.views import EventViewSet
+
+
+class Command(BaseCommand):
+    help = (
+        'Time serializing and rendering events, tickets and orders with DRF and with the '
+        'compiled serializers and fast renderer, per 1,000 rows, and check the bytes match'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000, help='events and orders to serialize')
+        parser.add_argument('--tickets', type=int, default=4, help='ticket tiers per event')
+        parser.add_argument('--repeat', type=int, default=5, help='runs per measurement; the median is kept')
+        parser.add_argument('--json', action='store_true', help='print results as JSON')
+
+    def handle(self, *args, **options):
+        with benchmark_database():
+            events, tickets, orders = self.seed(options)
+            cases = [
+                ('events', EventSerializer, events),
+                ('tickets', TicketSerializer, tickets),
+                ('orders', OrderSerializer, orders),
+            ]
+            results = {name: self.measure(serializer, rows, options['repeat']) for name, serializer, rows in cases}
+
+        mismatched = [name for name, result in results.items() if not result['identical']]
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+        else:
+            self.stdout.write(
+                f"{'per 1,000 rows':<16} {'drf serialize':>14} {'fast serialize':>15} "
+                f"{'drf render':>11} {'fast render':>12} {'speedup':>8}"
+            )
+            for name, result in results.items():
+                self.stdout.write(
+                    f"{name:<16} {result['drf_serialize_ms']:>12.1f}ms {result['fast_serialize_ms']:>13.1f}ms "
+                    f"{result['drf_render_ms']:>9.1f}ms {result['fast_render_ms']:>10.1f}ms "
+                    f"{result['speedup']:>7.1f}x"
+                )
+        if mismatched:
+            raise CommandError(f"Fast output differs from DRF's for: {', '.join(mismatched)}")
+
+    def seed(self, options):
+        rows = options['rows']
+        organizer = User.objects.create_user('organizer', email='organizer@example.com', password='x')
+        buyer = User.objects.create_user('buyer', email='buyer@example.com', password='x')
+        categories = make_categories(10)
+        now = timezone.now()
+        events = make_events(
+            rows, organizer, title=lambda i: f'Event {i} — Live', description='Lorem ipsum dolor sit amet ' * 4,
+            date=lambda i: now + timedelta(days=i, microseconds=i),
+            category=lambda i: categories[i % len(categories)] if i % 7 else None,
+        )
+        tickets = make_tickets(
+            events, options['tickets'], price=lambda event, j: f'{10 + j}.50', quantity=lambda event, j: 100 * (j % 3),
+        )
+        make_orders(rows, buyer, lambda i: [(tickets[(i * 3 + j) % len(tickets)], j + 1) for j in range(3)])
+
+        # The querysets the API serves these from
+        events = list(EventViewSet.queryset.order_by('-date'))
+        tickets = list(Ticket.objects.with_stock())
+        orders = list(Order.objects.select_related('user').prefetch_related(
+            'order_items',
+            Prefetch('order_items__ticket', queryset=Ticket.objects.with_stock()),
+            'order_items__ticket__event',
+        ).order_by('-created_at'))
+        return events, tickets, orders
+
+    def measure(self, serializer_class, rows, repeat):
+        def timed(func):
+            samples = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                value = func()
+                samples.append(time.perf_counter() - started)
+            return value, statistics.median(samples) * 1000 * 1000 / len(rows)
+
+        with override_settings(FAST_SERIALIZATION=False):
+            drf_data, drf_serialize = timed(lambda: serializer_class(rows, many=True).data)
+        fast_data, fast_serialize = timed(lambda: serializer_class(rows, many=True).data)
+        drf_bytes, drf_render = timed(lambda: JSONRenderer().render(drf_data))
+        fast_bytes, fast_render = timed(lambda: FastJSONRenderer().render(fast_data))
+        return {
+            'rows': len(rows),
+            'drf_serialize_ms': drf_serialize,
+            'fast_serialize_ms': fast_serialize,
+            'drf_render_ms': drf_render,
+            'fast_render_ms': fast_render,
+            'speedup': (drf_serialize + drf_render) / (fast_serialize + fast_render),
+            'identical': drf_bytes == fast_bytes,
+        }
@@ -0,0 +1,85 @@
+import json
+import random
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Sum
+
+from bench.runner import benchmark_database, run_concurrently, summarize
+from bench.seeding import make_event, make_users
+from events.inventory import shard_ticket, sync_sharded
+from events.models import Event, Ticket, Order, OrderItem
+from events.reservations import reserve_order, ReservationError
+
+
+class Command(BaseCommand):
+    help = 'Concurrent buyers on one hot ticket: single-row stock vs sharded stock'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=3000)
+        parser.add_argument('--threads', type=int, default=16)
+        parser.add_argument('--stock', type=int, default=4000, help='initial stock of the hot ticket')
+        parser.add_argument('--shards', default='8,32', help='comma separated shard counts to compare')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--json', action='store_true', help='print results as JSON')
+
+    def handle(self, *args, **options):
+        modes = [0] + [int(count) for count in options['shards'].split(',')]
+        with benchmark_database():
+            self.users = make_users(options['threads'] * 4)
+            results = {
+                ('single-row' if shards == 0 else f'{shards} shards'): self.run(shards, options)
+                for shards in modes
+            }
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        if connection.vendor == 'sqlite':
+            self.stdout.write('note: SQLite serializes every writer on one database lock, so sharding '
+                              'cannot reduce contention here; run against PostgreSQL to see it')
+        for mode, result in results.items():
+            self.stdout.write(
+                f"{mode:>11}: {result['orders_per_sec']:8.1f} orders/s  ok={result['succeeded']} "
+                f"sold out={result['rejected']} errors={result['errors']}  p95={result['latency']['p95_ms']:.1f}ms  "
+                f"oversold={result['oversold']} totals synced={result['totals_consistent']}"
+            )
+
+    def run(self, shards, options):
+        OrderItem.objects.all().delete()
+        Order.objects.all().delete()
+        Event.objects.all().delete()
+        event, tickets = make_event(
+            self.users[0], 'Headline on-sale', price='59.00', quantity=options['stock'], location='Stadium',
+        )
+        ticket = Ticket.objects.get(pk=tickets[0])
+        if shards:
+            shard_ticket(ticket, shards)
+
+        rng = random.Random(options['seed'])
+        jobs = [
+            (self.users[i % len(self.users)], [{'ticket_id': ticket.id, 'quantity': rng.randint(1, 2)}])
+            for i in range(options['orders'])
+        ]
+        results, elapsed = run_concurrently(lambda job: reserve_order(*job), jobs, options['threads'])
+
+        succeeded = [t for outcome, t in results if isinstance(outcome, Order)]
+        rejected = sum(isinstance(outcome, ReservationError) for outcome, _ in results)
+        errors = [outcome for outcome, _ in results if not isinstance(outcome, (Order, ReservationError))]
+        if errors:
+            self.stderr.write(f"{len(errors)} errors, e.g. {errors[0]!r}")
+
+        sold = OrderItem.objects.aggregate(total=Sum('quantity'))['total'] or 0
+        ticket = Ticket.objects.with_stock().get(pk=ticket.pk)
+        sync_sharded()
+        ticket.refresh_from_db()
+        event.refresh_from_db()
+        return {
+            'orders_per_sec': len(succeeded) / elapsed if elapsed else 0.0,
+            'succeeded': len(succeeded),
+            'rejected': rejected,
+            'errors': len(errors),
+            'oversold': sold > options['stock'] or sold + ticket.stock != options['stock'],
+            'totals_consistent': ticket.quantity_available == event.tickets_remaining == options['stock'] - sold,
+            'latency': summarize(succeeded),
+        }
@@ -0,0 +1,109 @@
+import json
+import pickle
+import statistics
+import time
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+from django.utils import timezone
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from rest_framework.throttling import UserRateThrottle
+
+from bench.runner import benchmark_database
+from events.models import ThrottleCounter
+from events.throttling import CacheThrottleBackend, SlidingWindowThrottle
+
+BACKENDS = {
+    'sliding (cache)': 'events.throttling.CacheThrottleBackend',
+    'sliding (database)': 'events.throttling.DatabaseThrottleBackend',
+}
+
+
+class View:
+    action = 'list'
+
+
+class Command(BaseCommand):
+    help = (
+        "allow_request() of DRF's UserRateThrottle, which keeps a timestamp per request, against "
+        'SlidingWindowThrottle on each backend, with clients that have already made some requests'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rate', type=int, default=10_000, help='requests per hour allowed')
+        parser.add_argument('--clients', type=int, default=100)
+        parser.add_argument('--fill', type=int, nargs='+', default=[0, 100, 1000, 5000],
+                            help='requests each client has made in the period already')
+        parser.add_argument('--requests', type=int, default=2000, help='timed requests per round')
+        parser.add_argument('--rounds', type=int, default=5)
+        parser.add_argument('--json', action='store_true', help='print results as JSON')
+
+    def handle(self, *args, **options):
+        rates = {'user': f"{options['rate']}/hour"}
+        stock = type('StockThrottle', (UserRateThrottle,), {'THROTTLE_RATES': rates})
+        sliding = type('BenchSlidingWindowThrottle', (SlidingWindowThrottle,), {'THROTTLE_RATES': rates})
+        factory = APIRequestFactory()
+        requests = []
+        for pk in range(1, options['clients'] + 1):
+            request = Request(factory.get('/'))
+            request.user = User(pk=pk, username=f'client{pk}')
+            requests.append(request)
+
+        results = {}
+        with benchmark_database():
+            for fill in options['fill']:
+                results[f'stock, {fill} made'] = self.measure(stock, requests, fill, self.fill_stock, options)
+                for name, backend in BACKENDS.items():
+                    with override_settings(THROTTLE_BACKEND=backend):
+                        results[f'{name}, {fill} made'] = self.measure(
+                            sliding, requests, fill, self.fill_sliding, options,
+                        )
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        self.stdout.write(f"{'throttle':<32} {'per request':>12} {'stored per client':>18}")
+        for name, result in results.items():
+            self.stdout.write(f"{name:<32} {result['us']:>10.1f}us {result['bytes']:>16}B")
+
+    def measure(self, throttle, requests, fill, prefill, options):
+        caches['default'].clear()
+        caches['throttle'].clear()
+        ThrottleCounter.objects.all().delete()
+        stored = prefill(throttle, requests, fill)
+        timings = []
+        for _ in range(options['rounds']):
+            started = time.perf_counter()
+            for i in range(options['requests']):
+                throttle().allow_request(requests[i % len(requests)], View())
+            timings.append((time.perf_counter() - started) / options['requests'])
+        return {'us': statistics.median(timings) * 1e6, 'bytes': stored}
+
+    def fill_stock(self, throttle, requests, fill):
+        # Made over the last half hour, newest first as the throttle keeps them
+        now = time.time()
+        history = [now - 1800 * i / max(fill, 1) for i in range(fill)]
+        for request in requests:
+            throttle.cache.set(throttle().get_cache_key(request, View()), history, 3600)
+        return len(pickle.dumps(history))
+
+    def fill_sliding(self, throttle, requests, fill):
+        # All in the previous window, as the stock throttle's were made before now
+        throttle = throttle()
+        # Resolves the rate and backend
+        throttle.allow_request(requests[0], View())
+        window = int(throttle.timer() // throttle.duration) - 1
+        keys = [f'{throttle.get_cache_key(request, View())}:{window}' for request in requests]
+        if isinstance(throttle.backend, CacheThrottleBackend):
+            throttle.backend.cache.set_many(dict.fromkeys(keys, fill), 2 * throttle.duration)
+        else:
+            expires_at = timezone.now() + timedelta(seconds=throttle.duration)
+            ThrottleCounter.objects.bulk_create(
+                [ThrottleCounter(key=key, hits=fill, expires_at=expires_at) for key in keys]
+            )
+        # Two counters
+        return 2 * len(pickle.dumps(fill))
@@ -0,0 +1,232 @@
+import json
+import logging
+import random
+import threading
+from urllib.parse import urlsplit
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve
+from rest_framework.test import APIClient
+
+from bench.runner import benchmark_database, run_concurrently, summarize
+from bench.traffic import SCENARIOS, Scale, generate, read_traffic, routes, seed, url_patterns, write_traffic
+from events.caching import catalogue_cache
+from users.serializers import TokenObtainPairSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a dataset at scale and send a weighted mix of requests over every API route, '
+        'or replay a saved traffic file; reports throughput, latency percentiles and queries '
+        'per request by route, and compares them with a baseline run'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=Scale.users)
+        parser.add_argument('--categories', type=int, default=Scale.categories)
+        parser.add_argument('--events', type=int, default=Scale.events)
+        parser.add_argument('--tickets-per-event', type=int, default=Scale.tickets_per_event)
+        parser.add_argument('--orders', type=int, default=Scale.orders)
+        parser.add_argument('--requests', type=int, default=2000)
+        parser.add_argument('--threads', type=int, default=4)
+        parser.add_argument('--seed', type=int, default=21)
+        parser.add_argument(
+            '--replay', metavar='PATH',
+            help='send the requests of a traffic file (JSON lines) instead of a generated mix; '
+                 'ids in it refer to the dataset of the same --seed and scale',
+        )
+        parser.add_argument('--save-traffic', metavar='PATH', help='write the requests sent as a traffic file')
+        parser.add_argument('--output', metavar='PATH', help='write the results as JSON, e.g. as a CI baseline')
+        parser.add_argument('--baseline', metavar='PATH', help='fail on regressions against these saved results')
+        parser.add_argument('--latency-tolerance', type=float, default=0.25,
+                            help='allowed p95 and throughput change against the baseline, as a fraction')
+        parser.add_argument('--latency-slack-ms', type=float, default=1.0,
+                            help='p95 growth always allowed, as sub-millisecond timings are noisy')
+        parser.add_argument('--min-samples', type=int, default=20,
+                            help='requests a route needs in both runs for its p95 to be compared')
+        parser.add_argument('--throttle', action='store_true', help='keep the API rate throttles on')
+        parser.add_argument('--json', action='store_true', help='print results as JSON')
+
+    def handle(self, *args, **options):
+        if not options['replay']:
+            missing = routes() - SCENARIOS.keys()
+            if missing:
+                raise CommandError(
+                    'No traffic scenario for ' + ', '.join(f'{method} {route}' for route, method in sorted(missing))
+                )
+        scale = Scale(
+            users=options['users'], categories=options['categories'], events=options['events'],
+            tickets_per_event=options['tickets_per_event'], orders=options['orders'],
+        )
+
+        with benchmark_database():
+            rng = random.Random(options['seed'])
+            data = seed(scale, rng)
+            if options['replay']:
+                requests = read_traffic(options['replay'])
+            else:
+                requests = generate(data, options['requests'], rng)
+            if options['save_traffic']:
+                write_traffic(options['save_traffic'], requests)
+
+            views = {pattern.callback.cls for pattern in url_patterns()}
+            throttles = {view: view.throttle_classes for view in views}
+            if not options['throttle']:
+                for view in views:
+                    view.throttle_classes = []
+            # Expected 4xx answers would otherwise log a warning each
+            request_log = logging.getLogger('django.request')
+            log_level = request_log.level
+            request_log.setLevel(logging.ERROR)
+            try:
+                catalogue_cache().clear()
+                results = self.run(requests, options)
+            finally:
+                request_log.setLevel(log_level)
+                for view, classes in throttles.items():
+                    view.throttle_classes = classes
+        results['config'] = {
+            **vars(scale), 'seed': options['seed'], 'threads': options['threads'],
+            'replay': options['replay'], 'throttle': options['throttle'], 'vendor': connection.vendor,
+        }
+
+        if options['output']:
+            with open(options['output'], 'w') as out:
+                json.dump(results, out, indent=2)
+        regressions = self.compare(results, options) if options['baseline'] else []
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+        else:
+            self.report(results)
+        for regression in regressions:
+            self.stderr.write(regression)
+        if results['total']['errors']:
+            raise CommandError(f"{results['total']['errors']} request(s) failed or got an unexpected status")
+        if regressions:
+            raise CommandError(f'{len(regressions)} regression(s) against {options["baseline"]}')
+
+    def prepare(self, requests):
+        """(key, method, path, body, headers, expected statuses) per request, tokens issued up front"""
+        usernames = {request['user'] for request in requests if request.get('user')}
+        usernames |= {
+            body['refresh'][len('{refresh:'):-1] for body in (request.get('body') for request in requests)
+            if isinstance(body, dict) and str(body.get('refresh')).startswith('{refresh:')
+        }
+        users = {user.username: user for user in User.objects.filter(username__in=usernames)}
+        # Tokens as login issues them, with the claims StatelessJWTAuthentication reads
+        get_token = TokenObtainPairSerializer.get_token
+        access = {username: str(get_token(user).access_token) for username, user in users.items()}
+        jobs = []
+        for request in requests:
+            method, path = request['method'].upper(), request['path']
+            route = request.get('route') or resolve(urlsplit(path).path).url_name
+            body, headers = request.get('body'), {}
+            if request.get('user'):
+                headers['HTTP_AUTHORIZATION'] = f"Bearer {access[request['user']]}"
+            if isinstance(body, dict) and str(body.get('refresh')).startswith('{refresh:'):
+                # A fresh one each time, so rotation or logout can't invalidate a token still queued
+                body = {'refresh': str(get_token(users[body['refresh'][len('{refresh:'):-1]]))}
+            if 'expect' in request:
+                expected = set(request['expect'])
+            elif (route, method) in SCENARIOS:
+                expected = SCENARIOS[route, method][2]
+            else:
+                expected = None
+            jobs.append((f'{method} {route}', method, path, body, headers, expected))
+        return jobs
+
+    def run(self, requests, options):
+        jobs = self.prepare(requests)
+        local = threading.local()
+
+        def work(job):
+            key, method, path, body, headers, expected = job
+            if not hasattr(local, 'client'):
+                # A server error is a 500 of its route rather than an exception out of the client
+                local.client = APIClient(raise_request_exception=False)
+            with CaptureQueriesContext(connection) as queries:
+                response = local.client.generic(
+                    method, path, json.dumps(body) if body is not None else '',
+                    content_type='application/json', **headers,
+                )
+            ok = response.status_code in expected if expected else response.status_code < 400
+            # With --throttle, a 429 is the throttle working, not a failure
+            ok = ok or (options['throttle'] and response.status_code == 429)
+            return key, response.status_code, ok, len(queries.captured_queries)
+
+        # run_concurrently pops from the end; keep the traffic order
+        results, elapsed = run_concurrently(work, reversed(jobs), options['threads'])
+
+        by_route = {}
+        for outcome, seconds in results:
+            if isinstance(outcome, Exception):
+                key, status, ok, queries = 'exception', type(outcome).__name__, False, 0
+            else:
+                key, status, ok, queries = outcome
+            route = by_route.setdefault(key, {'samples': [], 'queries': [], 'statuses': {}, 'errors': 0})
+            route['samples'].append(seconds)
+            route['queries'].append(queries)
+            route['statuses'][str(status)] = route['statuses'].get(str(status), 0) + 1
+            route['errors'] += not ok
+
+        def summary(samples, queries, errors):
+            return {
+                **summarize(samples), 'errors': errors,
+                'queries_mean': sum(queries) / len(queries) if queries else 0.0,
+                'queries_max': max(queries, default=0),
+            }
+
+        return {
+            'total': {
+                **summary(
+                    [seconds for _, seconds in results],
+                    [query for route in by_route.values() for query in route['queries']],
+                    sum(route['errors'] for route in by_route.values()),
+                ),
+                'requests_per_sec': len(results) / elapsed if elapsed else 0.0,
+                'elapsed_s': elapsed,
+            },
+            'routes': {
+                key: {**summary(route['samples'], route['queries'], route['errors']), 'statuses': route['statuses']}
+                for key, route in sorted(by_route.items())
+            },
+        }
+
+    def compare(self, results, options):
+        with open(options['baseline']) as baseline_file:
+            baseline = json.load(baseline_file)
+        tolerance, slack = options['latency_tolerance'], options['latency_slack_ms']
+        regressions = []
+        old_rps, new_rps = baseline['total']['requests_per_sec'], results['total']['requests_per_sec']
+        if new_rps < old_rps * (1 - tolerance):
+            regressions.append(f'throughput {new_rps:.1f} req/s, baseline {old_rps:.1f}')
+        for key, new in results['routes'].items():
+            old = baseline['routes'].get(key)
+            # A handful of samples has no stable p95
+            if old is None or min(old['count'], new['count']) < options['min_samples']:
+                continue
+            if new['p95_ms'] > old['p95_ms'] * (1 + tolerance) + slack:
+                regressions.append(f"{key}: p95 {new['p95_ms']:.1f}ms, baseline {old['p95_ms']:.1f}ms")
+            # Query counts are deterministic; half a query on average is a new query on some path
+            if new['queries_mean'] > old['queries_mean'] + 0.5:
+                regressions.append(
+                    f"{key}: {new['queries_mean']:.1f} queries per request, baseline {old['queries_mean']:.1f}"
+                )
+        return regressions
+
+    def report(self, results):
+        self.stdout.write(
+            f"{'route':<28} {'count':>6} {'errors':>6} {'p50':>8} {'p95':>8} {'p99':>8} {'queries':>8}"
+        )
+        rows = sorted(results['routes'].items(), key=lambda item: -item[1]['count'])
+        for key, route in rows + [('total', results['total'])]:
+            self.stdout.write(
+                f"{key:<28} {route['count']:>6} {route['errors']:>6} {route['p50_ms']:>6.1f}ms "
+                f"{route['p95_ms']:>6.1f}ms {route['p99_ms']:>6.1f}ms {route['queries_mean']:>8.1f}"
+            )
+        self.stdout.write(
+            f"{results['total']['requests_per_sec']:.1f} req/s over {results['total']['elapsed_s']:.1f}s"
+        )
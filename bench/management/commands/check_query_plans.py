@@ -0,0 +1,119 @@
+import json
+import random
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from bench.runner import benchmark_database, query_plan
+from bench.seeding import analyze, make_categories, make_events, make_orders, make_tickets, make_users
+from events.caching import catalogue_cache
+from events.views import EventViewSet, OrderViewSet
+
+# Tables large enough in production that a full scan is a bug
+CHECKED_TABLES = {'events_event', 'events_ticket', 'events_order', 'events_orderitem'}
+
+
+class Command(BaseCommand):
+    help = (
+        'EXPLAIN every query of the hot list and detail endpoints and fail if one of them reads '
+        'events, tickets, orders or order lines without an index, or sorts all matches to cut a page'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=5000, help='events and orders to seed')
+        parser.add_argument('--verbose-plans', action='store_true', help='print every plan')
+        parser.add_argument('--json', action='store_true', help='print results as JSON')
+
+    def handle(self, *args, **options):
+        with benchmark_database():
+            buyer, event, order = self.seed(options['rows'])
+            results = self.explain(buyer, event, order)
+
+        failures = [name for name, result in results.items() if result['full_scans'] or result['sorted_pages']]
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+        else:
+            for name, result in results.items():
+                problems = [f'full scan of {table}' for table in result['full_scans']]
+                problems += [f'{count} sorted page(s)' for count in [result['sorted_pages']] if count]
+                self.stdout.write(f"{name:<24} {result['queries']:>3} queries  {', '.join(problems) or 'ok'}")
+                if options['verbose_plans'] or problems:
+                    for sql, plan in result['plans']:
+                        self.stdout.write(f'    {sql[:160]}')
+                        for line in plan:
+                            self.stdout.write(f'        {line}')
+        if failures:
+            raise CommandError(f"Queries without a usable index on: {', '.join(failures)}")
+
+    def seed(self, rows):
+        rng = random.Random(20)
+        organizer = User.objects.create_user('organizer', password='x')
+        buyer = User.objects.create_user('buyer', password='x')
+        others = make_users(50, prefix='user')
+        categories = make_categories(20)
+        events = make_events(
+            rows, organizer, spacing=timedelta(hours=1),
+            category=lambda i: rng.choice(categories), is_active=lambda i: i % 10 != 0,
+        )
+        tickets = make_tickets(
+            events, price=lambda event, j: f'{10 + j * 5}.00', quantity=lambda event, j: rng.choice([0, 50]),
+        )
+        statuses = ['pending', 'completed', 'completed', 'canceled']
+        orders = make_orders(
+            rows, lambda i: buyer if i % 5 == 0 else rng.choice(others),
+            lambda i: [(ticket, 2) for ticket in rng.sample(tickets, 2)], status=lambda i: rng.choice(statuses),
+        )
+        analyze()
+        # The first order is the buyer's
+        return buyer, events[1], orders[0]
+
+    def explain(self, buyer, event, order):
+        anon, customer = APIClient(), APIClient()
+        customer.force_authenticate(buyer)
+        requests = [
+            ('event-list', anon, reverse('event-list'), {}),
+            ('event-list?cursor', anon, reverse('event-list'), {'cursor': ''}),
+            ('event-list?category', anon, reverse('event-list'), {'category': 'Category 3'}),
+            ('event-list?date', anon, reverse('event-list'), {'date_from': timezone.now().isoformat()}),
+            ('event-list?price', anon, reverse('event-list'), {'min_price': 20}),
+            ('event-detail', anon, reverse('event-detail', args=[event]), {}),
+            ('event-tickets', anon, reverse('event-tickets', args=[event]), {}),
+            ('order-list', customer, reverse('order-list'), {}),
+            ('order-list?cursor', customer, reverse('order-list'), {'cursor': ''}),
+            ('order-list?status', customer, reverse('order-list'), {'status': 'pending'}),
+            ('order-detail', customer, reverse('order-detail', args=[order]), {}),
+        ]
+
+        throttles = EventViewSet.throttle_classes, OrderViewSet.throttle_classes
+        EventViewSet.throttle_classes = OrderViewSet.throttle_classes = []
+        results = {}
+        try:
+            for name, client, url, params in requests:
+                catalogue_cache().clear()
+                with CaptureQueriesContext(connection) as queries:
+                    response = client.get(url, params)
+                if response.status_code != 200:
+                    raise CommandError(f"{name} returned {response.status_code}: {response.content[:200]!r}")
+                plans, scans, sorted_pages = [], [], 0
+                for query in queries.captured_queries:
+                    sql = query['sql']
+                    if not sql.startswith('SELECT'):
+                        continue
+                    plan, full_scans, sorts = query_plan(sql)
+                    plans.append((sql, plan))
+                    scans.extend(table for table in full_scans if table in CHECKED_TABLES)
+                    # Sorting a prefetch of a page's rows is fine; sorting every match to return a page is not
+                    sorted_pages += sorts and ' LIMIT ' in sql
+                results[name] = {
+                    'queries': len(plans), 'full_scans': sorted(set(scans)), 'sorted_pages': sorted_pages,
+                    'plans': plans,
+                }
+        finally:
+            EventViewSet.throttle_classes, OrderViewSet.throttle_classes = throttles
+        return results
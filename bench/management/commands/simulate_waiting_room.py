@@ -0,0 +1,190 @@
+import json
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from bench.runner import benchmark_database, run_concurrently, summarize
+from bench.seeding import make_event, make_users
+from events import waiting_room
+from events.models import Event, Order, OrderItem, QueueEntry, AdmissionQueue
+from events.views import OrderViewSet
+
+BACKENDS = {
+    'database': 'events.waiting_room.DatabaseQueueBackend',
+    'cache': 'events.waiting_room.CacheQueueBackend',
+}
+
+
+class InFlight:
+    """Counts SQL statements executing at the same time across threads"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.current = self.peak = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        with self.lock:
+            self.current += 1
+            self.peak = max(self.peak, self.current)
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            with self.lock:
+                self.current -= 1
+
+    @contextmanager
+    def tracking(self):
+        with connection.execute_wrapper(self):
+            yield
+
+
+class Command(BaseCommand):
+    help = 'Load simulation: simultaneous arrivals through the waiting room vs straight at order creation'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--arrivals', type=int, default=50_000)
+        parser.add_argument('--threads', type=int, default=16, help='concurrent clients (server workers)')
+        parser.add_argument('--rate', type=int, default=50, help='admissions per second')
+        parser.add_argument('--order-seconds', type=float, default=5.0,
+                            help='seconds of the admission schedule to play out with real orders')
+        parser.add_argument('--backend', choices=['all', *BACKENDS], default='all')
+        parser.add_argument('--json', action='store_true', help='print results as JSON')
+
+    def handle(self, *args, **options):
+        backends = list(BACKENDS) if options['backend'] == 'all' else [options['backend']]
+        # Measure the waiting room, not the per-user throttle
+        throttle_classes, OrderViewSet.throttle_classes = OrderViewSet.throttle_classes, []
+        try:
+            with benchmark_database(), override_settings(WAITING_ROOM_RATE=options['rate']):
+                self.users = make_users(options['arrivals'])
+                results = {name: self.run(BACKENDS[name], options) for name in backends}
+                results['no_waiting_room'] = self.stampede(options)
+        finally:
+            OrderViewSet.throttle_classes = throttle_classes
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        for name in backends:
+            result = results[name]
+            self.stdout.write(
+                f"{name:>8} backend: {result['arrivals']} joins at {result['joins_per_sec']:.0f}/s "
+                f"(p95 {result['join_latency']['p95_ms']:.1f}ms, peak concurrent SQL {result['join_peak_sql']}); "
+                f"busiest second admits {result['max_admitted_per_second']}, drains in {result['drain_seconds']:.0f}s"
+            )
+            self.stdout.write(
+                f"{'':>17}{result['orders']} orders paced at {options['rate']}/s: peak concurrent SQL "
+                f"{result['order_peak_sql']}, order p95 {result['order_latency']['p95_ms']:.1f}ms"
+            )
+        stampede = results['no_waiting_room']
+        self.stdout.write(
+            f"no waiting room: {stampede['orders']} orders at once: peak concurrent SQL "
+            f"{stampede['order_peak_sql']}, order p95 {stampede['order_latency']['p95_ms']:.1f}ms"
+        )
+
+    def setup_event(self, gated):
+        OrderItem.objects.all().delete()
+        Order.objects.all().delete()
+        Event.objects.all().delete()
+        event, tickets = make_event(
+            self.users[0], 'Stadium tour', price='80.00', quantity=10 ** 6, location='Stadium', waiting_room=gated,
+        )
+        return event, tickets[0]
+
+    def run(self, backend_path, options):
+        with override_settings(WAITING_ROOM_BACKEND=backend_path):
+            event, ticket = self.setup_event(gated=True)
+            backend = waiting_room.get_backend()
+
+            # Everyone arrives at the same instant
+            opened = timezone.now()
+            tracker = InFlight()
+
+            def arrive(user):
+                with tracker.tracking():
+                    return waiting_room.join(event.id, user.id, now=opened, backend=backend)
+
+            joins, elapsed = run_concurrently(arrive, self.users, options['threads'])
+            errors = [outcome for outcome, _ in joins if isinstance(outcome, Exception)]
+            if errors:
+                raise errors[0]
+            entries = {user.id: backend.entry(event.id, user.id) for user in self.users}
+            per_second = Counter(int((entry.admit_at - opened).total_seconds()) for entry in entries.values())
+            last = max(entry.admit_at for entry in entries.values())
+
+            # Play out the start of the schedule in real time with real orders
+            horizon = opened + timedelta(seconds=options['order_seconds'])
+            admitted = [user for user in self.users if entries[user.id].admit_at < horizon]
+            shift = timezone.now() - opened
+            order_tracker = InFlight()
+            local = threading.local()
+
+            def buy(user):
+                if not hasattr(local, 'client'):
+                    local.client = APIClient()
+                delay = (entries[user.id].admit_at + shift - timezone.now()).total_seconds()
+                if delay > 0:
+                    time.sleep(delay)
+                local.client.force_authenticate(user)
+                started = time.perf_counter()
+                with order_tracker.tracking():
+                    entry = backend.entry(event.id, user.id)
+                    token = waiting_room.make_token(event.id, user.id, entry.seq)
+                    response = local.client.post(
+                        reverse('order-list'), [{'ticket_id': ticket, 'quantity': 1}], format='json',
+                        HTTP_X_ADMISSION_TOKEN=token,
+                    )
+                assert response.status_code == 201, response.data
+                return time.perf_counter() - started
+
+            orders, _ = run_concurrently(buy, admitted, options['threads'])
+            failures = [outcome for outcome, _ in orders if isinstance(outcome, Exception)]
+            if failures:
+                self.stderr.write(f"{len(failures)} orders failed, e.g. {failures[0]!r}")
+
+            QueueEntry.objects.all().delete()
+            AdmissionQueue.objects.all().delete()
+            return {
+                'arrivals': len(joins),
+                'joins_per_sec': len(joins) / elapsed,
+                'join_latency': summarize([t for _, t in joins]),
+                'join_peak_sql': tracker.peak,
+                'max_admitted_per_second': max(per_second.values()),
+                'drain_seconds': (last - opened).total_seconds(),
+                'orders': len(admitted) - len(failures),
+                'order_peak_sql': order_tracker.peak,
+                'order_latency': summarize([outcome for outcome, _ in orders if not isinstance(outcome, Exception)]),
+            }
+
+    def stampede(self, options):
+        """The same number of buyers as one admission window, all ordering at once"""
+        event, ticket = self.setup_event(gated=False)
+        buyers = self.users[:int(options['rate'] * options['order_seconds'])]
+        tracker = InFlight()
+        local = threading.local()
+
+        def buy(user):
+            if not hasattr(local, 'client'):
+                local.client = APIClient()
+            local.client.force_authenticate(user)
+            with tracker.tracking():
+                response = local.client.post(
+                    reverse('order-list'), [{'ticket_id': ticket, 'quantity': 1}], format='json',
+                )
+            assert response.status_code == 201, response.data
+
+        orders, _ = run_concurrently(buy, buyers, options['threads'])
+        return {
+            'orders': len(orders),
+            'order_peak_sql': tracker.peak,
+            'order_latency': summarize([t for outcome, t in orders if not isinstance(outcome, Exception)]),
+        }
@@ -0,0 +1,136 @@
+"""Running and measuring the benchmarks; bench.seeding builds their data."""
+import os
+import re
+import statistics
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+from django.db import connection, connections, transaction
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+
+
+@contextmanager
+def benchmark_database():
+    """
+    Run a benchmark against a throwaway test database so it never touches
+    real data. The test environment is set up too, so API clients work.
+    SQLite gets a file instead of the in-memory default, so the
+    worker threads of concurrent benchmarks share one database. Replica
+    routing is off, as the replicas don't mirror the throwaway database.
+    """
+    old_name = connection.settings_dict['NAME']
+    tmpdir = None
+    if connection.vendor == 'sqlite':
+        tmpdir = tempfile.mkdtemp(prefix='iticket-bench-')
+        connection.settings_dict['TEST']['NAME'] = os.path.join(tmpdir, 'bench.sqlite3')
+    setup_test_environment()
+    connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    try:
+        with override_settings(DATABASE_REPLICAS=[]):
+            yield
+    finally:
+        connections.close_all()
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+        if tmpdir:
+            for name in os.listdir(tmpdir):
+                os.remove(os.path.join(tmpdir, name))
+            os.rmdir(tmpdir)
+
+
+def run_concurrently(worker, jobs, threads):
+    """
+    Feed ``jobs`` to ``threads`` workers, each with its own DB connection.
+    Returns ``(results, elapsed_seconds)``.
+    """
+    jobs = list(jobs)
+    results = []
+    lock = threading.Lock()
+
+    def run():
+        try:
+            while True:
+                with lock:
+                    if not jobs:
+                        return
+                    job = jobs.pop()
+                started = time.perf_counter()
+                try:
+                    outcome = worker(job)
+                except Exception as exc:
+                    outcome = exc
+                elapsed = time.perf_counter() - started
+                with lock:
+                    results.append((outcome, elapsed))
+        finally:
+            connections.close_all()
+
+    pool = [threading.Thread(target=run) for _ in range(threads)]
+    started = time.perf_counter()
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    return results, time.perf_counter() - started
+
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(samples):
+    """Latency summary in milliseconds"""
+    return {
+        'count': len(samples),
+        'mean_ms': statistics.fmean(samples) * 1000 if samples else 0.0,
+        'p50_ms': percentile(samples, 50) * 1000,
+        'p95_ms': percentile(samples, 95) * 1000,
+        'p99_ms': percentile(samples, 99) * 1000,
+    }
+
+
+# Tables, with Django's subquery/join aliases (U0, T3, ...), in a FROM or JOIN clause
+_TABLE_RE = re.compile(r'(?:FROM|JOIN)\s+"(\w+)"(?:\s+(?:AS\s+)?([A-Z]\d+)\b)?')
+_SQLITE_SCAN_RE = re.compile(r'^SCAN (\w+)$')
+
+
+def query_plan(sql, params=None):
+    """
+    ``(plan, full_scans, sorts)`` for a query, e.g. a captured one: the plan as text
+    lines, the tables read without an index, and whether rows are sorted
+    rather than read in index order. PostgreSQL plans with sequential
+    scans disabled, so a scan means no usable index rather than a planner
+    preference on a small table.
+    """
+    tables = {}
+    for table, alias in _TABLE_RE.findall(sql):
+        tables[table] = table
+        if alias:
+            tables[alias] = table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            plan = [row[3] for row in cursor.fetchall()]
+            scans = [_SQLITE_SCAN_RE.match(line) for line in plan]
+            sorts = 'USE TEMP B-TREE FOR ORDER BY' in plan
+            return plan, [tables.get(scan[1], scan[1]) for scan in scans if scan], sorts
+        with transaction.atomic():
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+            root = cursor.fetchone()[0][0]['Plan']
+    plan, scans, sorts, nodes = [], [], False, [(root, 0)]
+    while nodes:
+        node, depth = nodes.pop()
+        relation = node.get('Relation Name')
+        plan.append('  ' * depth + node['Node Type'] + (f' on {relation}' if relation else ''))
+        if node['Node Type'] == 'Seq Scan':
+            scans.append(relation)
+        sorts = sorts or node['Node Type'] == 'Sort'
+        nodes.extend((child, depth + 1) for child in reversed(node.get('Plans', [])))
+    return plan, scans, sorts
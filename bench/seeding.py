@@ -0,0 +1,141 @@
+"""
+Bulk seeding for the benchmarks.
+
+Every benchmark builds its data from the same steps: users, categories,
+events, ticket tiers per event, then orders and their lines. Each helper
+inserts its step in chunks with ``bulk_create`` and leaves the
+denormalized columns right (the events' price and stock summary, the
+orders' line summary). Per-row values are constants or callables of the
+row, so a benchmark only spells out what is particular to its data.
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.utils import timezone
+
+from events.models import Category, Event, Ticket, Order, OrderItem
+
+CHUNK = 5000
+
+
+def _value(spec, *args):
+    return spec(*args) if callable(spec) else spec
+
+
+def _pk(instance):
+    return getattr(instance, 'pk', instance)
+
+
+def _chunks(count, size=CHUNK):
+    for start in range(0, count, size):
+        yield range(start, min(count, start + size))
+
+
+def analyze():
+    """Refresh the planner statistics after a bulk load"""
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+
+
+def make_users(count, prefix='bench', **fields):
+    User.objects.bulk_create(
+        [User(username=f'{prefix}{i}', **fields) for i in range(count)], batch_size=1000
+    )
+    return list(User.objects.filter(username__startswith=prefix).order_by('id'))
+
+
+def make_categories(count):
+    return Category.objects.bulk_create([Category(name=f'Category {i}') for i in range(count)])
+
+
+def make_events(count, organizer=None, categories=(), spacing=timedelta(days=1), **fields):
+    """
+    ``count`` events ``spacing`` apart from now, round-robin over
+    ``categories``; returns their ids. ``fields`` set or override columns,
+    as values or callables of the event's index, e.g.
+    ``is_active=lambda i: i % 10 != 0``.
+    """
+    now = timezone.now()
+    specs = {
+        'title': lambda i: f'Event {i}', 'description': 'Lorem ipsum',
+        'date': lambda i: now + spacing * i, 'location': 'Hall',
+    }
+    if organizer is not None:
+        specs['organizer'] = organizer
+    if categories:
+        specs['category'] = lambda i: categories[i % len(categories)]
+    specs.update(fields)
+    ids = []
+    for rows in _chunks(count):
+        ids += [event.pk for event in Event.objects.bulk_create([
+            Event(**{name: _value(spec, i) for name, spec in specs.items()}) for i in rows
+        ], batch_size=1000)]
+    return ids
+
+
+def make_tickets(events, tiers=4, price=lambda event, j: f'{10 + j}.00', quantity=100):
+    """
+    ``tiers`` tickets for each of ``events`` (ids), then the events'
+    summaries; returns the tickets' ids. ``price`` and ``quantity`` are
+    values or callables of ``(event id, tier)``.
+    """
+    ids = []
+    step = max(1, CHUNK // max(1, tiers))
+    for start in range(0, len(events), step):
+        ids += [ticket.pk for ticket in Ticket.objects.bulk_create([
+            Ticket(
+                event_id=event, name=f'Tier {j}', price=_value(price, event, j),
+                quantity_available=_value(quantity, event, j),
+            )
+            for event in events[start:start + step]
+            for j in range(tiers)
+        ], batch_size=1000)]
+    Event.objects.refresh_summary()
+    return ids
+
+
+def make_event(organizer, title, tiers=1, price='20.00', quantity=1000, **fields):
+    """The one event on sale now of the on-sale benchmarks; returns it and its tickets' ids"""
+    event = Event.objects.create(**{
+        'title': title, 'description': '', 'date': timezone.now(), 'location': 'Arena',
+        'organizer': organizer, 'category': Category.objects.get_or_create(name='Bench')[0], **fields,
+    })
+    return event, make_tickets([event.pk], tiers, price=price, quantity=quantity)
+
+
+def make_orders(count, user, lines, status='pending', total_price=None):
+    """
+    ``count`` orders with their items; returns their ids. ``lines(i)``
+    gives the ``(ticket id, quantity)`` pairs of order ``i``. ``user``,
+    ``status`` and ``total_price`` (by default the sum of the lines) are
+    values or callables of ``i``.
+    """
+    created, tickets = [], {}
+    for rows in _chunks(count):
+        planned = [(i, list(lines(i))) for i in rows]
+        # Price and event title of every ticket, read once
+        missing = list({ticket for _, order_lines in planned for ticket, _ in order_lines} - tickets.keys())
+        for start in range(0, len(missing), 500):
+            tickets.update(
+                (ticket, (price, title)) for ticket, price, title in
+                Ticket.objects.filter(id__in=missing[start:start + 500]).values_list('id', 'price', 'event__title')
+            )
+        orders = Order.objects.bulk_create([
+            Order(
+                user_id=_pk(_value(user, i)), status=_value(status, i),
+                total_price=sum(
+                    (tickets[ticket][0] * quantity for ticket, quantity in order_lines), Decimal('0.00')
+                ) if total_price is None else _value(total_price, i),
+                **Order.summarize((quantity, tickets[ticket][1]) for ticket, quantity in order_lines),
+            )
+            for i, order_lines in planned
+        ], batch_size=1000)
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, ticket_id=ticket, quantity=quantity, unit_price=tickets[ticket][0])
+            for order, (_, order_lines) in zip(orders, planned)
+            for ticket, quantity in order_lines
+        ], batch_size=1000)
+        created += [order.pk for order in orders]
+    return created
@@ -0,0 +1,396 @@
+"""
+Synthetic dataset and API traffic for ``bench_traffic``, ``bench_auth`` and ``bench_metrics``.
+
+``seed`` bulk-inserts users, categories, events, tickets and an order
+history at a given ``Scale``. ``SCENARIOS`` knows how to build a request
+for every route and method of events/urls.py and users/urls.py from that
+data; ``generate`` draws a weighted mix of them. Requests are plain dicts
+(``route``, ``method``, ``path``, ``body``, ``user``), the same shape as a
+line of a traffic file, so a generated mix can be saved and replayed.
+"""
+import json
+from dataclasses import dataclass, field
+from datetime import timedelta
+from urllib.parse import urlencode
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.urls import URLResolver, get_resolver, reverse
+from django.utils import timezone
+
+from bench.seeding import make_categories, make_events, make_orders, make_tickets, make_users
+from events.models import Event, Ticket, Order
+
+PASSWORD = 'bench-Passw0rd!'
+URLCONFS = ('events.urls', 'users.urls')
+# Endless responses, timed by bench_live rather than per request (only routed under ASGI)
+STREAMS = {'event-live'}
+WORDS = [
+    'rock', 'jazz', 'opera', 'festival', 'comedy', 'theatre', 'ballet', 'football', 'hockey', 'summer',
+    'winter', 'night', 'symphony', 'acoustic', 'indie', 'classic', 'live', 'tour', 'premiere', 'gala',
+]
+
+
+@dataclass
+class Scale:
+    users: int = 1000
+    categories: int = 20
+    events: int = 2000
+    tickets_per_event: int = 4
+    orders: int = 20_000
+
+
+@dataclass
+class Dataset:
+    admin: str
+    users: list
+    categories: list
+    # Catalogue events as (id, organizer username); reads and purchases use these
+    events: list
+    queue_events: list
+    tickets: list
+    # Consumed by the writes that use them up: each is deleted, confirmed or canceled at most once
+    disposable_events: list
+    disposable_categories: list
+    pending_orders: dict
+    # Orders no request changes, by username
+    orders: dict = field(default_factory=dict)
+    # For unique names of created users and categories
+    serial: int = 0
+
+
+def seed(scale, rng):
+    """Bulk-insert a dataset of ``scale``; returns a ``Dataset`` describing it"""
+    password = make_password(PASSWORD)
+    User.objects.create_user('bench-admin', password=PASSWORD, is_staff=True)
+    users = {user.id: user.username for user in make_users(scale.users, 'bench-user-', password=password)}
+    user_ids = sorted(users)
+    organizers = user_ids[:max(1, len(user_ids) // 20)]
+
+    categories = [(category.id, category.name) for category in make_categories(scale.categories + 10)]
+
+    # Catalogue events, a few behind a waiting room, then the ones DELETE requests use up
+    now = timezone.now()
+    kinds = ['catalogue'] * scale.events + ['queue'] * max(1, scale.events // 100) + ['disposable'] * 100
+    event_ids = make_events(
+        len(kinds),
+        title=lambda i: f'{rng.choice(WORDS).title()} {rng.choice(WORDS)} {i}',
+        description=lambda i: ' '.join(rng.choices(WORDS, k=30)),
+        date=lambda i: now + timedelta(hours=rng.randint(-24 * 30, 24 * 180)),
+        location=lambda i: f'Venue {rng.randrange(100)}', organizer_id=lambda i: rng.choice(organizers),
+        category_id=lambda i: rng.choice(categories[:scale.categories])[0],
+        is_active=lambda i: kinds[i] != 'catalogue' or rng.random() < 0.9,
+        waiting_room=lambda i: kinds[i] == 'queue',
+    )
+    rows = Event.objects.order_by('id').values_list('id', 'organizer_id', 'is_active')
+    by_kind = {kind: [] for kind in kinds}
+    for kind, (event_id, organizer_id, is_active) in zip(kinds, rows):
+        if is_active:
+            by_kind[kind].append((event_id, users[organizer_id]))
+
+    make_tickets(
+        event_ids, scale.tickets_per_event,
+        price=lambda event, j: f'{rng.randint(10, 250)}.{rng.choice(["00", "50", "99"])}',
+        quantity=lambda event, j: 0 if rng.random() < 0.1 else 1_000_000,
+    )
+    catalogue = {event_id for event_id, _ in by_kind['catalogue']}
+    on_sale = [
+        ticket_id for ticket_id, event_id in
+        Ticket.objects.filter(quantity_available__gt=0).values_list('id', 'event_id')
+        if event_id in catalogue
+    ]
+
+    statuses = ['completed'] * 6 + ['canceled'] * 2 + ['pending'] * 2
+    make_orders(
+        scale.orders, lambda i: rng.choice(user_ids),
+        lambda i: [(ticket, rng.randint(1, 4)) for ticket in rng.sample(on_sale, rng.randint(1, 3))],
+        status=lambda i: rng.choice(statuses),
+    )
+
+    data = Dataset(
+        admin='bench-admin',
+        users=[users[user_id] for user_id in user_ids],
+        categories=categories[:scale.categories],
+        events=by_kind['catalogue'],
+        queue_events=[event_id for event_id, _ in by_kind['queue']],
+        tickets=on_sale,
+        disposable_events=by_kind['disposable'],
+        disposable_categories=[category_id for category_id, _ in categories[scale.categories:]],
+        pending_orders={},
+    )
+    for user_id, order_id, status in Order.objects.order_by('id').values_list('user_id', 'id', 'status'):
+        pool = data.pending_orders if status == 'pending' else data.orders
+        pool.setdefault(users[user_id], []).append(order_id)
+    return data
+
+
+# Scenarios: (route, method) -> (weight, build, expected statuses). build(data, rng)
+# returns (path, body, username or None), or None once the data it needs is used up
+
+def _event(data, rng):
+    return rng.choice(data.events)
+
+
+def _buyer_with(pool, rng):
+    users = [user for user, ids in pool.items() if ids]
+    return rng.choice(users) if users else None
+
+
+def _take(pool, user, count=1):
+    taken, pool[user] = pool[user][:count], pool[user][count:]
+    return taken
+
+
+def _event_list(data, rng):
+    params = rng.choice([
+        '', '?page=2', '?cursor=', '?' + urlencode({'category': rng.choice(data.categories)[1]}),
+        f'?search={rng.choice(WORDS)}',
+        '?min_price=50', '?fields=id,title,date,min_price', '?ordering=min_price',
+    ])
+    return reverse('event-list') + params, None, None
+
+
+def _event_body(data, rng):
+    return {
+        'title': f'New {rng.choice(WORDS)}', 'description': 'Added during the benchmark',
+        'date': (timezone.now() + timedelta(days=rng.randint(1, 90))).isoformat(),
+        'location': 'Hall', 'category_id': rng.choice(data.categories)[0],
+    }
+
+
+def _event_create(data, rng):
+    return reverse('event-list'), _event_body(data, rng), _event(data, rng)[1]
+
+
+def _event_detail(data, rng):
+    return reverse('event-detail', args=[_event(data, rng)[0]]), None, None
+
+
+def _event_update(data, rng):
+    event_id, organizer = _event(data, rng)
+    return reverse('event-detail', args=[event_id]), _event_body(data, rng), organizer
+
+
+def _event_patch(data, rng):
+    event_id, organizer = _event(data, rng)
+    return reverse('event-detail', args=[event_id]), {'location': f'Venue {rng.randrange(100)}'}, organizer
+
+
+def _event_delete(data, rng):
+    if not data.disposable_events:
+        return None
+    event_id, organizer = data.disposable_events.pop()
+    return reverse('event-detail', args=[event_id]), None, organizer
+
+
+def _event_tickets(data, rng):
+    return reverse('event-tickets', args=[_event(data, rng)[0]]), None, None
+
+
+def _event_queue(data, rng):
+    return reverse('event-queue', args=[rng.choice(data.queue_events)]), None, rng.choice(data.users)
+
+
+def _autocomplete(data, rng):
+    return reverse('event-autocomplete') + f'?search={rng.choice(WORDS)[:rng.randint(2, 5)]}', None, None
+
+
+def _event_categories(data, rng):
+    return reverse('event-categories'), None, None
+
+
+def _order_items(data, rng):
+    return [{'ticket_id': ticket_id, 'quantity': rng.randint(1, 4)}
+            for ticket_id in rng.sample(data.tickets, rng.randint(1, 3))]
+
+
+def _order_list(data, rng):
+    # A buyer's history is often a single page, so no ?page=2
+    params = rng.choice(['', '?cursor=', '?status=pending', '?fields=id,status,total_price'])
+    return reverse('order-list') + params, None, rng.choice(data.users)
+
+
+def _order_create(data, rng):
+    return reverse('order-list'), _order_items(data, rng), rng.choice(data.users)
+
+
+def _order_bulk(data, rng):
+    orders = [_order_items(data, rng) for _ in range(rng.randint(2, 10))]
+    return reverse('order-bulk'), {'orders': orders}, rng.choice(data.users)
+
+
+def _order_detail(data, rng):
+    user = _buyer_with(data.orders, rng)
+    return reverse('order-detail', args=[rng.choice(data.orders[user])]), None, user
+
+
+def _order_update(data, rng):
+    user = _buyer_with(data.orders, rng)
+    return reverse('order-detail', args=[rng.choice(data.orders[user])]), {}, user
+
+
+def _order_pending(name):
+    def build(data, rng):
+        user = _buyer_with(data.pending_orders, rng)
+        if user is None:
+            return None
+        order_id, = _take(data.pending_orders, user)
+        return reverse(name, args=[order_id]), None, user
+    return build
+
+
+def _order_pending_bulk(name):
+    def build(data, rng):
+        user = _buyer_with(data.pending_orders, rng)
+        if user is None:
+            return None
+        return reverse(name), {'order_ids': _take(data.pending_orders, user, rng.randint(1, 5))}, user
+    return build
+
+
+def _category_list(data, rng):
+    return reverse('category-list'), None, data.admin
+
+
+def _category_create(data, rng):
+    data.serial += 1
+    return reverse('category-list'), {'name': f'New category {data.serial}'}, data.admin
+
+
+def _category_detail(data, rng):
+    return reverse('category-detail', args=[rng.choice(data.categories)[0]]), None, data.admin
+
+
+def _category_update(data, rng):
+    category_id, name = rng.choice(data.categories)
+    return reverse('category-detail', args=[category_id]), {'name': name}, data.admin
+
+
+def _category_delete(data, rng):
+    if not data.disposable_categories:
+        return None
+    return reverse('category-detail', args=[data.disposable_categories.pop()]), None, data.admin
+
+
+def _api_root(data, rng):
+    return reverse('api-root'), None, None
+
+
+def _register(data, rng):
+    data.serial += 1
+    username = f'bench-new-{data.serial}'
+    return reverse('user-register'), {
+        'username': username, 'email': f'{username}@example.com', 'password': PASSWORD, 'password_confirm': PASSWORD,
+    }, None
+
+
+def _token(data, rng):
+    return reverse('token-obtain-pair'), {'username': rng.choice(data.users), 'password': PASSWORD}, None
+
+
+def _refresh_body(data, rng):
+    # The runner swaps the placeholder for a fresh refresh token of the user
+    return {'refresh': f'{{refresh:{rng.choice(data.users)}}}'}
+
+
+def _token_refresh(data, rng):
+    return reverse('token-refresh'), _refresh_body(data, rng), None
+
+
+def _logout(data, rng):
+    return reverse('token-blacklist'), _refresh_body(data, rng), None
+
+
+OK = {200}
+SCENARIOS = {
+    ('event-list', 'GET'): (300, _event_list, OK),
+    ('event-list', 'POST'): (3, _event_create, {201}),
+    ('event-detail', 'GET'): (150, _event_detail, OK),
+    ('event-detail', 'PUT'): (1, _event_update, OK),
+    ('event-detail', 'PATCH'): (2, _event_patch, OK),
+    ('event-detail', 'DELETE'): (1, _event_delete, {204}),
+    ('event-tickets', 'GET'): (100, _event_tickets, OK),
+    ('event-queue', 'POST'): (5, _event_queue, OK),
+    # Polling before joining is a 404
+    ('event-queue', 'GET'): (10, _event_queue, {200, 404}),
+    ('event-autocomplete', 'GET'): (80, _autocomplete, OK),
+    ('event-categories', 'GET'): (20, _event_categories, OK),
+    ('order-list', 'GET'): (60, _order_list, OK),
+    ('order-list', 'POST'): (40, _order_create, {201}),
+    ('order-bulk', 'POST'): (2, _order_bulk, OK),
+    ('order-detail', 'GET'): (30, _order_detail, OK),
+    ('order-detail', 'PUT'): (1, _order_update, OK),
+    ('order-detail', 'PATCH'): (1, _order_update, OK),
+    ('order-detail', 'DELETE'): (1, _order_pending('order-detail'), {204}),
+    ('order-confirm', 'POST'): (15, _order_pending('order-confirm'), OK),
+    ('order-cancel', 'POST'): (8, _order_pending('order-cancel'), OK),
+    ('order-bulk-confirm', 'POST'): (2, _order_pending_bulk('order-bulk-confirm'), OK),
+    ('order-bulk-cancel', 'POST'): (1, _order_pending_bulk('order-bulk-cancel'), OK),
+    ('category-list', 'GET'): (2, _category_list, OK),
+    ('category-list', 'POST'): (1, _category_create, {201}),
+    ('category-detail', 'GET'): (2, _category_detail, OK),
+    ('category-detail', 'PUT'): (1, _category_update, OK),
+    ('category-detail', 'PATCH'): (1, _category_update, OK),
+    ('category-detail', 'DELETE'): (1, _category_delete, {204}),
+    ('api-root', 'GET'): (2, _api_root, OK),
+    ('user-register', 'POST'): (3, _register, {201}),
+    ('token-obtain-pair', 'POST'): (10, _token, OK),
+    ('token-refresh', 'POST'): (10, _token_refresh, OK),
+    ('token-blacklist', 'POST'): (2, _logout, OK),
+}
+
+
+def url_patterns():
+    """The URL patterns of the app urlconfs, STREAMS aside"""
+    found = []
+
+    def walk(patterns):
+        for pattern in patterns:
+            if isinstance(pattern, URLResolver):
+                walk(pattern.url_patterns)
+            elif pattern.name not in STREAMS:
+                found.append(pattern)
+
+    for pattern in get_resolver().url_patterns:
+        if isinstance(pattern, URLResolver) and getattr(pattern.urlconf_name, '__name__', None) in URLCONFS:
+            walk(pattern.url_patterns)
+    return found
+
+
+def routes():
+    """Every (url name, method) served by the app urlconfs, OPTIONS and HEAD aside"""
+    found = set()
+    for pattern in url_patterns():
+        view = pattern.callback
+        methods = getattr(view, 'actions', None) or {
+            method: method for method in view.cls.http_method_names if hasattr(view.cls, method)
+        }
+        found.update((pattern.name, method.upper()) for method in methods if method not in ('options', 'head'))
+    return found
+
+
+def generate(data, count, rng, mix=None):
+    """``count`` requests drawn from ``mix`` ((route, method) -> weight; SCENARIOS' weights by default)"""
+    mix = dict(mix or {key: weight for key, (weight, _, _) in SCENARIOS.items()})
+    requests = []
+    while len(requests) < count and mix:
+        route, method = key = rng.choices(list(mix), weights=list(mix.values()))[0]
+        built = SCENARIOS[key][1](data, rng)
+        if built is None:
+            # Used up, e.g. no pending orders left to confirm
+            del mix[key]
+            continue
+        path, body, user = built
+        requests.append({'route': route, 'method': method, 'path': path, 'body': body, 'user': user})
+    return requests
+
+
+def read_traffic(path):
+    with open(path) as lines:
+        return [json.loads(line) for line in lines if line.strip()]
+
+
+def write_traffic(path, requests):
+    with open(path, 'w') as out:
+        for request in requests:
+            out.write(json.dumps(request) + '\n')
@@ -1,5 +1,9 @@
+from django.conf import settings
 from django.contrib import admin
-from .models import Event, Ticket, Order, OrderItem, Category
+from .cancellations import start_cancellation, resume_cancellation
+from .inventory import shard_ticket, merge_shards
+from .models import Event, EventCancellation, Ticket, TicketShard, Order, OrderItem, Category
+from .orders import cancel_orders, remove_order_items
 
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
@@ -8,28 +12,109 @@ class CategoryAdmin(admin.ModelAdmin):
 
 @admin.register(Event)
 class EventAdmin(admin.ModelAdmin):
-    list_display = ['title', 'date', 'location', 'organizer', 'category', 'is_active']
-    list_filter = ['is_active', 'category', 'date']
+    list_display = ['title', 'date', 'location', 'organizer', 'category', 'is_active', 'waiting_room']
+    list_filter = ['is_active', 'waiting_room', 'category', 'date']
     search_fields = ['title', 'description']
     readonly_fields = ['created_at', 'updated_at']
+    actions = ['cancel_and_zero', 'cancel_and_restock']
+
+    def queue_cancellations(self, request, queryset, inventory):
+        for event in queryset:
+            start_cancellation(event, inventory=inventory, requested_by=request.user)
+        self.message_user(
+            request, f'{len(queryset)} event(s) taken off sale; their orders are unwound by "manage.py cancel_event --queued"'
+        )
+
+    @admin.action(description='Cancel selected events and refund orders (zero inventory)')
+    def cancel_and_zero(self, request, queryset):
+        self.queue_cancellations(request, queryset, 'zero')
+
+    @admin.action(description='Cancel selected events and refund orders (return tickets to stock)')
+    def cancel_and_restock(self, request, queryset):
+        self.queue_cancellations(request, queryset, 'restock')
+
+@admin.register(EventCancellation)
+class EventCancellationAdmin(admin.ModelAdmin):
+    list_display = ['id', 'event', 'inventory', 'status', 'last_order_id', 'orders_canceled', 'orders_refunded', 'updated_at']
+    list_filter = ['status', 'inventory']
+    list_select_related = ['event']
+    readonly_fields = [field.name for field in EventCancellation._meta.fields]
+    actions = ['resume']
+
+    def has_add_permission(self, request):
+        return False
+
+    @admin.action(description='Resume selected failed jobs')
+    def resume(self, request, queryset):
+        resumed = sum(resume_cancellation(job) for job in queryset)
+        self.message_user(request, f'{resumed} job(s) queued again')
+
+class TicketShardInline(admin.TabularInline):
+    model = TicketShard
+    extra = 0
+    readonly_fields = ['index', 'quantity']
+    can_delete = False
+
+    def has_add_permission(self, request, obj=None):
+        return False
 
 @admin.register(Ticket)
 class TicketAdmin(admin.ModelAdmin):
-    list_display = ['name', 'event', 'price', 'quantity_available']
+    list_display = ['name', 'event', 'price', 'quantity_available', 'shard_count']
     list_filter = ['event']
     search_fields = ['name', 'event__title']
+    inlines = [TicketShardInline]
+    actions = ['shard_inventory', 'merge_inventory']
+
+    def get_readonly_fields(self, request, obj=None):
+        # A sharded ticket's stock lives in its shards
+        if obj is not None and obj.shard_count:
+            return ['quantity_available']
+        return []
+
+    @admin.action(description=f'Shard inventory across {settings.TICKET_SHARD_COUNT} rows (hot on-sales)')
+    def shard_inventory(self, request, queryset):
+        sharded = sum(shard_ticket(ticket, settings.TICKET_SHARD_COUNT) for ticket in queryset)
+        self.message_user(request, f'{sharded} ticket(s) sharded')
+
+    @admin.action(description='Merge inventory shards back into one row')
+    def merge_inventory(self, request, queryset):
+        merged = sum(merge_shards(ticket) for ticket in queryset)
+        self.message_user(request, f'{merged} ticket(s) merged')
 
 class OrderItemInline(admin.TabularInline):
     model = OrderItem
     extra = 0
-    readonly_fields = ['ticket', 'quantity']
+    readonly_fields = ['ticket', 'quantity', 'unit_price']
 
 @admin.register(Order)
 class OrderAdmin(admin.ModelAdmin):
-    list_display = ['id', 'user', 'total_price', 'status', 'created_at']
+    list_display = ['id', 'user', 'total_price', 'status', 'line_count', 'created_at']
     list_filter = ['status', 'created_at']
     search_fields = ['user__username', 'id']
     readonly_fields = ['created_at']
     inlines = [OrderItemInline]
+    actions = ['cancel_selected']
+
+    @admin.action(description='Cancel selected pending orders')
+    def cancel_selected(self, request, queryset):
+        results = cancel_orders(list(queryset.values_list('id', flat=True)))
+        canceled = sum('status' in result for result in results)
+        self.message_user(request, f'{canceled} order(s) canceled')
+
+    def delete_model(self, request, obj):
+        # Pending orders still hold stock; release it before the rows go
+        cancel_orders([obj.pk])
+        super().delete_model(request, obj)
+
+    def delete_queryset(self, request, queryset):
+        cancel_orders(list(queryset.filter(status='pending').values_list('id', flat=True)))
+        super().delete_queryset(request, queryset)
+
+@admin.register(OrderItem)
+class OrderItemAdmin(admin.ModelAdmin):
+    list_display = ['id', 'order', 'ticket', 'quantity', 'unit_price']
+    list_select_related = ['order', 'ticket']
 
-admin.site.register(OrderItem)
\ No newline at end of file
+    def delete_queryset(self, request, queryset):
+        remove_order_items(list(queryset.values_list('id', flat=True)))
\ No newline at end of file
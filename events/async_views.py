@@ -0,0 +1,142 @@
+"""
+Native async versions of read-only ViewSet actions, for ASGI deployments.
+
+A ViewSet opts in with ``AsyncReadMixin`` and an ``a<action>`` coroutine
+for each name in ``async_actions``; ``async_urls`` then serves the GET
+routes of those actions with ``as_async_view``. Everything else on the
+same URLs (writes, OPTIONS, the browsable API) still goes to the sync view.
+
+Django runs async ORM calls on the request's sync thread, so queries of
+one request don't overlap each other, but the event loop is free to
+serve other requests while they wait.
+"""
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ValidationError
+from django.http import Http404, HttpResponse
+from django.urls import URLPattern
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework.exceptions import NotAcceptable
+from rest_framework.renderers import JSONRenderer
+
+from . import throttling
+
+
+async def fetch(queryset):
+    """Evaluate ``queryset``, prefetches included, through the async ORM"""
+    return [obj async for obj in queryset]
+
+
+async def gather(*aws):
+    """``asyncio.gather`` that waits for everything, then raises the first failure in argument order"""
+    results = await asyncio.gather(*aws, return_exceptions=True)
+    for result in results:
+        if isinstance(result, BaseException):
+            raise result
+    return results
+
+
+def attach(instance, name, rows):
+    """Make ``rows`` the prefetched result of ``instance.<name>.all()``, as prefetch_related would"""
+    queryset = getattr(instance, name).all()
+    queryset._result_cache = list(rows)
+    queryset._prefetch_done = True
+    instance._prefetched_objects_cache = {**getattr(instance, '_prefetched_objects_cache', {}), name: queryset}
+
+
+class AsyncReadMixin:
+    """Async dispatch for the ViewSet actions named in ``async_actions``"""
+    async_actions = ()
+
+    async def adispatch(self, request, *args, **kwargs):
+        """
+        ``dispatch`` on the event loop. Returns None when the request has
+        to go to the sync view, i.e. it doesn't negotiate to JSON.
+        """
+        self.args, self.kwargs = args, kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            self.format_kwarg = self.get_format_suffix(**kwargs)
+            renderer, _ = self.perform_content_negotiation(request)
+        except (NotAcceptable, Http404):
+            return None
+        if not isinstance(renderer, JSONRenderer):
+            # The browsable API renders forms, which query
+            return None
+
+        try:
+            if 'HTTP_AUTHORIZATION' in request.META or not throttling.get_backend().local:
+                # Authenticating a token may query (revocations, users of older tokens),
+                # and counting against a shared throttle store is a round trip
+                await sync_to_async(self.initial)(request, *args, **kwargs)
+            else:
+                self.initial(request, *args, **kwargs)
+            response = await getattr(self, f'a{self.action}')(request, *args, **kwargs)
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        # Render here; Django would hand a deferred render off to a thread
+        self.response.render()
+        return HttpResponse(
+            self.response.content, status=self.response.status_code, headers=dict(self.response.items())
+        )
+
+    async def aget_object(self, queryset=None):
+        """``get_object`` with the lookup run through the async ORM"""
+        queryset = self.filter_queryset(self.get_queryset() if queryset is None else queryset)
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        try:
+            obj = await queryset.aget(**{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+        except queryset.model.DoesNotExist:
+            raise Http404(f'No {queryset.model._meta.object_name} matches the given query.')
+        except (TypeError, ValueError, ValidationError):
+            raise Http404
+        self.check_object_permissions(self.request, obj)
+        return obj
+
+    async def apaginate_queryset(self, queryset):
+        if self.paginator is None:
+            return None
+        if hasattr(self.paginator, 'apaginate_queryset'):
+            return await self.paginator.apaginate_queryset(queryset, self.request, view=self)
+        return await sync_to_async(self.paginate_queryset)(queryset)
+
+
+def as_async_view(view):
+    """
+    Async twin of the router view ``view``: GETs run ``adispatch`` on the
+    event loop, anything it can't serve is handed to ``view`` on a thread.
+    """
+    cls, actions, initkwargs = view.cls, view.actions, view.initkwargs
+    sync_view = sync_to_async(view)
+
+    async def async_view(request, *args, **kwargs):
+        if request.method == 'GET':
+            self = cls(**initkwargs)
+            self.action_map = actions
+            for method, action in actions.items():
+                setattr(self, method, getattr(self, action))
+            response = await self.adispatch(request, *args, **kwargs)
+            if response is not None:
+                return response
+        return await sync_view(request, *args, **kwargs)
+
+    async_view.cls, async_view.initkwargs, async_view.actions = cls, initkwargs, actions
+    return csrf_exempt(async_view)
+
+
+def async_urls(urls):
+    """A router's ``urls`` with the GET routes of async actions served by ``as_async_view``"""
+    patterns = []
+    for pattern in urls:
+        view = getattr(pattern, 'callback', None)
+        action = getattr(view, 'actions', {}).get('get')
+        if action and action in getattr(view.cls, 'async_actions', ()):
+            pattern = URLPattern(pattern.pattern, as_async_view(view), pattern.default_args, pattern.name)
+        patterns.append(pattern)
+    return patterns
@@ -0,0 +1,221 @@
+import hashlib
+import time
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+from .metrics import cache_lookups
+from .models import Event, Ticket
+from .replicas import get_replicas, replica_reads
+
+CATALOGUE = 'catalogue'
+STATS = ('hit', 'miss', 'not_modified')
+
+
+def catalogue_cache():
+    return caches[CATALOGUE]
+
+
+def _version_key(scope):
+    return f'catalogue:v:{scope}'
+
+
+def _bumped_key(scope):
+    return f'catalogue:bumped:{scope}'
+
+
+def get_versions(scopes, bumped=None):
+    """
+    The version of each scope. ``bumped``, a list, is extended with the
+    scopes bumped within the last REPLICA_PIN_SECONDS, which replicas may
+    not have caught up with yet.
+    """
+    cache = catalogue_cache()
+    keys = [_version_key(scope) for scope in scopes]
+    if bumped is None:
+        versions = cache.get_many(keys)
+    else:
+        # One round trip for both
+        versions = cache.get_many(keys + [_bumped_key(scope) for scope in scopes])
+        bumped.extend(scope for scope in scopes if _bumped_key(scope) in versions)
+    for key in keys:
+        if key not in versions:
+            # Seed from the clock, not 1: an evicted counter must never
+            # come back with a value that was already handed out as an ETag
+            cache.add(key, time.time_ns(), timeout=None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def bump(*scopes):
+    cache = catalogue_cache()
+    for scope in scopes:
+        key = _version_key(scope)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, time.time_ns(), timeout=None)
+    if get_replicas() and settings.REPLICA_PIN_SECONDS:
+        # Until the replicas catch up, misses of the new versions read from the primary
+        cache.set_many({_bumped_key(scope): 1 for scope in scopes}, timeout=settings.REPLICA_PIN_SECONDS)
+
+
+def invalidate_events(event_ids):
+    """Bump the list and per-event versions once the current transaction commits"""
+    scopes = ['events'] + [f'event:{event_id}' for event_id in set(event_ids)]
+    transaction.on_commit(lambda: bump(*scopes))
+
+
+def invalidate_orders(order_ids):
+    """Invalidate every event whose tickets are held by the given orders"""
+    invalidate_events(
+        Ticket.objects.filter(orderitem__order_id__in=order_ids).order_by().values_list('event_id', flat=True).distinct()
+    )
+
+
+def invalidate_category(category):
+    bump('categories')
+    invalidate_events(Event.objects.filter(category=category).values_list('id', flat=True))
+
+
+def record(stat):
+    cache_lookups.inc(stat)
+    cache = catalogue_cache()
+    key = f'catalogue:stats:{stat}'
+    if not cache.add(key, 1, timeout=None):
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, 1, timeout=None)
+
+
+def get_stats():
+    cache = catalogue_cache()
+    values = cache.get_many([f'catalogue:stats:{stat}' for stat in STATS])
+    return {stat: values.get(f'catalogue:stats:{stat}', 0) for stat in STATS}
+
+
+def _query_params(view, request):
+    """Only the params that change the response, in a stable order"""
+    allowed = {api_settings.SEARCH_PARAM, api_settings.ORDERING_PARAM}
+    filterset_class = getattr(view, 'filterset_class', None)
+    if filterset_class is not None:
+        allowed.update(filterset_class.base_filters)
+    for attr in ('fields_param', 'expand_param'):
+        if getattr(view, attr, None):
+            allowed.add(getattr(view, attr))
+    paginator = getattr(view, 'paginator', None)
+    for attr in ('page_query_param', 'page_size_query_param', 'cursor_query_param', 'count_query_param'):
+        if getattr(paginator, attr, None):
+            allowed.add(getattr(paginator, attr))
+    return sorted(
+        (name, tuple(request.query_params.getlist(name)))
+        for name in allowed
+        if name in request.query_params
+    )
+
+
+def _digest(view, request, versions):
+    raw = repr((view.basename, view.action, view.kwargs.get('pk'), _query_params(view, request), versions))
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+def _lookup(view, request, scopes):
+    """
+    Version check, conditional GET and cache read for a request. Returns
+    ``(etag, key, data, primary)``; ``key`` is None when the client's copy
+    is current, and ``primary`` says a miss must be read from the primary,
+    as a replica may still have the rows from before the last bump.
+    """
+    bumped = [] if get_replicas() else None
+    digest = _digest(view, request, get_versions(scopes, bumped))
+    etag = f'"{digest}"'
+    if etag in request.headers.get('If-None-Match', ''):
+        record('not_modified')
+        return etag, None, None, False
+    key = f'catalogue:response:{digest}'
+    data = catalogue_cache().get(key)
+    record('miss' if data is None else 'hit')
+    return etag, key, data, bool(bumped)
+
+
+def _store(key, data):
+    catalogue_cache().set(key, data)
+
+
+def catalogue_cached(scopes):
+    """
+    Read-through cache for a catalogue GET action.
+
+    ``scopes(view)`` names the version counters the response depends on;
+    bumping any of them changes the cache key and the ETag. Users pinned
+    to the primary (events.replicas) bypass the cache, as an entry may
+    have been read from a replica that hadn't seen their write yet.
+    """
+    def decorator(method):
+        @wraps(method)
+        def wrapper(self, request, *args, **kwargs):
+            if getattr(self, 'pinned_to_primary', False):
+                return method(self, request, *args, **kwargs)
+            etag, key, data, primary = _lookup(self, request, scopes(self))
+            if key is None:
+                return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+
+            if data is None:
+                if primary:
+                    with replica_reads(False):
+                        response = method(self, request, *args, **kwargs)
+                else:
+                    response = method(self, request, *args, **kwargs)
+                if response.status_code != status.HTTP_200_OK:
+                    return response
+                _store(key, response.data)
+                response['X-Cache'] = 'MISS'
+            else:
+                response = Response(data)
+                response['X-Cache'] = 'HIT'
+            response['ETag'] = etag
+            return response
+        return wrapper
+    return decorator
+
+
+def acatalogue_cached(scopes):
+    """
+    ``catalogue_cached`` for async actions. Django's cache backends have no
+    native async I/O, so all cache round trips of a lookup share one hop to
+    a pooled thread.
+    """
+    def decorator(method):
+        @wraps(method)
+        async def wrapper(self, request, *args, **kwargs):
+            if getattr(self, 'pinned_to_primary', False):
+                return await method(self, request, *args, **kwargs)
+            lookup = sync_to_async(_lookup, thread_sensitive=False)
+            etag, key, data, primary = await lookup(self, request, scopes(self))
+            if key is None:
+                return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+
+            if data is None:
+                if primary:
+                    with replica_reads(False):
+                        response = await method(self, request, *args, **kwargs)
+                else:
+                    response = await method(self, request, *args, **kwargs)
+                if response.status_code != status.HTTP_200_OK:
+                    return response
+                await sync_to_async(_store, thread_sensitive=False)(key, response.data)
+                response['X-Cache'] = 'MISS'
+            else:
+                response = Response(data)
+                response['X-Cache'] = 'HIT'
+            response['ETag'] = etag
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,119 @@
+"""
+Mass cancellation of an event's orders.
+
+``start_cancellation`` takes the event off sale and queues an
+EventCancellation job; ``run_cancellation`` works through the affected
+orders in chunks of ascending id. Each chunk is one transaction that
+flips the order statuses, restores stock with set-based UPDATEs and
+advances the job's checkpoint, so an interrupted job resumes at the next
+chunk without processing an order twice. Only one chunk of order ids is
+ever held in memory.
+
+Orders are unwound whole: pending orders become ``canceled`` and
+completed ones ``refunded``. Lines on other events always go back to
+stock; lines on the canceled event do too with ``inventory='restock'``,
+while ``inventory='zero'`` (the default) empties its tickets instead.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from .caching import invalidate_events, invalidate_orders
+from .locks import lock_rows
+from .models import Event, EventCancellation, Ticket, TicketShard, Order, OrderItem
+
+UNWIND = {'pending': 'canceled', 'completed': 'refunded'}
+
+
+def affected_orders(event_id, after=0):
+    """Orders still holding tickets to ``event_id``, by id, starting after ``after``"""
+    lines = OrderItem.objects.filter(order=OuterRef('pk'), ticket__event_id=event_id)
+    return Order.objects.filter(
+        Exists(lines), id__gt=after, status__in=UNWIND,
+    ).order_by('id')
+
+
+def start_cancellation(event, inventory='zero', requested_by=None):
+    """
+    Take ``event`` off sale and queue a job for its orders, or return the
+    job that is already queued or running for it.
+    """
+    with transaction.atomic():
+        try:
+            with transaction.atomic():
+                job = EventCancellation.objects.create(
+                    event=event, inventory=inventory, requested_by=requested_by,
+                )
+        except IntegrityError:
+            return EventCancellation.objects.get(event=event, status__in=['queued', 'running'])
+        Event.objects.filter(pk=event.pk).update(is_active=False)
+        if inventory == 'zero':
+            Ticket.objects.filter(event=event).update(quantity_available=0, updated_at=timezone.now())
+            TicketShard.objects.filter(ticket__event=event).update(quantity=0)
+            Event.objects.filter(pk=event.pk).update(tickets_remaining=0)
+        invalidate_events([event.pk])
+        return job
+
+
+def _process_chunk(job, chunk_size):
+    """Unwind the next chunk of orders; returns how many were processed"""
+    with transaction.atomic():
+        job = lock_rows(EventCancellation.objects.filter(pk=job.pk), 'last_order_id')[0]
+        if job.status not in ('queued', 'running'):
+            return 0
+        order_ids = list(affected_orders(job.event_id, job.last_order_id).values_list('id', flat=True)[:chunk_size])
+        if not order_ids:
+            job.status = 'completed'
+            job.finished_at = timezone.now()
+            job.save(update_fields=['status', 'finished_at', 'updated_at'])
+            return 0
+
+        # Lock the chunk and re-read the statuses a concurrent confirm or cancel may have changed
+        orders = lock_rows(Order.objects.filter(id__in=order_ids, status__in=UNWIND), 'status')
+        by_status = {status: [order.id for order in orders if order.status == status] for status in UNWIND}
+
+        items = OrderItem.objects.filter(order_id__in=[order.id for order in orders])
+        if job.inventory == 'zero':
+            items = items.exclude(ticket__event_id=job.event_id)
+        Ticket.objects.restock(items)
+        Event.objects.restock(items)
+        invalidate_orders(order_ids)
+        for status, order_ids_with_status in by_status.items():
+            Order.objects.filter(id__in=order_ids_with_status).update(status=UNWIND[status])
+
+        job.status = 'running'
+        job.last_order_id = order_ids[-1]
+        job.orders_canceled += len(by_status['pending'])
+        job.orders_refunded += len(by_status['completed'])
+        job.save(update_fields=['status', 'last_order_id', 'orders_canceled', 'orders_refunded', 'updated_at'])
+        return len(order_ids)
+
+
+def run_cancellation(job, chunk_size=5000, max_chunks=None, progress=None):
+    """
+    Process ``job`` until it completes, or for at most ``max_chunks`` chunks.
+    ``progress(job)`` is called after every chunk. Returns the job.
+    """
+    chunks = 0
+    try:
+        while max_chunks is None or chunks < max_chunks:
+            if not _process_chunk(job, chunk_size):
+                break
+            chunks += 1
+            if progress:
+                job.refresh_from_db()
+                progress(job)
+    except Exception as exc:
+        EventCancellation.objects.filter(pk=job.pk).update(
+            status='failed', error=repr(exc), updated_at=timezone.now(),
+        )
+        raise
+    job.refresh_from_db()
+    return job
+
+
+def resume_cancellation(job):
+    """Put a failed job back in the queue; it continues from its checkpoint"""
+    return EventCancellation.objects.filter(pk=job.pk, status='failed').update(
+        status='queued', error='', updated_at=timezone.now(),
+    )
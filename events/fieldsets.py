@@ -0,0 +1,225 @@
+"""
+Sparse fieldsets: ``?fields=`` and ``?expand=`` on read endpoints.
+
+``?fields=id,title,date,min_price`` keeps only the listed fields.
+``?expand=`` names nested relations to return even if ``fields`` doesn't
+list them; dotted names reach deeper levels, e.g.
+``?expand=order_items.ticket``. Every field returned keeps its default
+representation, nested relations included, so without either parameter
+responses are unchanged.
+
+Serializers opt in with ``SparseFieldsMixin``, views with
+``SparseFieldsViewMixin``. The view also cuts the SQL to what the pruned
+serializer reads: ``.only()`` on the columns, joins and prefetches for
+expanded relations only. Fields whose source isn't a model field list
+what they read in ``Meta.sparse_sources``, as ``__`` paths; a serializer
+whose reads can't be worked out keeps the view's full queryset.
+"""
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from rest_framework import serializers
+
+
+class Fieldset:
+    """
+    The requested ``fields`` (None for all) and the ``expand`` tree, e.g.
+    ``{'order_items': {'ticket': {}}}``. ``path`` locates a nested
+    serializer's fieldset in error messages.
+    """
+
+    def __init__(self, fields=None, expand=None, path=''):
+        self.fields = fields
+        self.expand = expand or {}
+        self.path = path
+
+    @classmethod
+    def from_request(cls, request, fields_param='fields', expand_param='expand'):
+        """The request's fieldset, or None when it asks for the full representation"""
+        params = request.query_params
+        if fields_param not in params and expand_param not in params:
+            return None
+        fields = None
+        if fields_param in params:
+            fields = {name for value in params.getlist(fields_param) for name in _split(value)}
+        expand = {}
+        for value in params.getlist(expand_param):
+            for path in _split(value):
+                node = expand
+                for name in path.split('.'):
+                    node = node.setdefault(name, {})
+        return cls(fields, expand)
+
+
+def _split(value):
+    return [name.strip() for name in value.split(',') if name.strip()]
+
+
+def _nested(field):
+    """The serializer rendering each related object of ``field``, if it renders them in full"""
+    if isinstance(field, serializers.ListSerializer):
+        field = field.child
+    return field if isinstance(field, serializers.Serializer) else None
+
+
+# The mixins have comments, not docstrings: drf-spectacular would describe
+# every serializer and view using them with the docstring
+class SparseFieldsMixin:
+    # Prunes fields to the fieldset in context['fieldset']
+
+    # Set by the parent serializer when this one is an expanded relation
+    fieldset = None
+
+    def get_fields(self):
+        fields = super().get_fields()
+        root = self.parent is None or (isinstance(self.parent, serializers.ListSerializer) and self.parent.parent is None)
+        fieldset = self.context.get('fieldset') if root else self.fieldset
+        if fieldset is None:
+            return fields
+
+        readable = {name for name, field in fields.items() if not field.write_only}
+        unknown = sorted((fieldset.fields or set()) - readable)
+        if unknown:
+            raise serializers.ValidationError({'fields': [f"Unknown field: {name}" for name in unknown]})
+        unexpandable = sorted(name for name in fieldset.expand if name not in readable or _nested(fields[name]) is None)
+        if unexpandable:
+            raise serializers.ValidationError({'expand': [f"Cannot expand: {fieldset.path}{name}" for name in unexpandable]})
+
+        for name in list(fields):
+            field = fields[name]
+            if field.write_only:
+                continue
+            if fieldset.fields is not None and name not in fieldset.fields and name not in fieldset.expand:
+                del fields[name]
+            elif name in fieldset.expand:
+                nested = _nested(field)
+                if isinstance(nested, SparseFieldsMixin):
+                    nested.fieldset = Fieldset(expand=fieldset.expand[name], path=f'{fieldset.path}{name}.')
+                elif fieldset.expand[name]:
+                    deeper = next(iter(fieldset.expand[name]))
+                    raise serializers.ValidationError({'expand': [f"Cannot expand: {fieldset.path}{name}.{deeper}"]})
+        return fields
+
+
+class _Plan:
+    """Columns of one model to load, and the relations to load with it"""
+
+    def __init__(self):
+        self.columns = set()
+        self.relations = {}
+
+    def relation(self, name):
+        return self.relations.setdefault(name, _Plan())
+
+
+def _follow(plan, model, name):
+    """The plan and model of relation ``name``, recording the column that links them"""
+    model_field = model._meta.get_field(name)
+    if model_field.concrete:
+        # Forward foreign key: its column holds the primary key
+        plan.columns.add(name)
+    else:
+        # Reverse foreign key: the prefetch matches rows on the column pointing back
+        plan.relation(name).columns.add(model_field.field.name)
+    return plan.relation(name), model_field.related_model
+
+
+def _collect(serializer, model, plan):
+    """Add what ``serializer`` reads from a ``model`` instance to ``plan``; False if that can't be told"""
+    sources = getattr(getattr(serializer, 'Meta', None), 'sparse_sources', {})
+    for field in serializer._readable_fields:
+        if field.field_name in sources:
+            paths = sources[field.field_name]
+        elif len(field.source_attrs) == 1:
+            paths = field.source_attrs
+        else:
+            return False
+        nested = _nested(field)
+        for path in paths:
+            node, current = plan, model
+            *relations, name = path.split('__')
+            try:
+                for relation in relations:
+                    node, current = _follow(node, current, relation)
+                model_field = current._meta.get_field(name)
+            except FieldDoesNotExist:
+                return False
+            if model_field.many_to_many:
+                return False
+            if not model_field.is_relation or (model_field.concrete and nested is None):
+                node.columns.add(name)
+                continue
+            node, current = _follow(node, current, name)
+            if nested is not None and not _collect(nested, current, node):
+                return False
+    return True
+
+
+def _lookups(plan, model, prefetched, path, prefix=''):
+    """``.only()`` names, ``select_related`` paths and ``Prefetch`` objects loading ``plan``"""
+    only = [prefix + column for column in plan.columns]
+    select, prefetch = [], []
+    for name, relation in plan.relations.items():
+        model_field = model._meta.get_field(name)
+        related_path = path + name
+        if model_field.concrete and related_path not in prefetched:
+            select.append(prefix + name)
+            more = _lookups(relation, model_field.related_model, prefetched, related_path + '__', prefix + name + '__')
+            only += more[0]
+            select += more[1]
+            prefetch += more[2]
+        else:
+            # Keeps annotations the view's own prefetch queryset adds, e.g. Ticket stock
+            queryset = prefetched.get(related_path, model_field.related_model._default_manager.all())
+            prefetch.append(Prefetch(prefix + name, queryset=_restrict(queryset, relation, prefetched, related_path + '__')))
+    return only, select, prefetch
+
+
+def _restrict(queryset, plan, prefetched, path=''):
+    only, select, prefetch = _lookups(plan, queryset.model, prefetched, path)
+    if select:
+        # select_related() without names would follow every foreign key
+        queryset = queryset.select_related(*select)
+    return queryset.prefetch_related(*prefetch).only(*only)
+
+
+def restrict_queryset(queryset, serializer, columns=()):
+    """
+    ``queryset`` loading only what ``serializer`` reads (plus ``columns``),
+    or ``queryset`` itself when that can't be worked out.
+    """
+    plan = _Plan()
+    plan.columns.update(columns)
+    if not _collect(serializer, queryset.model, plan):
+        return queryset
+    prefetched = {
+        lookup.prefetch_through: lookup.queryset
+        for lookup in queryset._prefetch_related_lookups
+        if isinstance(lookup, Prefetch) and lookup.queryset is not None
+    }
+    return _restrict(queryset.select_related(None).prefetch_related(None), plan, prefetched)
+
+
+class SparseFieldsViewMixin:
+    # ?fields= / ?expand= for the GET actions in sparse_actions; the serializer needs SparseFieldsMixin
+    fields_param = 'fields'
+    expand_param = 'expand'
+    sparse_actions = ('list', 'retrieve')
+
+    @property
+    def fieldset(self):
+        request = getattr(self, 'request', None)
+        if request is None or self.action not in self.sparse_actions or request.method != 'GET':
+            return None
+        return Fieldset.from_request(self.request, self.fields_param, self.expand_param)
+
+    def get_serializer_context(self):
+        return {**super().get_serializer_context(), 'fieldset': self.fieldset}
+
+    # Here rather than get_queryset, which views override, and after filters that annotate
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.fieldset is None:
+            return queryset
+        # Cursor pages read the ordering columns off the last row
+        columns = [name.lstrip('-') for name in getattr(self, 'keyset_ordering', ())]
+        return restrict_queryset(queryset, self.get_serializer(), columns)
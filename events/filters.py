@@ -1,5 +1,7 @@
 import django_filters
+from rest_framework.filters import SearchFilter, OrderingFilter
 from .models import Event
+from .search import get_backend, tokenize
 from django.db.models import Q
 
 
@@ -14,8 +16,31 @@ class EventFilter(django_filters.FilterSet):
         model = Event
         fields = ['category', 'date_from', 'date_to']
 
+    # "Has a ticket priced at least / at most value", answered from the
+    # denormalized price range instead of a join over tickets
     def filter_min_price(self, queryset, name, value):
-        return queryset.filter(tickets__price__gte=value).distinct()
+        return queryset.filter(max_price__gte=value)
 
     def filter_max_price(self, queryset, name, value):
-        return queryset.filter(tickets__price__lte=value).distinct()
\ No newline at end of file
+        return queryset.filter(min_price__lte=value)
+
+
+class EventSearchFilter(SearchFilter):
+    """SearchFilter answered from the full-text index (see events.search)"""
+
+    def filter_queryset(self, request, queryset, view):
+        text = request.query_params.get(self.search_param, '')
+        if not tokenize(text):
+            return queryset
+        return get_backend().search(queryset, text)
+
+
+class RankedOrderingFilter(OrderingFilter):
+    """Orders search results by relevance unless the client asked for an ordering"""
+
+    def get_default_ordering(self, view):
+        ordering = super().get_default_ordering(view) or ()
+        text = view.request.query_params.get(EventSearchFilter.search_param, '')
+        if tokenize(text):
+            return ('-search_rank',) + tuple(ordering)
+        return ordering
@@ -0,0 +1,42 @@
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .caching import invalidate_orders
+from .locks import lock_rows
+from .models import Event, Ticket, Order
+
+
+def expired_holds(now=None, ttl=None):
+    """Pending orders whose hold has run out, oldest first (uses order_status_created_idx)"""
+    cutoff = (now or timezone.now()) - (ttl or settings.ORDER_HOLD_TTL)
+    return Order.objects.filter(status='pending', created_at__lt=cutoff).order_by('created_at')
+
+
+def release_expired_holds(now=None, ttl=None, batch_size=1000):
+    """
+    Cancel expired pending orders and return their tickets to stock.
+
+    Works in batches; each batch is one transaction with one UPDATE each for
+    the tickets, their events and the orders. Returns the number of orders released.
+    """
+    queue = expired_holds(now, ttl)
+    released = 0
+    while True:
+        with transaction.atomic():
+            candidates = list(
+                queue.select_for_update(skip_locked=True).values_list('id', flat=True)[:batch_size]
+            )
+            if not candidates:
+                return released
+            # Re-read under the lock (SQLite has no row locks): a confirm or cancel
+            # may have taken some of them since, and those keep their stock
+            order_ids = [
+                order.id for order in lock_rows(Order.objects.filter(id__in=candidates).only('id', 'status'), 'status')
+                if order.status == 'pending'
+            ]
+            Ticket.objects.restock_orders(order_ids)
+            Event.objects.restock_orders(order_ids)
+            invalidate_orders(order_ids)
+            Order.objects.filter(id__in=order_ids, status='pending').update(status='canceled')
+        released += len(order_ids)
@@ -0,0 +1,125 @@
+"""
+Sharded inventory for hot tickets.
+
+Every purchase of a ticket updates its row, so a headline on-sale queues
+all buyers on one row lock. A sharded ticket (``shard_count > 0``) splits
+its stock over that many TicketShard rows instead: a purchase takes from
+a random shard and falls back to the others, so concurrent buyers mostly
+update different rows.
+
+For sharded tickets ``Ticket.quantity_available`` and the event's
+``tickets_remaining`` become cached totals. Purchases don't touch them;
+``sync_sharded`` recomputes them at most every
+``TICKET_SHARD_SYNC_INTERVAL`` seconds per ticket after a sale, and
+``manage.py shard_tickets --sync`` catches the tail. ``Ticket.stock``
+and ``TicketQuerySet.with_stock()`` give the live figure, which is what
+the API shows.
+"""
+import random
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Subquery
+
+from .caching import catalogue_cache, invalidate_events
+from .locks import lock_rows
+from .models import Event, Ticket, TicketShard
+
+
+def shard_ticket(ticket, count):
+    """Split the stock of an unsharded ticket over ``count`` shards"""
+    with transaction.atomic():
+        locked = lock_rows(Ticket.objects.filter(pk=ticket.pk, shard_count=0), 'quantity_available')
+        if not locked or count < 1:
+            return False
+        total = locked[0].quantity_available
+        TicketShard.objects.bulk_create([
+            TicketShard(ticket_id=ticket.pk, index=index, quantity=total // count + (index < total % count))
+            for index in range(count)
+        ])
+        Ticket.objects.filter(pk=ticket.pk).update(shard_count=count)
+    ticket.shard_count = count
+    return True
+
+
+def merge_shards(ticket):
+    """Move a sharded ticket's stock back into quantity_available"""
+    with transaction.atomic():
+        shards = lock_rows(TicketShard.objects.filter(ticket_id=ticket.pk), 'quantity')
+        if not shards:
+            return False
+        total = sum(shard.quantity for shard in shards)
+        TicketShard.objects.filter(ticket_id=ticket.pk).delete()
+        Ticket.objects.filter(pk=ticket.pk).update(shard_count=0, quantity_available=total)
+    ticket.shard_count, ticket.quantity_available = 0, total
+    return True
+
+
+def take_sharded(ticket_id, shard_count, quantity):
+    """
+    Take ``quantity`` from a sharded ticket. Tries a random shard, then
+    falls back to the fullest one in a single statement; if no single
+    shard has enough, drains several under a lock on all of them.
+    Returns False when the ticket is sold out or its event is inactive.
+    """
+    shards = TicketShard.objects.filter(ticket_id=ticket_id, ticket__event__is_active=True)
+    if shards.filter(index=random.randrange(shard_count)).take(quantity):
+        return True
+    fullest = shards.filter(quantity__gte=quantity).order_by('-quantity').values('id')[:1]
+    if shards.filter(id=Subquery(fullest)).take(quantity):
+        return True
+
+    locked = lock_rows(shards, 'quantity')
+    amounts = allocate(locked, quantity)
+    if amounts is None:
+        return False
+    return bool(TicketShard.objects.take_many(amounts))
+
+
+def allocate(shards, quantity):
+    """Split ``quantity`` over locked ``shards``, fullest first; None if they hold too little"""
+    amounts = {}
+    for shard in sorted(shards, key=lambda shard: -shard.quantity):
+        if not quantity:
+            break
+        amount = min(shard.quantity, quantity)
+        if amount:
+            amounts[shard.id] = amount
+            quantity -= amount
+    return None if quantity else amounts
+
+
+def take_stock(ticket, quantity):
+    """Take ``quantity`` of one ticket, whichever mode it is in, unless its event is inactive"""
+    if ticket.shard_count:
+        if not take_sharded(ticket.pk, ticket.shard_count, quantity):
+            return False
+        schedule_sync([ticket.pk])
+        return True
+    if not Ticket.objects.filter(pk=ticket.pk, event__is_active=True).take(quantity):
+        return False
+    ticket.quantity_available -= quantity
+    Event.objects.filter(pk=ticket.event_id).adjust_remaining(-quantity)
+    return True
+
+
+def sync_sharded(ticket_ids=None):
+    """Refresh the cached totals of sharded tickets and their events"""
+    tickets = Ticket.objects.filter(shard_count__gt=0)
+    if ticket_ids is not None:
+        tickets = tickets.filter(id__in=ticket_ids)
+    with transaction.atomic():
+        synced = tickets.sync_shards()
+        event_ids = list(tickets.order_by().values_list('event_id', flat=True).distinct())
+        Event.objects.filter(id__in=event_ids).refresh_summary()
+        invalidate_events(event_ids)
+    return synced
+
+
+def schedule_sync(ticket_ids):
+    """Sync the given sharded tickets after commit, unless one ran within the interval"""
+    cache = catalogue_cache()
+    interval = settings.TICKET_SHARD_SYNC_INTERVAL
+    due = [ticket_id for ticket_id in ticket_ids if cache.add(f'inventory:sync:{ticket_id}', 1, timeout=interval)]
+    if due:
+        transaction.on_commit(lambda: sync_sharded(due))
@@ -0,0 +1,221 @@
+"""
+Live ticket availability over server-sent events (ASGI only).
+
+Every worker runs one ``Publisher`` on its event loop. Browsers watching
+an event subscribe to it instead of polling the tickets endpoint. The
+publisher checks the catalogue version counters of the watched events
+(see caching.py) every ``LIVE_POLL_INTERVAL`` seconds with one cache
+read. Order writes and cancellations already bump those counters on
+commit, and a shared cache makes them visible to every worker, so the
+counters act as the pub/sub channel between workers. For each event
+that changed, the publisher reads the ticket stock once and pushes only
+the tickets whose figure moved to every watcher of that event.
+
+A watcher holds at most one pending delta, merged per ticket, so a slow
+client gets the latest figures rather than a backlog. A failed check
+(cache or database down) is logged and retried with a growing delay, up
+to ``LIVE_MAX_BACKOFF`` seconds; open streams keep their heartbeat and
+catch up once a check succeeds.
+"""
+import asyncio
+import contextvars
+import json
+import logging
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import Prefetch
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_GET
+
+from .caching import get_versions
+from .models import Event, Ticket
+
+logger = logging.getLogger(__name__)
+
+
+def _scopes(event_ids):
+    return [f'event:{event_id}' for event_id in event_ids]
+
+
+def read_stock(event_ids):
+    """``{event_id: {ticket_id: stock}}`` for the active events among ``event_ids``"""
+    close_old_connections()
+    events = Event.objects.filter(id__in=event_ids, is_active=True).only('id').prefetch_related(
+        Prefetch('tickets', queryset=Ticket.objects.with_stock().only('id', 'event', 'quantity_available', 'shard_count'))
+    )
+    return {event.id: {ticket.id: ticket.stock for ticket in event.tickets.all()} for event in events}
+
+
+class Watcher:
+    """One open stream; ``pending`` collects the ticket figures not sent yet"""
+
+    def __init__(self):
+        self.pending = {}
+        self.closed = False
+        self.ready = asyncio.Event()
+
+    def push(self, delta):
+        self.pending.update(delta)
+        self.ready.set()
+
+    def close(self):
+        self.closed = True
+        self.ready.set()
+
+    async def wait(self, timeout):
+        """The next delta, or None after ``timeout`` seconds without one"""
+        try:
+            await asyncio.wait_for(self.ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        self.ready.clear()
+        delta, self.pending = self.pending, {}
+        return delta
+
+
+class Publisher:
+    """Fans availability changes out to the watchers of this worker"""
+
+    def __init__(self, loop):
+        self.loop = loop
+        self.watchers = {}
+        self.versions = {}
+        self.stock = {}
+        self.task = None
+        self.reads = 0
+
+    @property
+    def watcher_count(self):
+        return sum(len(watchers) for watchers in self.watchers.values())
+
+    async def subscribe(self, event_id):
+        """Register a watcher; returns it with the event's current stock, or None if the event isn't live"""
+        if event_id not in self.stock:
+            # Version first: a change landing in between is picked up again by the next poll
+            version, = await sync_to_async(get_versions, thread_sensitive=False)(_scopes([event_id]))
+            stock = await sync_to_async(read_stock)([event_id])
+            self.reads += 1
+            if event_id not in stock:
+                return None, None
+            if event_id not in self.stock:
+                self.versions[event_id], self.stock[event_id] = version, stock[event_id]
+        watcher = Watcher()
+        self.watchers.setdefault(event_id, set()).add(watcher)
+        if self.task is None:
+            # Not tied to the request that happened to start it
+            self.task = contextvars.Context().run(self.loop.create_task, self.run())
+        return watcher, dict(self.stock[event_id])
+
+    def unsubscribe(self, event_id, watcher):
+        watchers = self.watchers.get(event_id)
+        if watchers is None:
+            return
+        watchers.discard(watcher)
+        if not watchers:
+            del self.watchers[event_id]
+            self.versions.pop(event_id, None)
+            self.stock.pop(event_id, None)
+
+    async def run(self):
+        delay = settings.LIVE_POLL_INTERVAL
+        try:
+            while self.watchers:
+                await asyncio.sleep(delay)
+                try:
+                    await self.poll()
+                except Exception:
+                    # Ending here would leave every stream of this worker on keepalives for good
+                    delay = min(2 * delay, settings.LIVE_MAX_BACKOFF)
+                    logger.exception('Availability check failed, retrying in %.1fs', delay)
+                else:
+                    delay = settings.LIVE_POLL_INTERVAL
+        finally:
+            self.task = None
+
+    async def poll(self):
+        event_ids = list(self.watchers)
+        versions = await sync_to_async(get_versions, thread_sensitive=False)(_scopes(event_ids))
+        changed = {
+            event_id: version
+            for event_id, version in zip(event_ids, versions)
+            if version != self.versions.get(event_id)
+        }
+        if not changed:
+            return
+        stock = await sync_to_async(read_stock)(list(changed))
+        self.reads += 1
+        for event_id, version in changed.items():
+            if event_id not in self.watchers:
+                continue
+            if event_id not in stock:
+                for watcher in self.watchers.pop(event_id):
+                    watcher.close()
+                self.versions.pop(event_id, None)
+                self.stock.pop(event_id, None)
+                continue
+            old, new = self.stock[event_id], stock[event_id]
+            delta = {ticket_id: quantity for ticket_id, quantity in new.items() if old.get(ticket_id) != quantity}
+            delta.update({ticket_id: 0 for ticket_id in old.keys() - new.keys()})
+            self.versions[event_id], self.stock[event_id] = version, new
+            if delta:
+                for watcher in self.watchers[event_id]:
+                    watcher.push(delta)
+
+
+_publisher = None
+
+
+def get_publisher():
+    """This worker's publisher, bound to the running event loop"""
+    global _publisher
+    loop = asyncio.get_running_loop()
+    if _publisher is None or _publisher.loop is not loop:
+        _publisher = Publisher(loop)
+    return _publisher
+
+
+def _message(kind, event_id, stock):
+    data = json.dumps({
+        'event': event_id,
+        'tickets': [{'id': ticket_id, 'quantity_available': quantity} for ticket_id, quantity in sorted(stock.items())],
+    })
+    return f'event: {kind}\ndata: {data}\n\n'
+
+
+@require_GET
+async def availability_stream(request, pk):
+    """
+    ``text/event-stream`` of an event's ticket availability: a ``snapshot``
+    first, then ``availability`` events carrying only the tickets that
+    changed, and ``closed`` if the event is deactivated or deleted.
+    """
+    publisher = get_publisher()
+    if publisher.watcher_count >= settings.LIVE_MAX_WATCHERS:
+        return JsonResponse(
+            {'detail': 'Too many open streams, poll the tickets endpoint instead.'},
+            status=503, headers={'Retry-After': '30'},
+        )
+    watcher, stock = await publisher.subscribe(pk)
+    if watcher is None:
+        return JsonResponse({'detail': 'No Event matches the given query.'}, status=404)
+
+    async def stream():
+        try:
+            yield f'retry: {settings.LIVE_RETRY_MS}\n'
+            yield _message('snapshot', pk, stock)
+            while True:
+                delta = await watcher.wait(settings.LIVE_HEARTBEAT)
+                if watcher.closed:
+                    yield f'event: closed\ndata: {json.dumps({"event": pk})}\n\n'
+                    return
+                # A comment line keeps proxies from timing out an idle stream
+                yield _message('availability', pk, delta) if delta else ': keepalive\n\n'
+        finally:
+            publisher.unsubscribe(pk, watcher)
+
+    response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -0,0 +1,17 @@
+from django.db import connections
+from django.db.models import F
+
+
+def lock_rows(queryset, field):
+    """
+    Lock the rows of ``queryset`` for the rest of the current transaction
+    and return them in primary key order.
+
+    Uses SELECT ... FOR UPDATE where the database has it. SQLite has no
+    row locks, so a no-op UPDATE of ``field`` takes the database write
+    lock first, which makes the following read stable until commit.
+    """
+    if connections[queryset.db].features.has_select_for_update:
+        return list(queryset.select_for_update().order_by('pk'))
+    queryset.update(**{field: F(field)})
+    return list(queryset.order_by('pk'))
@@ -0,0 +1,59 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from events.cancellations import start_cancellation, run_cancellation, resume_cancellation
+from events.models import Event, EventCancellation
+
+
+class Command(BaseCommand):
+    help = 'Cancel events and unwind their orders, or work through the jobs queued from the admin'
+
+    def add_arguments(self, parser):
+        parser.add_argument('event_ids', nargs='*', type=int)
+        parser.add_argument('--inventory', choices=['zero', 'restock'], default='zero',
+                            help="zero the event's tickets (default) or return them to stock")
+        parser.add_argument('--queued', action='store_true', help='run queued and interrupted jobs')
+        parser.add_argument('--resume', type=int, metavar='JOB_ID', help='requeue a failed job and run it')
+        parser.add_argument('--chunk-size', type=int, default=5000, help='orders per transaction')
+        parser.add_argument('--loop', action='store_true', help='keep running as a worker (with --queued)')
+        parser.add_argument('--interval', type=float, default=10.0, help='seconds between polls with --loop')
+
+    def handle(self, *args, **options):
+        jobs = []
+        for event_id in options['event_ids']:
+            try:
+                event = Event.objects.get(pk=event_id)
+            except Event.DoesNotExist:
+                raise CommandError(f"Event {event_id} does not exist")
+            jobs.append(start_cancellation(event, inventory=options['inventory']))
+        if options['resume']:
+            try:
+                job = EventCancellation.objects.get(pk=options['resume'])
+            except EventCancellation.DoesNotExist:
+                raise CommandError(f"Job {options['resume']} does not exist")
+            resume_cancellation(job)
+            jobs.append(job)
+        if not jobs and not options['queued']:
+            raise CommandError('Give event ids, --resume or --queued')
+
+        for job in jobs:
+            self.run(job, options)
+        while options['queued']:
+            for job in EventCancellation.objects.filter(status__in=['queued', 'running']).order_by('id'):
+                self.run(job, options)
+            if not options['loop']:
+                return
+            time.sleep(options['interval'])
+
+    def run(self, job, options):
+        self.stdout.write(f"Cancelling {job.event} (job {job.pk}, from order {job.last_order_id})")
+        job = run_cancellation(job, chunk_size=options['chunk_size'], progress=self.progress)
+        self.stdout.write(
+            f"Job {job.pk} {job.status}: {job.orders_canceled} orders canceled, {job.orders_refunded} refunded"
+        )
+
+    def progress(self, job):
+        self.stdout.write(
+            f"  through order {job.last_order_id}: {job.orders_canceled} canceled, {job.orders_refunded} refunded"
+        )
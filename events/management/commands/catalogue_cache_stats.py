@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from events.caching import get_stats
+
+
+class Command(BaseCommand):
+    help = 'Show hit/miss counters of the catalogue response cache'
+
+    def handle(self, *args, **options):
+        stats = get_stats()
+        lookups = stats['hit'] + stats['miss']
+        for stat, value in stats.items():
+            self.stdout.write(f"{stat:<13} {value}")
+        if lookups:
+            self.stdout.write(f"{'hit ratio':<13} {stats['hit'] / lookups:.1%}")
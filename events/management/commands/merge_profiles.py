@@ -0,0 +1,104 @@
+import json
+import os
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = (
+        'Merge the request profiles in PROFILE_DIR per view: the hottest functions by samples, '
+        'the slowest SQL, and optionally one collapsed-stack file per view for a flame graph'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dir', default=None, help='profiles directory (default: settings.PROFILE_DIR)')
+        parser.add_argument('--view', action='append', help='only this URL name; repeatable')
+        parser.add_argument('--top', type=int, default=15, help='functions and statements listed per view')
+        parser.add_argument('--folded-dir', help='write the merged stacks of each view to <dir>/<view>.folded')
+        parser.add_argument('--json', action='store_true', help='print results as JSON')
+
+    def handle(self, *args, **options):
+        directory = options['dir'] or settings.PROFILE_DIR
+        if not os.path.isdir(directory):
+            raise CommandError(f'No profiles directory at {directory}')
+        views = self.load(directory, options['view'])
+        if not views:
+            raise CommandError(f'No profiles in {directory}')
+
+        if options['folded_dir']:
+            os.makedirs(options['folded_dir'], exist_ok=True)
+            for view, merged in views.items():
+                with open(os.path.join(options['folded_dir'], f'{view}.folded'), 'w') as out:
+                    out.writelines(f'{stack} {samples}\n' for stack, samples in merged['stacks'].most_common())
+
+        results = {view: self.report(merged, options['top']) for view, merged in sorted(views.items())}
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        for view, result in results.items():
+            self.stdout.write(
+                f"{view}: {result['profiles']} profiles, {result['samples']} samples, "
+                f"{result['mean_ms']:.1f}ms and {result['mean_queries']:.1f} queries "
+                f"({result['mean_sql_ms']:.1f}ms) per request"
+            )
+            self.stdout.write(f"  {'self':>6} {'total':>6}  function")
+            for function in result['functions']:
+                self.stdout.write(f"  {function['self']:>6.1%} {function['total']:>6.1%}  {function['name']}")
+            self.stdout.write(f"  {'ms':>8} {'count':>6}  statement")
+            for statement in result['sql']:
+                self.stdout.write(f"  {statement['ms']:>8.1f} {statement['count']:>6}  {statement['sql'][:120]}")
+            self.stdout.write('')
+
+    def load(self, directory, only):
+        views = defaultdict(lambda: {'profiles': [], 'stacks': Counter()})
+        for filename in sorted(os.listdir(directory)):
+            if not filename.endswith('.json'):
+                continue
+            base = os.path.join(directory, filename[:-len('.json')])
+            with open(base + '.json') as meta_file:
+                meta = json.load(meta_file)
+            if only and meta['view'] not in only:
+                continue
+            merged = views[meta['view']]
+            merged['profiles'].append(meta)
+            if os.path.exists(base + '.folded'):
+                with open(base + '.folded') as folded:
+                    for line in folded:
+                        stack, _, samples = line.rstrip('\n').rpartition(' ')
+                        merged['stacks'][stack] += int(samples)
+        return views
+
+    def report(self, merged, top):
+        own, inclusive = Counter(), Counter()
+        for stack, samples in merged['stacks'].items():
+            frames = stack.split(';')
+            own[frames[-1]] += samples
+            # Once per stack, so recursion doesn't count a function twice
+            for frame in set(frames):
+                inclusive[frame] += samples
+        samples = sum(merged['stacks'].values())
+
+        statements = defaultdict(lambda: {'ms': 0.0, 'count': 0})
+        for profile in merged['profiles']:
+            for query in profile['queries']:
+                statements[query['sql']]['ms'] += query['ms']
+                statements[query['sql']]['count'] += 1
+
+        profiles = merged['profiles']
+        return {
+            'profiles': len(profiles),
+            'samples': samples,
+            'mean_ms': sum(profile['ms'] for profile in profiles) / len(profiles),
+            'mean_queries': sum(len(profile['queries']) for profile in profiles) / len(profiles),
+            'mean_sql_ms': sum(query['ms'] for profile in profiles for query in profile['queries']) / len(profiles),
+            'functions': [
+                {'name': name, 'self': count / samples, 'total': inclusive[name] / samples}
+                for name, count in own.most_common(top)
+            ] if samples else [],
+            'sql': [
+                {'sql': sql, **totals}
+                for sql, totals in sorted(statements.items(), key=lambda item: -item[1]['ms'])[:top]
+            ],
+        }
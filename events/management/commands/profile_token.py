@@ -0,0 +1,12 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from events.profiling import HEADER, make_token
+
+
+class Command(BaseCommand):
+    help = 'Print a signed token that makes ProfilingMiddleware profile the requests carrying it'
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'{HEADER}: {make_token()}')
+        self.stderr.write(f'Valid for {settings.PROFILE_TOKEN_MAX_AGE} seconds')
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from events.search import install_search_index, uninstall_search_index
+
+
+class Command(BaseCommand):
+    help = 'Recreate the full-text search index for events (and its triggers on SQLite)'
+
+    def handle(self, *args, **options):
+        with connection.schema_editor() as schema_editor:
+            uninstall_search_index(schema_editor)
+            install_search_index(schema_editor)
+        self.stdout.write(f"Rebuilt search index for {connection.vendor}")
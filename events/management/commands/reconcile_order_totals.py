@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from events.orders import reconcile_totals
+
+
+class Command(BaseCommand):
+    help = "Check every order's total_price against its lines at their purchase prices, and optionally repair it"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repair', action='store_true', help='overwrite wrong totals with the line total')
+        parser.add_argument('--after', type=int, default=0, metavar='ORDER_ID', help='resume after this order id')
+        parser.add_argument('--chunk-size', type=int, default=10_000, help='orders per query')
+        parser.add_argument('--show', type=int, default=10, help='mismatches to list')
+
+    def handle(self, *args, **options):
+        result = reconcile_totals(
+            after=options['after'], chunk_size=options['chunk_size'], repair=options['repair'], progress=self.progress,
+        )
+        for mismatch in result['mismatches'][:options['show']]:
+            self.stdout.write(
+                f"  order {mismatch['order_id']}: total_price {mismatch['total_price']}, lines {mismatch['lines']}"
+            )
+        self.stdout.write(
+            f"Checked {result['checked']} orders: {result['mismatched']} mismatched, {result['repaired']} repaired, "
+            f"{result['without_lines']} without lines"
+        )
+        if result['mismatched'] > result['repaired']:
+            raise CommandError(f"{result['mismatched'] - result['repaired']} order totals don't match their lines")
+
+    def progress(self, result):
+        self.stdout.write(
+            f"  through order {result['last_order_id']}: {result['checked']} checked, {result['mismatched']} mismatched"
+        )
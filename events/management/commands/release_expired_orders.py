@@ -0,0 +1,27 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from events.holds import release_expired_holds
+
+
+class Command(BaseCommand):
+    help = 'Cancel pending orders whose hold has expired and return their tickets to stock'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ttl-minutes', type=int, help='override settings.ORDER_HOLD_TTL')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--loop', action='store_true', help='keep running as a worker')
+        parser.add_argument('--interval', type=float, default=30.0, help='seconds between sweeps with --loop')
+
+    def handle(self, *args, **options):
+        ttl = timedelta(minutes=options['ttl_minutes']) if options['ttl_minutes'] else None
+
+        while True:
+            released = release_expired_holds(ttl=ttl, batch_size=options['batch_size'])
+            if released or not options['loop']:
+                self.stdout.write(f"Released {released} expired orders")
+            if not options['loop']:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,38 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from events.inventory import shard_ticket, merge_shards, sync_sharded
+from events.models import Ticket
+
+
+class Command(BaseCommand):
+    help = 'Shard or merge ticket inventory, or sync the cached totals of sharded tickets'
+
+    def add_arguments(self, parser):
+        parser.add_argument('ticket_ids', nargs='*', type=int)
+        parser.add_argument('--shards', type=int, default=settings.TICKET_SHARD_COUNT)
+        parser.add_argument('--merge', action='store_true', help='merge the shards back into one row')
+        parser.add_argument('--sync', action='store_true', help='refresh the cached totals of all sharded tickets')
+        parser.add_argument('--loop', action='store_true', help='keep syncing as a worker (with --sync)')
+        parser.add_argument('--interval', type=float, default=5.0, help='seconds between syncs with --loop')
+
+    def handle(self, *args, **options):
+        if options['sync']:
+            while True:
+                synced = sync_sharded(options['ticket_ids'] or None)
+                if not options['loop']:
+                    self.stdout.write(f"Synced {synced} sharded tickets")
+                    return
+                time.sleep(options['interval'])
+
+        if not options['ticket_ids']:
+            raise CommandError('Give ticket ids, or --sync')
+        for ticket in Ticket.objects.filter(id__in=options['ticket_ids']):
+            if options['merge']:
+                done = merge_shards(ticket)
+            else:
+                done = shard_ticket(ticket, options['shards'])
+            verb = 'merged' if options['merge'] else f"split over {options['shards']} shards"
+            self.stdout.write(f"{ticket}: {verb}" if done else f"{ticket}: skipped")
@@ -0,0 +1,224 @@
+"""
+Per-request instrumentation with a Prometheus endpoint.
+
+``MetricsMiddleware`` counts every request and times it into a latency
+histogram by URL name, method and status class. A share of requests
+(``METRICS_SAMPLE_RATE``) is also sampled in depth: a database execute
+wrapper, installed on every connection, counts their SQL queries and
+times them, and the compiled serializers time their ``.data``. Outside a
+sampled request the wrapper only reads a context variable, so the cost
+of the rest is a couple of clock reads and a locked dict update.
+
+The aggregates live in this process, and ``metrics_view`` serves them
+in the Prometheus text format at ``/metrics`` to the addresses in
+``METRICS_ALLOWED_IPS``. Each worker process keeps its own, so scrape
+every worker (or run one per container) rather than a load balancer in
+front of several.
+"""
+import random
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from django.views.decorators.http import require_GET
+
+# Seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+_lock = threading.Lock()
+_metrics = {}
+_current = ContextVar('request_metrics', default=None)
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, help, labels=()):
+        self.name, self.help, self.labels = name, help, labels
+        self.values = {}
+
+    def inc(self, *labels, amount=1):
+        with _lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+    def samples(self):
+        for labels, value in sorted(self.values.items()):
+            yield self.name, dict(zip(self.labels, labels)), value
+
+
+class Histogram:
+    kind = 'histogram'
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        self.name, self.help, self.labels, self.buckets = name, help, labels, buckets
+        # labels -> [count per bucket (the last one is +Inf), sum]
+        self.values = {}
+
+    def observe(self, value, *labels):
+        index = bisect_left(self.buckets, value)
+        with _lock:
+            counts = self.values.get(labels)
+            if counts is None:
+                counts = self.values[labels] = [0] * (len(self.buckets) + 1) + [0]
+            counts[index] += 1
+            counts[-1] += value
+
+    def samples(self):
+        for labels, counts in sorted(self.values.items()):
+            labels = dict(zip(self.labels, labels))
+            total = 0
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                total += count
+                yield f'{self.name}_bucket', {**labels, 'le': str(bound)}, total
+            yield f'{self.name}_sum', labels, counts[-1]
+            yield f'{self.name}_count', labels, total
+
+
+def _register(metric):
+    _metrics[metric.name] = metric
+    return metric
+
+
+requests_total = _register(Counter(
+    'iticket_http_requests_total', 'Requests by URL name, method and status class', ('view', 'method', 'status'),
+))
+request_seconds = _register(Histogram(
+    'iticket_http_request_duration_seconds', 'Time to a response, by URL name and method', ('view', 'method'),
+))
+sampled_total = _register(Counter(
+    'iticket_sampled_requests_total', 'Requests whose queries and serialization were measured', ('view',),
+))
+queries_per_request = _register(Histogram(
+    'iticket_db_queries_per_request', 'SQL queries per sampled request', ('view',), buckets=QUERY_BUCKETS,
+))
+query_seconds = _register(Histogram(
+    'iticket_db_duration_seconds', 'Time in SQL queries per sampled request', ('view',),
+))
+serializer_seconds = _register(Histogram(
+    'iticket_serializer_duration_seconds', 'Time in serializer output per sampled request that serialized',
+    ('view',),
+))
+cache_lookups = _register(Counter(
+    'iticket_catalogue_cache_lookups_total', 'Catalogue cache lookups by result', ('result',),
+))
+
+
+class RequestMetrics:
+    """What a sampled request spent, filled in by the execute wrapper and ``timed_serialization``"""
+    __slots__ = ('queries', 'query_seconds', 'serializer_seconds')
+
+    def __init__(self):
+        self.queries = 0
+        self.query_seconds = 0.0
+        self.serializer_seconds = 0.0
+
+
+def record_queries(execute, sql, params, many, context):
+    """Database execute wrapper; see ``instrument_connection``"""
+    current = _current.get()
+    if current is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        current.queries += 1
+        current.query_seconds += time.perf_counter() - started
+
+
+def instrument_connection(connection):
+    if record_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_queries)
+
+
+@contextmanager
+def timed_serialization():
+    current = _current.get()
+    if current is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        current.serializer_seconds += time.perf_counter() - started
+
+
+def view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    # Unresolved paths share one label, so scanners can't grow the series without bound
+    return (match.url_name or match.view_name) if match else 'unmatched'
+
+
+class MetricsMiddleware:
+    """Times and counts every request and samples ``METRICS_SAMPLE_RATE`` of them in depth"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def _start(self):
+        sampled = RequestMetrics() if random.random() < settings.METRICS_SAMPLE_RATE else None
+        return time.perf_counter(), sampled, _current.set(sampled)
+
+    def _finish(self, request, response, started, sampled, token):
+        # A streamed response is timed to its first byte
+        elapsed = time.perf_counter() - started
+        _current.reset(token)
+        view, method = view_name(request), request.method
+        requests_total.inc(view, method, f'{response.status_code // 100}xx')
+        request_seconds.observe(elapsed, view, method)
+        if sampled is not None:
+            sampled_total.inc(view)
+            queries_per_request.observe(sampled.queries, view)
+            query_seconds.observe(sampled.query_seconds, view)
+            if sampled.serializer_seconds:
+                serializer_seconds.observe(sampled.serializer_seconds, view)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        state = self._start()
+        response = self.get_response(request)
+        self._finish(request, response, *state)
+        return response
+
+    async def __acall__(self, request):
+        state = self._start()
+        response = await self.get_response(request)
+        self._finish(request, response, *state)
+        return response
+
+
+def _escape(value):
+    return str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+def exposition():
+    """All metrics in the Prometheus text format"""
+    lines = []
+    with _lock:
+        for metric in _metrics.values():
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            for name, labels, value in metric.samples():
+                if labels:
+                    name += '{' + ','.join(f'{key}="{_escape(val)}"' for key, val in labels.items()) + '}'
+                lines.append(f'{name} {value}')
+    return '\n'.join(lines) + '\n'
+
+
+@require_GET
+def metrics_view(request):
+    if request.META.get('REMOTE_ADDR') not in settings.METRICS_ALLOWED_IPS:
+        return HttpResponseForbidden()
+    return HttpResponse(exposition(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,52 @@
+# Generated by Django 5.0.2 on 2026-10-17 19:28
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Sum, Min, Max
+from django.db.models.functions import Coalesce
+
+
+def fill_ticket_summary(apps, schema_editor):
+    Event = apps.get_model('events', 'Event')
+    Ticket = apps.get_model('events', 'Ticket')
+    tickets = Ticket.objects.filter(event=OuterRef('pk')).order_by().values('event')
+    Event.objects.update(
+        min_price=Subquery(tickets.annotate(value=Min('price')).values('value')),
+        max_price=Subquery(tickets.annotate(value=Max('price')).values('value')),
+        tickets_remaining=Coalesce(Subquery(tickets.annotate(value=Sum('quantity_available')).values('value')), 0),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0002_order_status_created_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='max_price',
+            field=models.DecimalField(blank=True, decimal_places=2, editable=False, max_digits=10, null=True),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='min_price',
+            field=models.DecimalField(blank=True, decimal_places=2, editable=False, max_digits=10, null=True),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='tickets_remaining',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['is_active', 'min_price'], name='event_active_min_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['is_active', 'max_price'], name='event_active_max_price_idx'),
+        ),
+        migrations.RunPython(fill_ticket_summary, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.0.2 on 2026-10-17 20:03
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0006_event_cancellation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ticket',
+            name='shard_count',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.CreateModel(
+            name='TicketShard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('index', models.PositiveSmallIntegerField()),
+                ('quantity', models.PositiveIntegerField()),
+                ('ticket', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shards', to='events.ticket')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='ticketshard',
+            constraint=models.UniqueConstraint(fields=('ticket', 'index'), name='ticket_shard_index_uniq'),
+        ),
+    ]
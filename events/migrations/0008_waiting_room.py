@@ -0,0 +1,54 @@
+# Generated by Django 5.0.2 on 2026-10-17 20:07
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+from events.search import install_search_index
+
+
+def reinstall_search_index(apps, schema_editor):
+    # SQLite adds and removes the column by rebuilding events_event, which drops the FTS triggers
+    install_search_index(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0007_ticket_shards'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AdmissionQueue',
+            fields=[
+                ('event', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='admission_queue', serialize=False, to='events.event')),
+                ('issued', models.PositiveIntegerField(default=0)),
+                ('next_admission', models.DateTimeField()),
+            ],
+        ),
+        # On reverse this runs after the RemoveField below has rebuilt the table
+        migrations.RunPython(migrations.RunPython.noop, reinstall_search_index),
+        migrations.AddField(
+            model_name='event',
+            name='waiting_room',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.RunPython(reinstall_search_index, migrations.RunPython.noop),
+        migrations.CreateModel(
+            name='QueueEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('seq', models.PositiveIntegerField()),
+                ('admit_at', models.DateTimeField()),
+                ('used_at', models.DateTimeField(blank=True, null=True)),
+                ('event', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='queue_entries', to='events.event')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='queue_entries', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='queueentry',
+            constraint=models.UniqueConstraint(fields=('event', 'user'), name='queue_entry_event_user_uniq'),
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.0.2 on 2026-10-17 20:50
+
+from django.db import migrations, models
+
+
+def fill_order_summary(apps, schema_editor):
+    Order = apps.get_model('events', 'Order')
+    OrderItem = apps.get_model('events', 'OrderItem')
+    last_id = 0
+    while True:
+        order_ids = list(Order.objects.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:1000])
+        if not order_ids:
+            return
+        lines = {order_id: [] for order_id in order_ids}
+        items = OrderItem.objects.filter(order_id__in=order_ids).order_by('id')
+        for order_id, quantity, title in items.values_list('order_id', 'quantity', 'ticket__event__title'):
+            lines[order_id].append((quantity, title))
+        Order.objects.bulk_update([
+            Order(
+                id=order_id,
+                line_count=len(order_lines),
+                ticket_count=sum(quantity for quantity, _ in order_lines),
+                event_titles=list(dict.fromkeys(title for _, title in order_lines)),
+            )
+            for order_id, order_lines in lines.items()
+        ], ['line_count', 'ticket_count', 'event_titles'])
+        last_id = order_ids[-1]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0008_waiting_room'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='event_titles',
+            field=models.JSONField(default=list, editable=False),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='line_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='ticket_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_order_summary, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.0.2 on 2026-10-17 21:02
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def fill_unit_price(apps, schema_editor):
+    # The price paid was never stored; the ticket's current price is the best there is
+    OrderItem = apps.get_model('events', 'OrderItem')
+    Ticket = apps.get_model('events', 'Ticket')
+    OrderItem.objects.filter(unit_price__isnull=True).update(
+        unit_price=Subquery(Ticket.objects.filter(pk=OuterRef('ticket_id')).values('price'))
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0009_order_summary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='orderitem',
+            name='unit_price',
+            field=models.DecimalField(decimal_places=2, max_digits=10, null=True),
+        ),
+        migrations.RunPython(fill_unit_price, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='orderitem',
+            name='unit_price',
+            field=models.DecimalField(decimal_places=2, max_digits=10),
+        ),
+    ]
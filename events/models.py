@@ -1,5 +1,9 @@
 from django.db import models
+from django.conf import settings
+from django.db.models import F, OuterRef, Subquery, Sum, Min, Max, Case, When, Value
+from django.db.models.functions import Cast, Coalesce, Round
 from django.contrib.auth.models import User
+from django.utils import timezone
 from django.core.validators import MinValueValidator
 from decimal import Decimal
 
@@ -11,6 +15,43 @@ class Category(models.Model):
         return self.name
 
 
+class EventQuerySet(models.QuerySet):
+    def refresh_summary(self):
+        """Recompute the denormalized price range and remaining stock from the tickets"""
+        tickets = Ticket.objects.filter(event=OuterRef('pk')).order_by().values('event')
+        return self.update(
+            min_price=Subquery(tickets.annotate(value=Min('price')).values('value')),
+            max_price=Subquery(tickets.annotate(value=Max('price')).values('value')),
+            tickets_remaining=Coalesce(
+                Subquery(tickets.annotate(value=Sum('quantity_available')).values('value')), 0
+            ),
+        )
+
+    def adjust_remaining(self, delta):
+        return self.update(tickets_remaining=F('tickets_remaining') + delta)
+
+    def adjust_remaining_many(self, deltas):
+        """adjust_remaining() for several events in one UPDATE; ``deltas`` maps event id to delta"""
+        delta = Case(*[When(id=event_id, then=Value(value)) for event_id, value in deltas.items()])
+        return self.filter(id__in=deltas).update(tickets_remaining=F('tickets_remaining') + delta)
+
+    def restock(self, items):
+        """Counterpart of TicketQuerySet.restock for tickets_remaining; runs after it"""
+        plain = items.filter(ticket__shard_count=0)
+        held = plain.filter(ticket__event=OuterRef('pk')).order_by().values('ticket__event').annotate(
+            total=Sum('quantity')
+        ).values('total')
+        restocked = self.filter(id__in=plain.values('ticket__event_id')).update(
+            tickets_remaining=F('tickets_remaining') + Subquery(held)
+        )
+        # Sharded tickets were re-totalled by TicketQuerySet.restock
+        sharded = items.filter(ticket__shard_count__gt=0).values('ticket__event_id')
+        return restocked + self.filter(id__in=sharded).refresh_summary()
+
+    def restock_orders(self, order_ids):
+        return self.restock(OrderItem.objects.filter(order_id__in=order_ids))
+
+
 class Event(models.Model):
     title = models.CharField(max_length=200)
     description = models.TextField()
@@ -19,15 +60,106 @@ class Event(models.Model):
     organizer = models.ForeignKey(User, on_delete=models.CASCADE, related_name='organized_events')
     category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, blank=True)
     is_active = models.BooleanField(default=True)
+    # Buyers queue for admission tokens before they can order (events.waiting_room)
+    waiting_room = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # Summary of the tickets, kept in sync on ticket changes (see EventQuerySet)
+    min_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True, editable=False)
+    max_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True, editable=False)
+    tickets_remaining = models.PositiveIntegerField(default=0, editable=False)
+
+    objects = EventQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['is_active', 'min_price'], name='event_active_min_price_idx'),
+            models.Index(fields=['is_active', 'max_price'], name='event_active_max_price_idx'),
+            # Keyset pagination over (date, id), see HybridPagination
+            models.Index(fields=['date', 'id'], condition=models.Q(is_active=True), name='event_active_date_id_idx'),
+            # The same pages filtered by category, read in order instead of sorting the whole category
+            models.Index(
+                fields=['category', 'date', 'id'], condition=models.Q(is_active=True),
+                name='event_active_category_date_idx',
+            ),
+        ]
+
     def __str__(self):
         return self.title
 
     @property
     def available_tickets(self):
-        return self.tickets.filter(quantity_available__gt=0)
+        # Filter in Python when tickets are prefetched; .filter() would bypass the cache
+        if 'tickets' in getattr(self, '_prefetched_objects_cache', {}):
+            return [ticket for ticket in self.tickets.all() if ticket.stock > 0]
+        return self.tickets.with_stock().in_stock()
+
+
+def _held(items, ticket):
+    """Total quantity of ``items`` per ticket, correlated on the outer ``ticket`` column"""
+    return items.filter(ticket=OuterRef(ticket)).order_by().values('ticket').annotate(
+        total=Sum('quantity')
+    ).values('total')
+
+
+class TicketQuerySet(models.QuerySet):
+    def take(self, quantity):
+        """Atomically decrement stock, only on rows that still have enough left (unsharded tickets)"""
+        return self.filter(shard_count=0, quantity_available__gte=quantity).update(
+            quantity_available=F('quantity_available') - quantity,
+            updated_at=timezone.now(),
+        )
+
+    def take_many(self, quantities):
+        """take() for several tickets in one UPDATE; ``quantities`` maps ticket id to amount"""
+        amount = Case(*[When(id=ticket_id, then=Value(quantity)) for ticket_id, quantity in quantities.items()])
+        return self.filter(id__in=quantities, shard_count=0, quantity_available__gte=amount).update(
+            quantity_available=F('quantity_available') - amount,
+            updated_at=timezone.now(),
+        )
+
+    def restock(self, items):
+        """
+        Give back the quantities of an OrderItem queryset in one set-based
+        UPDATE. Sharded tickets get theirs back on shard 0.
+        """
+        tickets = self.filter(id__in=items.values('ticket_id'))
+        restocked = tickets.filter(shard_count=0).update(
+            quantity_available=F('quantity_available') + Subquery(_held(items, 'pk')),
+            updated_at=timezone.now(),
+        )
+        sharded = tickets.filter(shard_count__gt=0)
+        if TicketShard.objects.filter(ticket__in=sharded, index=0).update(
+            quantity=F('quantity') + Subquery(_held(items, 'ticket_id'))
+        ):
+            restocked += sharded.sync_shards()
+        return restocked
+
+    def restock_orders(self, order_ids):
+        return self.restock(OrderItem.objects.filter(order_id__in=order_ids))
+
+    def with_stock(self):
+        """Annotate the live shard total that Ticket.stock reads for sharded tickets"""
+        shards = TicketShard.objects.filter(ticket=OuterRef('pk')).order_by().values('ticket').annotate(
+            total=Sum('quantity')
+        ).values('total')
+        return self.annotate(shard_stock=Coalesce(Subquery(shards), 0))
+
+    def in_stock(self):
+        """Tickets with any stock left; needs ``with_stock()``"""
+        return self.filter(
+            models.Q(shard_count=0, quantity_available__gt=0) | models.Q(shard_count__gt=0, shard_stock__gt=0)
+        )
+
+    def sync_shards(self):
+        """Store the shard total of each sharded ticket in quantity_available"""
+        shards = TicketShard.objects.filter(ticket=OuterRef('pk')).order_by().values('ticket').annotate(
+            total=Sum('quantity')
+        ).values('total')
+        return self.filter(shard_count__gt=0).update(
+            quantity_available=Coalesce(Subquery(shards), 0), updated_at=timezone.now(),
+        )
 
 
 class Ticket(models.Model):
@@ -35,14 +167,91 @@ class Ticket(models.Model):
     name = models.CharField(max_length=100)
     price = models.DecimalField(max_digits=10, decimal_places=2, validators=[MinValueValidator(Decimal('0.01'))])
     quantity_available = models.PositiveIntegerField()
+    # 0: stock lives in quantity_available. Otherwise it is split over this
+    # many TicketShard rows and quantity_available is a synced total
+    shard_count = models.PositiveSmallIntegerField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = TicketQuerySet.as_manager()
+
     def __str__(self):
         return f"{self.name} - {self.event.title}"
 
     class Meta:
         ordering = ['price']
+        indexes = [
+            # An event's tickets in display order. No partial in-stock index:
+            # in_stock() also matches sharded tickets by their live shard
+            # total, which such an index condition can't express
+            models.Index(fields=['event', 'price'], name='ticket_event_price_idx'),
+        ]
+
+    @property
+    def stock(self):
+        """Tickets left right now, read from the shards when the ticket is sharded"""
+        if not self.shard_count:
+            return self.quantity_available
+        if hasattr(self, 'shard_stock'):
+            return self.shard_stock
+        return self.shards.aggregate(total=Coalesce(Sum('quantity'), 0))['total']
+
+
+class TicketShardQuerySet(models.QuerySet):
+    def take(self, quantity):
+        return self.filter(quantity__gte=quantity).update(quantity=F('quantity') - quantity)
+
+    def take_many(self, amounts):
+        """Decrement several shards in one UPDATE; ``amounts`` maps shard id to amount"""
+        amount = Case(*[When(id=shard_id, then=Value(value)) for shard_id, value in amounts.items()])
+        return self.filter(id__in=amounts, quantity__gte=amount).update(quantity=F('quantity') - amount)
+
+
+class TicketShard(models.Model):
+    """A slice of a sharded ticket's stock, see events.inventory"""
+    ticket = models.ForeignKey(Ticket, on_delete=models.CASCADE, related_name='shards')
+    index = models.PositiveSmallIntegerField()
+    quantity = models.PositiveIntegerField()
+
+    objects = TicketShardQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['ticket', 'index'], name='ticket_shard_index_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.ticket} [shard {self.index}]"
+
+
+def line_cents(prefix=''):
+    """
+    ``unit_price * quantity`` of order lines in whole cents, for summing.
+    SQLite keeps decimals as floats, so a sum of prices could land off the
+    cent; whole cents add up exactly on every backend. ``prefix`` reaches
+    the lines through a relation, e.g. ``'order_items__'``.
+    """
+    cents = Cast(Round(F(f'{prefix}unit_price') * 100), models.BigIntegerField())
+    return cents * F(f'{prefix}quantity')
+
+
+def from_cents(cents):
+    return (Decimal(cents) / 100).quantize(Decimal('0.01'))
+
+
+class OrderQuerySet(models.QuerySet):
+    def with_line_cents(self):
+        """Annotate ``line_cents``, the lines' total in cents (None for an order without lines)"""
+        return self.annotate(line_cents=Sum(line_cents('order_items__')))
+
+    def refresh_summary(self):
+        """Recompute the line summary of these orders from their items, e.g. after an admin edit"""
+        lines = {order_id: [] for order_id in self.values_list('id', flat=True)}
+        items = OrderItem.objects.filter(order_id__in=lines).order_by('id')
+        for order_id, quantity, title in items.values_list('order_id', 'quantity', 'ticket__event__title'):
+            lines[order_id].append((quantity, title))
+        orders = [Order(id=order_id, **Order.summarize(order_lines)) for order_id, order_lines in lines.items()]
+        return Order.objects.bulk_update(orders, ['line_count', 'ticket_count', 'event_titles'], batch_size=1000)
 
 
 class Order(models.Model):
@@ -50,6 +259,7 @@ class Order(models.Model):
         ('pending', 'Pending'),
         ('completed', 'Completed'),
         ('canceled', 'Canceled'),
+        ('refunded', 'Refunded'),
     ]
 
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='orders')
@@ -57,14 +267,48 @@ class Order(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
 
+    # Summary of the lines, snapshotted at purchase time so order history
+    # pages read this row alone (see Order.summarize)
+    line_count = models.PositiveIntegerField(default=0, editable=False)
+    ticket_count = models.PositiveIntegerField(default=0, editable=False)
+    event_titles = models.JSONField(default=list, editable=False)
+
+    objects = OrderQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Pending orders by age: the hold queue scanned by the expiry sweeper
+            models.Index(fields=['status', 'created_at'], name='order_status_created_idx'),
+            # A customer's order history, keyset-paginated over (created_at, id)
+            models.Index(fields=['user', 'created_at', 'id'], name='order_user_created_id_idx'),
+            # The same history filtered by ?status=
+            models.Index(fields=['user', 'status', 'created_at', 'id'], name='order_user_status_created_idx'),
+        ]
+
     def __str__(self):
         return f"Order #{self.id} - {self.user.username}"
 
+    @staticmethod
+    def summarize(lines):
+        """The summary fields of an order with ``lines``, ``(quantity, event title)`` pairs in line order"""
+        lines = list(lines)
+        return {
+            'line_count': len(lines),
+            'ticket_count': sum(quantity for quantity, _ in lines),
+            'event_titles': list(dict.fromkeys(title for _, title in lines)),
+        }
+
+    @property
+    def hold_expires_at(self):
+        return self.created_at + settings.ORDER_HOLD_TTL
+
+    @property
+    def is_hold_expired(self):
+        return self.status == 'pending' and timezone.now() >= self.hold_expires_at
+
     def calculate_total_price(self):
-        total = Decimal('0.00')
-        for item in self.order_items.all():
-            total += item.ticket.price * item.quantity
-        return total
+        """Total of the lines at their purchase prices, in one aggregate query"""
+        return from_cents(self.order_items.aggregate(cents=Sum(line_cents()))['cents'] or 0)
 
     def confirm_order(self):
         """Confirm order and finalize ticket allocation"""
@@ -76,45 +320,120 @@ class Order(models.Model):
 
     def cancel_order(self):
         """Cancel order and restore ticket quantities"""
-        if self.status == 'pending':
-            for order_item in self.order_items.all():
-                order_item.ticket.quantity_available += order_item.quantity
-                order_item.ticket.save()
-            self.status = 'canceled'
-            self.save()
-            return True
-        return False
-
-    def __str__(self):
-        return f"Order #{self.id} - {self.user.username}"
-
-    def calculate_total_price(self):
-        total = Decimal('0.00')
-        for item in self.order_items.all():
-            total += item.ticket.price * item.quantity
-        return total
+        from .orders import cancel_orders
+        result = cancel_orders([self.pk])[0]
+        if 'error' in result:
+            return False
+        self.status = result['status']
+        return True
 
 
 class OrderItem(models.Model):
     order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='order_items')
     ticket = models.ForeignKey(Ticket, on_delete=models.CASCADE)
     quantity = models.PositiveIntegerField()
+    # The ticket's price when the line was bought; later price changes don't touch it
+    unit_price = models.DecimalField(max_digits=10, decimal_places=2)
 
     def __str__(self):
         return f"{self.quantity} x {self.ticket.name}"
 
     def save(self, *args, **kwargs):
         # Update ticket availability when order item is created
-        if self.pk is None:  # New order item
-            if self.ticket.quantity_available < self.quantity:
+        created = self.pk is None
+        if created:  # New order item
+            if self.unit_price is None:
+                self.unit_price = self.ticket.price
+            from .inventory import take_stock
+            if not take_stock(self.ticket, self.quantity):
+                self.ticket.refresh_from_db(fields=['quantity_available', 'shard_count'])
                 raise ValueError(
-                    f"Not enough tickets available. Available: {self.ticket.quantity_available}, Requested: {self.quantity}")
-            self.ticket.quantity_available -= self.quantity
-            self.ticket.save()
+                    f"Not enough tickets available. Available: {self.ticket.stock}, Requested: {self.quantity}")
+            from .caching import invalidate_events
+            invalidate_events([self.ticket.event_id])
         super().save(*args, **kwargs)
+        if created:
+            # Outside a purchase, e.g. from the admin: keep the order's summary in step
+            Order.objects.filter(pk=self.order_id).refresh_summary()
 
     def delete(self, *args, **kwargs):
         # Restore ticket availability when order item is deleted
-        self.ticket.quantity_available += self.quantity
-        self.ticket.save()
-        super().delete(*args, **kwargs)
\ No newline at end of file
+        from .orders import remove_order_items
+        deleted = remove_order_items([self.pk])
+        self.pk = None
+        return deleted
+
+
+class EventCancellation(models.Model):
+    """
+    A mass cancellation of an event's orders, run in chunks by
+    events.cancellations.run_cancellation. ``last_order_id`` is the
+    checkpoint: every order at or below it has been processed, so a job
+    that stopped halfway resumes where it left off.
+    """
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+    INVENTORY_CHOICES = [
+        ('zero', 'Zero the event inventory'),
+        ('restock', 'Return tickets to stock'),
+    ]
+
+    event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name='cancellations')
+    inventory = models.CharField(max_length=10, choices=INVENTORY_CHOICES, default='zero')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    last_order_id = models.PositiveBigIntegerField(default=0)
+    orders_canceled = models.PositiveIntegerField(default=0)
+    orders_refunded = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+    requested_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        constraints = [
+            # At most one unfinished job per event
+            models.UniqueConstraint(
+                fields=['event'], condition=models.Q(status__in=['queued', 'running']),
+                name='event_cancellation_active_uniq',
+            ),
+        ]
+
+    def __str__(self):
+        return f"Cancellation of {self.event} ({self.status})"
+
+
+class AdmissionQueue(models.Model):
+    """Per-event state of the database waiting room backend"""
+    event = models.OneToOneField(Event, on_delete=models.CASCADE, primary_key=True, related_name='admission_queue')
+    issued = models.PositiveIntegerField(default=0)
+    next_admission = models.DateTimeField()
+
+
+class QueueEntry(models.Model):
+    """A buyer's place in an event's waiting room (database backend)"""
+    event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name='queue_entries')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='queue_entries')
+    seq = models.PositiveIntegerField()
+    admit_at = models.DateTimeField()
+    used_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['event', 'user'], name='queue_entry_event_user_uniq'),
+        ]
+
+    def __str__(self):
+        return f"#{self.seq} {self.user} for {self.event}"
+
+
+class ThrottleCounter(models.Model):
+    """Requests of one client in one window of a rate (database throttle backend)"""
+    key = models.CharField(max_length=255, primary_key=True)
+    hits = models.PositiveIntegerField(default=0)
+    expires_at = models.DateTimeField(db_index=True)
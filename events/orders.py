@@ -0,0 +1,142 @@
+"""
+Order state changes after creation (see reservations.py for creation).
+
+Every cancellation goes through ``cancel_orders``: the API views, the bulk
+endpoint, ``Order.cancel_order`` and deletes through the API or the admin.
+It locks the orders so a concurrent second cancel sees the first one's
+result, and restores stock with grouped F() UPDATEs, so the cost doesn't
+depend on line count.
+"""
+from django.db import transaction
+
+from .caching import invalidate_orders, invalidate_events
+from .locks import lock_rows
+from .models import Event, Ticket, Order, OrderItem, from_cents
+
+
+def _unique(order_ids):
+    return list(dict.fromkeys(order_ids))
+
+
+def _process(orders, order_ids, check):
+    """
+    Lock ``orders`` among ``order_ids`` and split them into the ones that
+    pass ``check`` and per-id error results for the rest.
+    """
+    orders = {order.id: order for order in lock_rows(orders.filter(id__in=order_ids), 'status')}
+    accepted, results = [], {}
+    for order_id in order_ids:
+        order = orders.get(order_id)
+        error = "Order not found" if order is None else check(order)
+        if error:
+            results[order_id] = {'order_id': order_id, 'error': error}
+        else:
+            accepted.append(order_id)
+    return accepted, results
+
+
+def _confirmable(order):
+    if order.status != 'pending':
+        return "Order already processed"
+    if order.is_hold_expired:
+        return "Order hold has expired"
+    return None
+
+
+def _cancelable(order):
+    if order.status != 'pending':
+        return "Only pending orders can be canceled"
+    return None
+
+
+def _scope(user):
+    return Order.objects.filter(user_id=user.pk) if user is not None else Order.objects.all()
+
+
+def confirm_orders(order_ids, user=None):
+    """Confirm many pending orders with one UPDATE; returns one result per id"""
+    order_ids = _unique(order_ids)
+    with transaction.atomic():
+        accepted, results = _process(_scope(user), order_ids, _confirmable)
+        Order.objects.filter(id__in=accepted).update(status='completed')
+    for order_id in accepted:
+        results[order_id] = {'order_id': order_id, 'status': 'completed'}
+    return [results[order_id] for order_id in order_ids]
+
+
+def cancel_orders(order_ids, user=None):
+    """
+    Cancel pending orders and restore their stock; returns one result per id.
+
+    ``user`` limits the lookup to that customer's orders.
+    """
+    order_ids = _unique(order_ids)
+    with transaction.atomic():
+        accepted, results = _process(_scope(user), order_ids, _cancelable)
+        if accepted:
+            Ticket.objects.restock_orders(accepted)
+            Event.objects.restock_orders(accepted)
+            invalidate_orders(accepted)
+            Order.objects.filter(id__in=accepted).update(status='canceled')
+    for order_id in accepted:
+        results[order_id] = {'order_id': order_id, 'status': 'canceled'}
+    return [results[order_id] for order_id in order_ids]
+
+
+def remove_order_items(item_ids):
+    """
+    Delete order lines, e.g. from the admin, returning their stock unless
+    the order was already canceled (which restored it). Returns the result
+    of the DELETE.
+    """
+    with transaction.atomic():
+        items = OrderItem.objects.filter(id__in=item_ids)
+        lock_rows(Order.objects.filter(id__in=items.values('order_id')), 'status')
+        held = items.exclude(order__status='canceled')
+        Ticket.objects.restock(held)
+        Event.objects.restock(held)
+        invalidate_events(held.values_list('ticket__event_id', flat=True).distinct())
+        order_ids = list(items.order_by().values_list('order_id', flat=True).distinct())
+        deleted = items.delete()
+        Order.objects.filter(id__in=order_ids).refresh_summary()
+        return deleted
+
+
+def reconcile_totals(after=0, chunk_size=10_000, repair=False, progress=None):
+    """
+    Check every order's ``total_price`` against its lines at their purchase
+    prices, walking the orders in primary key chunks of one aggregate query
+    each, so memory stays flat however many orders there are. ``repair``
+    writes the line total over a wrong one. Orders without lines are
+    counted but left alone. ``progress(result)`` is called after each chunk;
+    ``result['last_order_id']`` is where to resume with ``after``.
+    """
+    result = {
+        'checked': 0, 'mismatched': 0, 'repaired': 0, 'without_lines': 0,
+        'last_order_id': after, 'mismatches': [],
+    }
+    while True:
+        rows = list(
+            Order.objects.filter(id__gt=result['last_order_id']).order_by('id').with_line_cents()
+            .values_list('id', 'total_price', 'line_cents')[:chunk_size]
+        )
+        if not rows:
+            return result
+        with transaction.atomic():
+            for order_id, total_price, cents in rows:
+                if cents is None:
+                    result['without_lines'] += 1
+                    continue
+                expected = from_cents(cents)
+                if total_price == expected:
+                    continue
+                result['mismatched'] += 1
+                if len(result['mismatches']) < 100:
+                    result['mismatches'].append({'order_id': order_id, 'total_price': total_price, 'lines': expected})
+                # Conditional, so a total changed since it was read is left for the next run
+                if repair and Order.objects.filter(id=order_id, total_price=total_price).update(total_price=expected):
+                    result['repaired'] += 1
+        result['checked'] += len(rows)
+        result['last_order_id'] = rows[-1][0]
+        if progress:
+            progress(result)
@@ -0,0 +1,233 @@
+import base64
+import binascii
+import json
+import operator
+from functools import reduce
+
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ValidationError
+from django.core.paginator import InvalidPage
+from django.db import connections
+from django.db.models import Q
+from rest_framework.exceptions import NotFound, ValidationError as BadRequest
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from .async_views import fetch, gather
+
+
+def _cursor_value(value):
+    # Full precision: DjangoJSONEncoder would cut datetimes to milliseconds
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return value if isinstance(value, (int, float, str, type(None))) else str(value)
+
+
+def _flip(field):
+    return field[1:] if field.startswith('-') else f'-{field}'
+
+
+class HybridPagination(PageNumberPagination):
+    """
+    Page numbers by default; keyset pagination when the client sends
+    ``?cursor=`` (empty for the first page) to a view that declares
+    ``keyset_ordering``, e.g. ``('-date', '-id')``.
+
+    Keyset pages seek on the ordering tuple instead of using OFFSET, so
+    page 10,000 costs the same as page 1 and no COUNT(*) is issued.
+    ``?count=approx`` adds an estimated total.
+
+    Keyset pages can only follow ``keyset_ordering``. A request whose
+    filters order the rows some other way (``?ordering=date``, or the
+    relevance ranking of ``?search=``) gets a 400 rather than pages in
+    an order it didn't ask for; without ``cursor`` it pages by number.
+    """
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+    approximate_count_limit = 10_000
+    invalid_cursor_message = 'Invalid cursor'
+    conflicting_ordering_message = (
+        'Cursor pages are ordered by {ordering}; leave out cursor to order or rank the results otherwise'
+    )
+
+    keyset = False
+
+    def paginate_queryset(self, queryset, request, view=None):
+        ordering = getattr(view, 'keyset_ordering', None)
+        self.keyset = bool(ordering) and self.cursor_query_param in request.query_params
+        if not self.keyset:
+            return super().paginate_queryset(queryset, request, view)
+
+        self.request = request
+        self.ordering = tuple(ordering)
+        self.check_ordering(queryset)
+        self.page_size = self.get_page_size(request)
+        position, self.reverse = self.decode_cursor(request, queryset.model)
+
+        self.count = None
+        if request.query_params.get(self.count_query_param) == 'approx':
+            self.count = self.estimate_count(queryset)
+
+        ordering = [_flip(field) for field in self.ordering] if self.reverse else list(self.ordering)
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(self.seek(ordering, position))
+
+        rows = list(queryset[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if self.reverse:
+            rows.reverse()
+            self.has_next, self.has_previous = position is not None, has_more
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+        self.rows = rows
+        return rows
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """
+        ``paginate_queryset`` for async views. Page-number pages fetch the
+        count and the rows concurrently; keyset pages run the sync code on
+        a thread.
+        """
+        ordering = getattr(view, 'keyset_ordering', None)
+        if ordering and self.cursor_query_param in request.query_params:
+            return await sync_to_async(self.paginate_queryset)(queryset, request, view)
+
+        self.keyset = False
+        self.request = request
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+
+        paginator = self.django_paginator_class(queryset, page_size)
+        page_number = request.query_params.get(self.page_query_param) or 1
+        try:
+            offset = (int(page_number) - 1) * page_size
+        except (TypeError, ValueError):
+            offset = -1
+        rows = None
+        if offset >= 0:
+            paginator.count, rows = await gather(queryset.acount(), fetch(queryset[offset:offset + page_size]))
+        else:
+            paginator.count = await queryset.acount()
+        if page_number in self.last_page_strings:
+            page_number = paginator.num_pages
+
+        try:
+            self.page = paginator.page(page_number)
+        except InvalidPage as exc:
+            msg = self.invalid_page_message.format(page_number=page_number, message=str(exc))
+            raise NotFound(msg)
+        if rows is None:
+            rows = await fetch(self.page.object_list)
+        self.page.object_list = rows
+
+        if paginator.num_pages > 1 and self.template is not None:
+            self.display_page_controls = True
+        return rows
+
+    def check_ordering(self, queryset):
+        """Refuse a queryset already ordered in a way the keyset can't follow"""
+        requested = tuple(queryset.query.order_by)
+        if requested != self.ordering[:len(requested)]:
+            raise BadRequest({
+                self.cursor_query_param: [self.conflicting_ordering_message.format(ordering=', '.join(self.ordering))]
+            })
+
+    def seek(self, ordering, position):
+        """Rows strictly after ``position`` in ``ordering``, led by an index-friendly range bound"""
+        clauses = []
+        for i, field in enumerate(ordering):
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            equal = {name.lstrip('-'): value for name, value in zip(ordering[:i], position[:i])}
+            clauses.append(Q(**equal, **{f'{field.lstrip("-")}__{lookup}': position[i]}))
+        first = ordering[0]
+        bound = Q(**{f'{first.lstrip("-")}__{"lte" if first.startswith("-") else "gte"}': position[0]})
+        return bound & reduce(operator.or_, clauses)
+
+    def estimate_count(self, queryset):
+        connection = connections[queryset.db]
+        if connection.vendor == 'postgresql':
+            plan = json.loads(queryset.order_by().explain(format='json'))
+            return int(plan[0]['Plan']['Plan Rows'])
+        # Elsewhere count, but stop at a bound so deep tables stay cheap
+        return queryset.order_by()[:self.approximate_count_limit].count()
+
+    def make_cursor(self, row, reverse):
+        position = [_cursor_value(getattr(row, field.lstrip('-'))) for field in self.ordering]
+        payload = json.dumps({'p': position, 'r': int(reverse)})
+        return base64.urlsafe_b64encode(payload.encode()).decode()
+
+    def encode_cursor(self, row, reverse):
+        cursor = self.make_cursor(row, reverse)
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, cursor)
+
+    def decode_cursor(self, request, model):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+            fields = [model._meta.get_field(field.lstrip('-')) for field in self.ordering]
+            position = [field.to_python(value) for field, value in zip(fields, payload['p'])]
+            if len(position) != len(fields):
+                raise ValueError
+            return position, bool(payload.get('r'))
+        except (TypeError, ValueError, KeyError, binascii.Error, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_next_link(self):
+        if not self.keyset:
+            return super().get_next_link()
+        if not self.has_next or not self.rows:
+            return None
+        return self.encode_cursor(self.rows[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.keyset:
+            return super().get_previous_link()
+        if not self.has_previous or not self.rows:
+            return None
+        return self.encode_cursor(self.rows[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        if not self.keyset:
+            return super().get_paginated_response(data)
+        response = {
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        }
+        if self.count is not None:
+            response = {'count': self.count, 'count_is_estimate': True, **response}
+        return Response(response)
+
+    def get_schema_operation_parameters(self, view):
+        parameters = super().get_schema_operation_parameters(view)
+        ordering = getattr(view, 'keyset_ordering', None)
+        if not ordering:
+            return parameters
+        return parameters + [
+            {
+                'name': self.cursor_query_param,
+                'required': False,
+                'in': 'query',
+                'description': (
+                    f"Keyset pagination: send it empty for the first page, then follow next/previous. "
+                    f"Pages are ordered by {', '.join(ordering)}, so it can't be combined with an ordering "
+                    f"or a search ranking (400). page is ignored."
+                ),
+                'schema': {'type': 'string'},
+            },
+            {
+                'name': self.count_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'With cursor, "approx" adds an estimated total to the page.',
+                'schema': {'type': 'string', 'enum': ['approx']},
+            },
+        ]
@@ -11,8 +11,8 @@ class IsOrganizerOrReadOnly(permissions.BasePermission):
         if request.method in permissions.SAFE_METHODS:
             return True
 
-        # Write permissions are only allowed to the organizer
-        return obj.organizer == request.user
+        # Write permissions are only allowed to the organizer; by id, so neither user is loaded
+        return obj.organizer_id == request.user.id
 
 
 class IsOrderOwner(permissions.BasePermission):
@@ -21,4 +21,4 @@ class IsOrderOwner(permissions.BasePermission):
     """
 
     def has_object_permission(self, request, view, obj):
-        return obj.user == request.user
\ No newline at end of file
+        return obj.user_id == request.user.id
\ No newline at end of file
@@ -0,0 +1,192 @@
+"""
+On-demand sampling profiles of single API requests.
+
+``ProfilingMiddleware`` profiles a request when it carries a valid
+``X-Profile`` header (a token from ``manage.py profile_token``, signed
+with SECRET_KEY and good for ``PROFILE_TOKEN_MAX_AGE`` seconds), or at
+random for ``PROFILE_SAMPLE_RATE`` of requests. Anything else costs one
+header lookup.
+
+A profiled request runs with a ``Sampler`` thread that records the
+request thread's stack every ``PROFILE_INTERVAL`` seconds, from the
+middleware down, and an execute wrapper that traces its SQL (statements
+and timings, never parameters). When it finishes, two files named after
+the URL name, time and process land in ``PROFILE_DIR``: ``.folded`` with
+the stacks in the collapsed format flame graph tools read, and ``.json``
+with the request, its timing and the SQL trace. The response says which
+in ``X-Profile-Id``. ``manage.py merge_profiles`` aggregates them per view.
+
+Under ASGI the middleware runs on the event loop, so that is the thread
+sampled: it also runs the other requests in flight, and time the request
+spends in a worker thread (sync views, queries) shows as ``(waiting)``.
+Profile those views under WSGI, or on a quiet worker.
+"""
+import json
+import os
+import random
+import sys
+import sysconfig
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+from functools import lru_cache
+from itertools import count
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core import signing
+from django.utils import timezone
+
+from .metrics import view_name
+
+HEADER = 'X-Profile'
+TOKEN_SALT = 'events.profiling'
+WAITING = '(waiting)'
+
+_trace = ContextVar('profile_sql_trace', default=None)
+_sequence = count()
+
+
+def make_token():
+    return signing.TimestampSigner(salt=TOKEN_SALT).sign('profile')
+
+
+def _valid_token(value):
+    try:
+        signing.TimestampSigner(salt=TOKEN_SALT).unsign(value, max_age=settings.PROFILE_TOKEN_MAX_AGE)
+    except signing.BadSignature:
+        return False
+    return True
+
+
+@lru_cache(maxsize=1)
+def _roots():
+    # Longest first: site-packages lives inside the stdlib directory
+    paths = {str(settings.BASE_DIR), *sysconfig.get_paths().values()} | {p for p in sys.path if p}
+    return sorted(paths, key=len, reverse=True)
+
+
+@lru_cache(maxsize=None)
+def _label(code):
+    """``package.module:qualname`` for a code object, without ';' (the frame separator)"""
+    path = code.co_filename
+    for root in _roots():
+        if path.startswith(root + os.sep):
+            path = path[len(root) + 1:]
+            break
+    module = path.removesuffix('.py').replace(os.sep, '.')
+    name = getattr(code, 'co_qualname', code.co_name)
+    return f'{module}:{name}'.replace(';', ':')
+
+
+class Sampler(threading.Thread):
+    """Counts the stacks of ``thread_id`` below the frame running ``root``, every ``interval`` seconds"""
+
+    def __init__(self, thread_id, root, interval):
+        super().__init__(name='profile-sampler', daemon=True)
+        self.thread_id, self.root, self.interval = thread_id, root, interval
+        self.stacks = Counter()
+        self._done = threading.Event()
+
+    def run(self):
+        while not self._done.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if self._done.is_set():
+                # The request thread is already in stop(), waiting for us
+                break
+            names = []
+            while frame is not None and frame.f_code is not self.root:
+                names.append(_label(frame.f_code))
+                frame = frame.f_back
+            if frame is None:
+                # An event loop between steps of the request, e.g. while a thread runs its queries
+                names = [WAITING]
+            if names:
+                self.stacks[';'.join(reversed(names))] += 1
+
+    def stop(self):
+        self._done.set()
+        self.join()
+        return self.stacks
+
+
+def trace_queries(execute, sql, params, many, context):
+    """Database execute wrapper; appends to the trace of a profiled request"""
+    trace = _trace.get()
+    if trace is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        trace.append({'sql': sql, 'many': many, 'ms': (time.perf_counter() - started) * 1000})
+
+
+def instrument_connection(connection):
+    if trace_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(trace_queries)
+
+
+def _wanted(request):
+    value = request.headers.get(HEADER)
+    if value:
+        return _valid_token(value)
+    return settings.PROFILE_SAMPLE_RATE and random.random() < settings.PROFILE_SAMPLE_RATE
+
+
+def write_profile(request, response, stacks, trace, elapsed):
+    """Write the ``.folded`` and ``.json`` files of a profile; returns their name"""
+    view = view_name(request)
+    stamp = timezone.now().strftime('%Y%m%dT%H%M%S')
+    name = f"{view.replace(os.sep, '_')}.{stamp}.{os.getpid()}.{next(_sequence)}"
+    os.makedirs(settings.PROFILE_DIR, exist_ok=True)
+    base = os.path.join(settings.PROFILE_DIR, name)
+    with open(base + '.folded', 'w') as out:
+        out.writelines(f'{stack} {samples}\n' for stack, samples in stacks.most_common())
+    with open(base + '.json', 'w') as out:
+        json.dump({
+            'view': view, 'method': request.method, 'path': request.path, 'status': response.status_code,
+            'ms': elapsed * 1000, 'interval_ms': settings.PROFILE_INTERVAL * 1000,
+            'samples': sum(stacks.values()), 'queries': trace,
+        }, out, indent=1)
+    return name
+
+
+class ProfilingMiddleware:
+    """Profiles the requests ``_wanted`` picks; see the module docstring"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def _start(self, root):
+        sampler = Sampler(threading.get_ident(), root, settings.PROFILE_INTERVAL)
+        trace = []
+        token = _trace.set(trace)
+        sampler.start()
+        return sampler, trace, token, time.perf_counter()
+
+    def _finish(self, request, response, sampler, trace, token, started):
+        elapsed = time.perf_counter() - started
+        stacks = sampler.stop()
+        _trace.reset(token)
+        response['X-Profile-Id'] = write_profile(request, response, stacks, trace, elapsed)
+        return response
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not _wanted(request):
+            return self.get_response(request)
+        state = self._start(ProfilingMiddleware.__call__.__code__)
+        return self._finish(request, self.get_response(request), *state)
+
+    async def __acall__(self, request):
+        if not _wanted(request):
+            return await self.get_response(request)
+        state = self._start(ProfilingMiddleware.__acall__.__code__)
+        return self._finish(request, await self.get_response(request), *state)
@@ -0,0 +1,102 @@
+"""
+Read replicas for the catalogue.
+
+settings.DATABASE_REPLICAS names the DATABASES aliases that replicate
+'default'. ``ReplicaRouter`` sends every write and, by default, every
+read to the primary; reads only go to a replica inside ``replica_reads()``.
+ViewSets opt in per action with ``ReplicaReadsMixin.replica_actions``, so
+the catalogue is served from replicas while orders, reservations and
+anything else that locks or re-reads its own writes stays on the primary.
+
+Replicas lag the primary, so a buyer who has just bought tickets could be
+shown the stock from before the purchase. Every successful write request
+through ``ReplicaReadsMixin`` pins its user to the primary for
+settings.REPLICA_PIN_SECONDS (read-your-writes); the pins live in the
+cache named by settings.REPLICA_PIN_CACHE, which has to be shared by all
+workers.
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, connections
+from rest_framework.permissions import SAFE_METHODS
+
+_replica_reads = ContextVar('replica_reads', default=False)
+
+
+def get_replicas():
+    return settings.DATABASE_REPLICAS
+
+
+@contextmanager
+def replica_reads(allowed=True):
+    """Let reads in this block (and in threads it hands work to) go to a replica, or not with ``allowed=False``"""
+    token = _replica_reads.set(allowed)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+def _pin_key(user_id):
+    return f'replicas:pin:{user_id}'
+
+
+def pin_to_primary(user):
+    """Serve ``user``'s reads from the primary until the replicas have caught up"""
+    if user.is_authenticated and get_replicas() and settings.REPLICA_PIN_SECONDS:
+        caches[settings.REPLICA_PIN_CACHE].set(_pin_key(user.pk), 1, timeout=settings.REPLICA_PIN_SECONDS)
+
+
+def is_pinned(user):
+    if not user.is_authenticated or not get_replicas():
+        return False
+    return caches[settings.REPLICA_PIN_CACHE].get(_pin_key(user.pk)) is not None
+
+
+class ReplicaRouter:
+    """Writes, and reads outside ``replica_reads()``, go to the primary; the rest to a random replica"""
+
+    def db_for_read(self, model, **hints):
+        replicas = get_replicas()
+        # A transaction on the primary must keep seeing its own rows
+        if replicas and _replica_reads.get() and not connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return random.choice(replicas)
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Every alias holds the same rows
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get their schema through replication
+        return db not in get_replicas()
+
+
+class ReplicaReadsMixin:
+    # Safe requests to the actions named in replica_actions read from a
+    # replica unless the user is pinned to the primary; successful writes
+    # to any action pin the user (events.replicas). Pinned users also skip
+    # the catalogue cache, which other users may have filled from a replica
+    replica_actions = ()
+    pinned_to_primary = False
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if self.action in self.replica_actions and request.method in SAFE_METHODS and get_replicas():
+            self.pinned_to_primary = is_pinned(request.user)
+            if not self.pinned_to_primary:
+                _replica_reads.set(True)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        # Not a token reset: under ASGI, initial() may have run in another context
+        _replica_reads.set(False)
+        if response.status_code < 400 and request.method not in SAFE_METHODS:
+            pin_to_primary(request.user)
+        return super().finalize_response(request, response, *args, **kwargs)
@@ -0,0 +1,246 @@
+from collections import OrderedDict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import F
+
+from .caching import invalidate_events
+from .inventory import allocate, schedule_sync, take_sharded
+from .locks import lock_rows
+from .models import Event, Ticket, TicketShard, Order, OrderItem
+
+
+class ReservationError(Exception):
+    """Raised when an order cannot be reserved as a whole"""
+
+    def __init__(self, message, shortfalls=None):
+        super().__init__(message)
+        self.message = message
+        self.shortfalls = shortfalls or []
+
+
+def _merge_lines(items):
+    """Collapse repeated ticket ids so every ticket row is updated exactly once"""
+    lines = OrderedDict()
+    for item in items:
+        ticket_id = item['ticket_id']
+        lines[ticket_id] = lines.get(ticket_id, 0) + item['quantity']
+    return lines
+
+
+def _shortfalls(lines):
+    available = {ticket.id: ticket.stock for ticket in Ticket.objects.filter(id__in=lines).with_stock()}
+    return [
+        {
+            'ticket_id': ticket_id,
+            'requested': quantity,
+            'available': available.get(ticket_id, 0),
+        }
+        for ticket_id, quantity in lines.items()
+        if available.get(ticket_id, 0) < quantity
+    ]
+
+
+def _inactive(ticket_ids):
+    return list(Ticket.objects.filter(id__in=ticket_ids, event__is_active=False).values_list('id', flat=True))
+
+
+def _inactive_error(ticket_ids):
+    return f"Event is not active for ticket: {', '.join(map(str, ticket_ids))}"
+
+
+def reserve_order(user, items):
+    """
+    Reserve all lines of an order in a single transaction.
+
+    ``items`` is a list of ``{'ticket_id': ..., 'quantity': ...}`` dicts.
+    Stock is taken with conditional ``UPDATE``s, so either every line is
+    reserved or nothing is and a ``ReservationError`` lists the shortfalls.
+    Tickets of inactive (e.g. canceled) events can't be reserved.
+    """
+    lines = _merge_lines(items)
+    if not lines:
+        raise ReservationError("Order has no items")
+
+    # The title goes into the order's summary snapshot
+    tickets = Ticket.objects.annotate(
+        event_title=F('event__title'), event_active=F('event__is_active'),
+    ).in_bulk(list(lines))
+
+    missing = [ticket_id for ticket_id in lines if ticket_id not in tickets]
+    if missing:
+        raise ReservationError(f"Ticket does not exist: {', '.join(map(str, missing))}")
+    inactive = [ticket_id for ticket_id in lines if not tickets[ticket_id].event_active]
+    if inactive:
+        raise ReservationError(_inactive_error(inactive))
+
+    shortfalls = [
+        {
+            'ticket_id': ticket_id,
+            'requested': quantity,
+            'available': tickets[ticket_id].quantity_available,
+        }
+        for ticket_id, quantity in lines.items()
+        if tickets[ticket_id].quantity_available < quantity
+    ]
+    if shortfalls:
+        raise ReservationError("Not enough tickets available", shortfalls)
+
+    total_price = sum(
+        (tickets[ticket_id].price * quantity for ticket_id, quantity in lines.items()),
+        Decimal('0.00'),
+    )
+
+    with transaction.atomic():
+        # Lock rows in id order so concurrent orders can't deadlock each other
+        for ticket_id in sorted(lines):
+            ticket = tickets[ticket_id]
+            if ticket.shard_count:
+                took = take_sharded(ticket_id, ticket.shard_count, lines[ticket_id])
+            else:
+                # The event may have been canceled since the lookup
+                took = Ticket.objects.filter(id=ticket_id, event__is_active=True).take(lines[ticket_id])
+            if not took:
+                transaction.set_rollback(True)
+                break
+        else:
+            # Sharded tickets leave the event row alone; their totals are synced later
+            taken = {}
+            for ticket_id, quantity in lines.items():
+                if not tickets[ticket_id].shard_count:
+                    event_id = tickets[ticket_id].event_id
+                    taken[event_id] = taken.get(event_id, 0) + quantity
+            for event_id, quantity in taken.items():
+                Event.objects.filter(id=event_id).adjust_remaining(-quantity)
+            schedule_sync([ticket_id for ticket_id in lines if tickets[ticket_id].shard_count])
+
+            # By id: assigning the user would load a token-only user (users.authentication) inside the transaction
+            order = Order.objects.create(
+                user_id=user.id, total_price=total_price, status='pending',
+                **Order.summarize((item['quantity'], tickets[item['ticket_id']].event_title) for item in items),
+            )
+            # Still rendered from the caller's user, loaded when read
+            Order.user.field.set_cached_value(order, user)
+            OrderItem.objects.bulk_create([
+                OrderItem(
+                    order=order, ticket=tickets[item['ticket_id']], quantity=item['quantity'],
+                    unit_price=tickets[item['ticket_id']].price,
+                )
+                for item in items
+            ])
+            invalidate_events(ticket.event_id for ticket in tickets.values())
+            return order
+
+    inactive = _inactive(lines)
+    if inactive:
+        raise ReservationError(_inactive_error(inactive))
+    raise ReservationError("Not enough tickets available", _shortfalls(lines))
+
+
+def reserve_orders(user, orders):
+    """
+    Set-based ``reserve_order`` for a batch of orders, e.g. from a reseller.
+
+    All tickets involved are locked once, orders are allocated in the given
+    order against the locked stock, and the accepted ones are written with
+    one UPDATE per table and ``bulk_create``. An order that can't be filled,
+    or has tickets of an inactive event, doesn't affect the others. Returns
+    one result dict per order: either ``{'order': Order}`` or
+    ``{'error': ..., 'shortfalls': [...]}``.
+    """
+    merged = [_merge_lines(items) for items in orders]
+    ticket_ids = sorted({ticket_id for lines in merged for ticket_id in lines})
+    results = [None] * len(orders)
+
+    with transaction.atomic():
+        tickets = {ticket.id: ticket for ticket in lock_rows(
+            Ticket.objects.filter(id__in=ticket_ids), 'quantity_available'
+        )}
+        shards = {}
+        for shard in lock_rows(TicketShard.objects.filter(ticket_id__in=ticket_ids), 'quantity'):
+            shards.setdefault(shard.ticket_id, []).append(shard)
+        inactive = set(_inactive(tickets))
+        remaining = {
+            ticket_id: sum(shard.quantity for shard in shards.get(ticket_id, []))
+            if ticket.shard_count else ticket.quantity_available
+            for ticket_id, ticket in tickets.items()
+        }
+
+        accepted = []
+        for index, lines in enumerate(merged):
+            if not lines:
+                results[index] = {'error': "Order has no items", 'shortfalls': []}
+                continue
+            missing = [ticket_id for ticket_id in lines if ticket_id not in tickets]
+            if missing:
+                results[index] = {
+                    'error': f"Ticket does not exist: {', '.join(map(str, missing))}", 'shortfalls': []
+                }
+                continue
+            if inactive.intersection(lines):
+                results[index] = {
+                    'error': _inactive_error(ticket_id for ticket_id in lines if ticket_id in inactive),
+                    'shortfalls': [],
+                }
+                continue
+            shortfalls = [
+                {'ticket_id': ticket_id, 'requested': quantity, 'available': remaining[ticket_id]}
+                for ticket_id, quantity in lines.items()
+                if remaining[ticket_id] < quantity
+            ]
+            if shortfalls:
+                results[index] = {'error': "Not enough tickets available", 'shortfalls': shortfalls}
+                continue
+            for ticket_id, quantity in lines.items():
+                remaining[ticket_id] -= quantity
+            accepted.append(index)
+
+        if not accepted:
+            return results
+
+        taken, shards_taken, events_taken = {}, {}, {}
+        for ticket_id, ticket in tickets.items():
+            if ticket.shard_count:
+                quantity = sum(shard.quantity for shard in shards.get(ticket_id, [])) - remaining[ticket_id]
+                if quantity:
+                    shards_taken.update(allocate(shards[ticket_id], quantity))
+                continue
+            quantity = ticket.quantity_available - remaining[ticket_id]
+            if quantity:
+                taken[ticket_id] = quantity
+                events_taken[ticket.event_id] = events_taken.get(ticket.event_id, 0) - quantity
+        if taken:
+            Ticket.objects.take_many(taken)
+        if shards_taken:
+            TicketShard.objects.take_many(shards_taken)
+        if events_taken:
+            Event.objects.adjust_remaining_many(events_taken)
+        schedule_sync([ticket_id for ticket_id, ticket in tickets.items() if ticket.shard_count])
+
+        # Read apart from the locked tickets, so the events rows aren't locked too
+        titles = dict(Ticket.objects.filter(id__in=tickets).values_list('id', 'event__title'))
+        created = Order.objects.bulk_create([
+            Order(
+                user_id=user.id,
+                total_price=sum(
+                    (tickets[ticket_id].price * quantity for ticket_id, quantity in merged[index].items()),
+                    Decimal('0.00'),
+                ),
+                status='pending',
+                **Order.summarize((item['quantity'], titles[item['ticket_id']]) for item in orders[index]),
+            )
+            for index in accepted
+        ])
+        OrderItem.objects.bulk_create([
+            OrderItem(
+                order=order, ticket=tickets[item['ticket_id']], quantity=item['quantity'],
+                unit_price=tickets[item['ticket_id']].price,
+            )
+            for index, order in zip(accepted, created)
+            for item in orders[index]
+        ])
+        for index, order in zip(accepted, created):
+            results[index] = {'order': order}
+        invalidate_events({tickets[ticket_id].event_id for ticket_id in ticket_ids if ticket_id in tickets})
+
+    return results
@@ -0,0 +1,164 @@
+"""
+Full-text search over event titles and descriptions.
+
+The index is maintained by the database itself, so it stays current on
+every Event save/delete, including bulk writes:
+
+* SQLite: an external-content FTS5 table fed by triggers on events_event.
+* PostgreSQL: a generated tsvector column with a GIN index.
+
+Backends are picked by database vendor unless settings.EVENT_SEARCH_BACKEND
+names one explicitly (dotted path). ``BasicSearchBackend`` keeps the old
+``icontains`` behaviour for any other database.
+
+Note: Django rebuilds SQLite tables for some schema changes, which drops
+the triggers. Migrations that alter events_event on SQLite must call
+``install_search_index`` again (or run ``manage.py rebuild_search_index``).
+"""
+import operator
+import re
+from functools import reduce
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q, BooleanField, FloatField
+from django.db.models.expressions import RawSQL
+from django.utils.module_loading import import_string
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+SQLITE_FTS = 'events_event_fts'
+SQLITE_INSTALL = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {SQLITE_FTS} USING fts5(
+        title, description, content='events_event', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3 4'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS {SQLITE_FTS}_ai AFTER INSERT ON events_event BEGIN
+        INSERT INTO {SQLITE_FTS}(rowid, title, description) VALUES (new.id, new.title, new.description);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {SQLITE_FTS}_ad AFTER DELETE ON events_event BEGIN
+        INSERT INTO {SQLITE_FTS}({SQLITE_FTS}, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {SQLITE_FTS}_au AFTER UPDATE OF title, description ON events_event BEGIN
+        INSERT INTO {SQLITE_FTS}({SQLITE_FTS}, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+        INSERT INTO {SQLITE_FTS}(rowid, title, description) VALUES (new.id, new.title, new.description);
+    END""",
+    # Weight title matches over description matches in the rank column
+    f"INSERT INTO {SQLITE_FTS}({SQLITE_FTS}, rank) VALUES ('rank', 'bm25(10.0, 1.0)')",
+    f"INSERT INTO {SQLITE_FTS}({SQLITE_FTS}) VALUES ('rebuild')",
+]
+SQLITE_UNINSTALL = [
+    f'DROP TRIGGER IF EXISTS {SQLITE_FTS}_ai',
+    f'DROP TRIGGER IF EXISTS {SQLITE_FTS}_ad',
+    f'DROP TRIGGER IF EXISTS {SQLITE_FTS}_au',
+    f'DROP TABLE IF EXISTS {SQLITE_FTS}',
+]
+
+POSTGRES_INSTALL = [
+    """ALTER TABLE events_event ADD COLUMN IF NOT EXISTS search_vector tsvector
+        GENERATED ALWAYS AS (
+            setweight(to_tsvector('simple', coalesce(title, '')), 'A') ||
+            setweight(to_tsvector('simple', coalesce(description, '')), 'B')
+        ) STORED""",
+    'CREATE INDEX IF NOT EXISTS event_search_vector_idx ON events_event USING gin (search_vector)',
+]
+POSTGRES_UNINSTALL = [
+    'DROP INDEX IF EXISTS event_search_vector_idx',
+    'ALTER TABLE events_event DROP COLUMN IF EXISTS search_vector',
+]
+
+
+def tokenize(text):
+    return [token.lower() for token in TOKEN_RE.findall(text or '')]
+
+
+class BasicSearchBackend:
+    """Substring match on title/description, same as DRF's SearchFilter"""
+
+    def search(self, queryset, text, prefix=True):
+        tokens = tokenize(text)
+        if not tokens:
+            return queryset
+        return queryset.filter(reduce(operator.and_, (
+            Q(title__icontains=token) | Q(description__icontains=token) for token in tokens
+        ))).annotate(search_rank=RawSQL('0', [], output_field=FloatField()))
+
+
+class SQLiteSearchBackend(BasicSearchBackend):
+    install_sql = SQLITE_INSTALL
+    uninstall_sql = SQLITE_UNINSTALL
+
+    def match_expression(self, tokens, prefix):
+        terms = [f'"{token}"' for token in tokens]
+        if prefix:
+            terms[-1] += '*'
+        return ' '.join(terms)
+
+    def search(self, queryset, text, prefix=True):
+        tokens = tokenize(text)
+        if not tokens:
+            return queryset
+        match = self.match_expression(tokens, prefix)
+        # Join the FTS table so MATCH drives the query and rank comes from the
+        # same scan; bm25 is lower-is-better, so negate it to rank descending
+        return queryset.extra(
+            tables=[SQLITE_FTS],
+            where=[f'{SQLITE_FTS}.rowid = events_event.id', f'{SQLITE_FTS} MATCH %s'],
+            params=[match],
+            select={'search_rank': f'-{SQLITE_FTS}.rank'},
+        )
+
+
+class PostgresSearchBackend(BasicSearchBackend):
+    install_sql = POSTGRES_INSTALL
+    uninstall_sql = POSTGRES_UNINSTALL
+
+    def tsquery(self, tokens, prefix):
+        terms = list(tokens)
+        if prefix:
+            terms[-1] += ':*'
+        return ' & '.join(terms)
+
+    def search(self, queryset, text, prefix=True):
+        tokens = tokenize(text)
+        if not tokens:
+            return queryset
+        query = self.tsquery(tokens, prefix)
+        return queryset.alias(search_match=RawSQL(
+            "events_event.search_vector @@ to_tsquery('simple', %s)", [query], output_field=BooleanField(),
+        )).filter(search_match=True).annotate(search_rank=RawSQL(
+            "ts_rank(events_event.search_vector, to_tsquery('simple', %s))",
+            [query], output_field=FloatField(),
+        ))
+
+
+VENDOR_BACKENDS = {
+    'sqlite': SQLiteSearchBackend,
+    'postgresql': PostgresSearchBackend,
+}
+
+
+def get_backend():
+    path = getattr(settings, 'EVENT_SEARCH_BACKEND', None)
+    if path:
+        return import_string(path)()
+    return VENDOR_BACKENDS.get(connection.vendor, BasicSearchBackend)()
+
+
+def _run(statements, schema_editor):
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def install_search_index(schema_editor):
+    backend = VENDOR_BACKENDS.get(schema_editor.connection.vendor)
+    if backend is not None:
+        _run(backend.install_sql, schema_editor)
+
+
+def uninstall_search_index(schema_editor):
+    backend = VENDOR_BACKENDS.get(schema_editor.connection.vendor)
+    if backend is not None:
+        _run(backend.uninstall_sql, schema_editor)
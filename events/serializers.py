@@ -1,7 +1,10 @@
+from django.conf import settings
 from rest_framework import serializers
 from django.contrib.auth.models import User
 from django.contrib.auth.password_validation import validate_password
 from .models import Event, Ticket, Order, OrderItem, Category
+from .fast_serializers import FastSerializerMixin, FastListSerializer
+from .fieldsets import SparseFieldsMixin
 
 
 class UserRegistrationSerializer(serializers.ModelSerializer):
@@ -38,32 +41,42 @@ class CategorySerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'name']
 
 
-class TicketSerializer(serializers.ModelSerializer):
+class TicketSerializer(FastSerializerMixin, serializers.ModelSerializer):
+    # The live figure, which for sharded tickets is the sum of the shards
+    quantity_available = serializers.IntegerField(source='stock', read_only=True)
+
     class Meta:
         model = Ticket
+        list_serializer_class = FastListSerializer
         fields = ['id', 'name', 'price', 'quantity_available']
         read_only_fields = ['id', 'name', 'price', 'quantity_available']
+        sparse_sources = {'quantity_available': ['quantity_available', 'shard_count']}
 
 
-class EventSerializer(serializers.ModelSerializer):
+class EventSerializer(SparseFieldsMixin, FastSerializerMixin, serializers.ModelSerializer):
     organizer = UserSerializer(read_only=True)
     category = CategorySerializer(read_only=True)
     category_id = serializers.PrimaryKeyRelatedField(
         queryset=Category.objects.all(), source='category', write_only=True
     )
     tickets = TicketSerializer(many=True, read_only=True)
+    available_tickets = TicketSerializer(many=True, read_only=True)
 
     class Meta:
         model = Event
+        list_serializer_class = FastListSerializer
         fields = [
             'id', 'title', 'description', 'date', 'location',
-            'organizer', 'category', 'category_id', 'is_active',
-            'created_at', 'updated_at', 'tickets', 'available_tickets'
+            'organizer', 'category', 'category_id', 'is_active', 'waiting_room',
+            'created_at', 'updated_at', 'tickets', 'available_tickets',
+            'min_price', 'max_price', 'tickets_remaining'
         ]
         read_only_fields = ['id', 'organizer', 'created_at', 'updated_at', 'available_tickets']
+        # Filtered from the prefetched tickets, see Event.available_tickets
+        sparse_sources = {'available_tickets': ['tickets', 'tickets__quantity_available', 'tickets__shard_count']}
 
 
-class OrderItemSerializer(serializers.ModelSerializer):
+class OrderItemSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     ticket = TicketSerializer(read_only=True)
     ticket_id = serializers.PrimaryKeyRelatedField(
         queryset=Ticket.objects.all(), source='ticket', write_only=True
@@ -71,16 +84,17 @@ class OrderItemSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = OrderItem
-        fields = ['id', 'ticket', 'ticket_id', 'quantity']
-        read_only_fields = ['id']
+        fields = ['id', 'ticket', 'ticket_id', 'quantity', 'unit_price']
+        read_only_fields = ['id', 'unit_price']
 
 
-class OrderSerializer(serializers.ModelSerializer):
+class OrderSerializer(SparseFieldsMixin, FastSerializerMixin, serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
     order_items = OrderItemSerializer(many=True, read_only=True)
 
     class Meta:
         model = Order
+        list_serializer_class = FastListSerializer
         fields = [
             'id', 'user', 'total_price', 'status', 'created_at',
             'order_items'
@@ -88,23 +102,27 @@ class OrderSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'user', 'total_price', 'created_at', 'status']
 
 
+class OrderSummarySerializer(SparseFieldsMixin, FastSerializerMixin, serializers.ModelSerializer):
+    # Order history rows, read from the summary columns of the order alone
+    class Meta:
+        model = Order
+        list_serializer_class = FastListSerializer
+        fields = ['id', 'total_price', 'status', 'created_at', 'line_count', 'ticket_count', 'event_titles']
+        read_only_fields = fields
+
+
 class OrderCreateSerializer(serializers.Serializer):
     ticket_id = serializers.IntegerField()
     quantity = serializers.IntegerField(min_value=1)
 
-    def validate(self, data):
-        ticket_id = data['ticket_id']
-        quantity = data['quantity']
 
-        try:
-            ticket = Ticket.objects.get(id=ticket_id)
-        except Ticket.DoesNotExist:
-            raise serializers.ValidationError("Ticket does not exist")
+class BulkOrderCreateSerializer(serializers.Serializer):
+    orders = serializers.ListField(
+        child=OrderCreateSerializer(many=True), allow_empty=False, max_length=settings.BULK_ORDER_LIMIT
+    )
 
-        if ticket.quantity_available < quantity:
-            raise serializers.ValidationError(
-                f"Not enough tickets available. Available: {ticket.quantity_available}"
-            )
 
-        data['ticket'] = ticket
-        return data
\ No newline at end of file
+class BulkOrderIdsSerializer(serializers.Serializer):
+    order_ids = serializers.ListField(
+        child=serializers.IntegerField(), allow_empty=False, max_length=settings.BULK_ORDER_LIMIT
+    )
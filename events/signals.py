@@ -0,0 +1,43 @@
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_save, post_delete, pre_delete
+from django.dispatch import receiver
+
+from .caching import invalidate_events, invalidate_category
+from . import metrics, profiling
+from .models import Event, Ticket, Category
+
+
+@receiver([post_save, post_delete], sender=Event)
+def event_changed(sender, instance, **kwargs):
+    invalidate_events([instance.id])
+
+
+@receiver([post_save, post_delete], sender=Ticket)
+def ticket_changed(sender, instance, origin=None, **kwargs):
+    # Cascading from an event delete: the event's own signal covers it
+    if isinstance(origin, Event) or getattr(origin, 'model', None) is Event:
+        return
+    Event.objects.filter(pk=instance.event_id).refresh_summary()
+    invalidate_events([instance.event_id])
+
+
+# pre_delete: once the category is gone its events have already been unlinked
+@receiver([post_save, pre_delete], sender=Category)
+def category_changed(sender, instance, **kwargs):
+    invalidate_category(instance)
+
+
+@receiver(connection_created)
+def apply_sqlite_pragmas(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite' or not settings.SQLITE_PRAGMAS:
+        return
+    with connection.cursor() as cursor:
+        for name, value in settings.SQLITE_PRAGMAS.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+
+
+@receiver(connection_created)
+def instrument_queries(sender, connection, **kwargs):
+    metrics.instrument_connection(connection)
+    profiling.instrument_connection(connection)
@@ -0,0 +1,27 @@
+from datetime import timedelta
+
+from django.core.cache import caches
+from django.utils import timezone
+
+from events.models import Event, Ticket
+
+
+def clear_caches():
+    """Catalogue responses, throttle counters, queue state and replica pins outlive a test's transaction"""
+    for alias in ('catalogue', 'throttle', 'waiting_room', 'default'):
+        caches[alias].clear()
+
+
+def make_event(organizer, i=0, tickets=(50,), price=10, **fields):
+    """An event ``i`` days ahead with a ticket tier per entry of ``tickets``, holding that many each"""
+    event = Event.objects.create(**{
+        'title': f'Event {i}', 'description': 'Lorem ipsum', 'date': timezone.now() + timedelta(days=i + 1),
+        'location': 'Hall', 'organizer': organizer, **fields,
+    })
+    Ticket.objects.bulk_create([
+        Ticket(event=event, name=f'Tier {j}', price=f'{price + j}.00', quantity_available=quantity)
+        for j, quantity in enumerate(tickets)
+    ])
+    Event.objects.filter(pk=event.pk).refresh_summary()
+    event.refresh_from_db()
+    return event
@@ -0,0 +1,94 @@
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+
+from events.cancellations import resume_cancellation, run_cancellation, start_cancellation
+from events.models import Event, EventCancellation, Ticket, Order
+from events.orders import cancel_orders, confirm_orders
+from events.reservations import reserve_order
+from .helpers import clear_caches, make_event
+
+
+class CancellationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.buyer = User.objects.create_user('buyer', password='x')
+        cls.event = make_event(cls.buyer, 0, tickets=(20,))
+        cls.other_event = make_event(cls.buyer, 1, tickets=(20,))
+        cls.ticket, cls.other = cls.event.tickets.get(), cls.other_event.tickets.get()
+        # Five orders of one ticket on each event; the first two paid, the last canceled already
+        cls.orders = [
+            reserve_order(cls.buyer, [{'ticket_id': cls.ticket.id, 'quantity': 1}, {'ticket_id': cls.other.id, 'quantity': 2}])
+            for _ in range(5)
+        ]
+        confirm_orders([order.id for order in cls.orders[:2]])
+        cancel_orders([cls.orders[4].id])
+        cls.untouched = reserve_order(cls.buyer, [{'ticket_id': cls.other.id, 'quantity': 1}])
+
+    def setUp(self):
+        clear_caches()
+
+    def stock(self, ticket):
+        return Ticket.objects.get(pk=ticket.pk).quantity_available
+
+    def statuses(self):
+        return list(Order.objects.filter(pk__in=[order.id for order in self.orders]).order_by('id').values_list('status', flat=True))
+
+    def test_takes_the_event_off_sale(self):
+        job = start_cancellation(self.event)
+        event = Event.objects.get(pk=self.event.pk)
+        self.assertFalse(event.is_active)
+        self.assertEqual((self.stock(self.ticket), event.tickets_remaining), (0, 0))
+        # A second request joins the running job
+        self.assertEqual(start_cancellation(self.event), job)
+
+    def test_unwinds_every_order(self):
+        job = run_cancellation(start_cancellation(self.event), chunk_size=2)
+        self.assertEqual(job.status, 'completed')
+        self.assertEqual((job.orders_canceled, job.orders_refunded), (2, 2))
+        self.assertEqual(self.statuses(), ['refunded', 'refunded', 'canceled', 'canceled', 'canceled'])
+        self.assertEqual(Order.objects.get(pk=self.untouched.pk).status, 'pending')
+        # Lines on other events go back to stock; the canceled event's tickets stay zeroed
+        self.assertEqual((self.stock(self.ticket), self.stock(self.other)), (0, 20 - 1))
+        self.assertEqual(Event.objects.get(pk=self.other_event.pk).tickets_remaining, 20 - 1)
+
+    def test_restock_mode_returns_the_event_tickets(self):
+        run_cancellation(start_cancellation(self.event, inventory='restock'))
+        self.assertEqual((self.stock(self.ticket), self.stock(self.other)), (20, 20 - 1))
+
+    def test_interrupted_job_resumes_without_restocking_twice(self):
+        job = start_cancellation(self.event, inventory='restock')
+        # The second chunk fails halfway through its transaction
+        with mock.patch('events.cancellations.invalidate_orders', side_effect=[None, RuntimeError('worker lost')]):
+            with self.assertRaises(RuntimeError):
+                run_cancellation(job, chunk_size=2)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.last_order_id), ('failed', self.orders[1].id))
+        self.assertEqual(self.statuses(), ['refunded', 'refunded', 'pending', 'pending', 'canceled'])
+        self.assertEqual(self.stock(self.other), 20 - 9 + 4)
+
+        self.assertEqual(resume_cancellation(job), 1)
+        job = run_cancellation(job, chunk_size=2)
+        self.assertEqual((job.status, job.orders_canceled, job.orders_refunded), ('completed', 2, 2))
+        self.assertEqual((self.stock(self.ticket), self.stock(self.other)), (20, 20 - 1))
+
+    def test_stopped_job_continues_from_its_checkpoint(self):
+        job = run_cancellation(start_cancellation(self.event, inventory='restock'), chunk_size=1, max_chunks=1)
+        self.assertEqual((job.status, job.last_order_id), ('running', self.orders[0].id))
+        job = run_cancellation(job, chunk_size=1)
+        self.assertEqual(job.status, 'completed')
+        self.assertEqual((self.stock(self.ticket), self.stock(self.other)), (20, 20 - 1))
+
+    def test_already_canceled_orders_are_left_alone(self):
+        job = start_cancellation(self.event, inventory='restock')
+        cancel_orders([self.orders[2].id])
+        job = run_cancellation(job)
+        self.assertEqual(job.orders_canceled, 1)
+        self.assertEqual((self.stock(self.ticket), self.stock(self.other)), (20, 20 - 1))
+        # Canceling again, or running the finished job again, gives nothing more back
+        self.assertIn('error', cancel_orders([self.orders[3].id])[0])
+        run_cancellation(job)
+        self.assertEqual(EventCancellation.objects.get(pk=job.pk).status, 'completed')
+        self.assertEqual((self.stock(self.ticket), self.stock(self.other)), (20, 20 - 1))
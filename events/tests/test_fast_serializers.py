@@ -0,0 +1,76 @@
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from events.inventory import shard_ticket
+from events.models import Category, Event, Ticket, Order
+from events.reservations import reserve_order
+from events.serializers import EventSerializer, TicketSerializer, OrderSerializer, OrderSummarySerializer
+from .helpers import clear_caches, make_event
+
+
+class FastSerializerParityTests(TestCase):
+    """The compiled plans return what DRF's own serialization would, for every serializer and route using them"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.organizer = User.objects.create_user('organizer', password='x', first_name='Ada')
+        cls.buyer = User.objects.create_user('buyer', password='x', email='buyer@example.com')
+        category = Category.objects.create(name='Concerts')
+        cls.events = [
+            make_event(cls.organizer, 0, tickets=(50, 0, 7), category=category),
+            # No category, no tickets, so no prices either
+            make_event(cls.organizer, 1, tickets=(), is_active=True),
+            make_event(cls.organizer, 2, tickets=(3,), price=99, category=category, waiting_room=True),
+        ]
+        tickets = Ticket.objects.filter(event=cls.events[0], quantity_available__gt=0)
+        cls.order_id = reserve_order(cls.buyer, [{'ticket_id': ticket.id, 'quantity': 2} for ticket in tickets]).id
+        shard_ticket(tickets.first(), 4)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.buyer)
+
+    def both(self, serialize):
+        """What ``serialize`` returns with the compiled plans off, then on"""
+        results = []
+        for fast in (False, True):
+            with override_settings(FAST_SERIALIZATION=fast):
+                clear_caches()
+                results.append(serialize())
+        return results
+
+    def assertSameResponses(self, url, **params):
+        slow, fast = self.both(lambda: self.client.get(url, params).content)
+        self.assertEqual(fast, slow)
+
+    def assertSameData(self, serializer_class, queryset):
+        slow, fast = self.both(lambda: serializer_class(queryset, many=True).data)
+        self.assertEqual(fast, slow)
+        for row in queryset:
+            slow, fast = self.both(lambda: serializer_class(row).data)
+            self.assertEqual(fast, slow)
+
+    def test_serializers(self):
+        self.assertSameData(EventSerializer, Event.objects.all())
+        self.assertSameData(TicketSerializer, Ticket.objects.with_stock())
+        self.assertSameData(OrderSerializer, Order.objects.all())
+        self.assertSameData(OrderSummarySerializer, Order.objects.all())
+
+    def test_event_routes(self):
+        self.assertSameResponses(reverse('event-list'))
+        self.assertSameResponses(reverse('event-list'), cursor='')
+        for event in self.events:
+            self.assertSameResponses(reverse('event-detail', args=[event.id]))
+            self.assertSameResponses(reverse('event-tickets', args=[event.id]))
+
+    def test_order_routes(self):
+        self.assertSameResponses(reverse('order-list'))
+        self.assertSameResponses(reverse('order-detail', args=[self.order_id]))
+
+    def test_sparse_fieldsets(self):
+        self.assertSameResponses(reverse('event-list'), fields='id,title,category,min_price')
+        self.assertSameResponses(reverse('event-list'), fields='id', expand='available_tickets')
+        self.assertSameResponses(reverse('event-detail', args=[self.events[0].id]), expand='organizer')
+        self.assertSameResponses(reverse('order-detail', args=[self.order_id]), fields='id', expand='order_items.ticket')
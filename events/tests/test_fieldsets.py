@@ -0,0 +1,82 @@
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from events.models import Category, Ticket
+from .helpers import clear_caches, make_event
+
+
+class SparseFieldsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.organizer = User.objects.create_user('organizer', password='x')
+        cls.buyer = User.objects.create_user('buyer', password='x')
+        cls.category = Category.objects.create(name='Concerts')
+        cls.event = make_event(cls.organizer, tickets=(50, 0, 20), category=cls.category)
+
+    def setUp(self):
+        clear_caches()
+        self.client = APIClient()
+
+    def get(self, url, status=200, **params):
+        clear_caches()
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, status, response.data)
+        return response.json()
+
+    def event_detail(self, **params):
+        return self.get(reverse('event-detail', args=[self.event.id]), **params)
+
+    def place_order(self):
+        self.client.force_authenticate(self.buyer)
+        tickets = Ticket.objects.filter(event=self.event, quantity_available__gt=0)
+        response = self.client.post(
+            reverse('order-list'), [{'ticket_id': ticket.id, 'quantity': 1} for ticket in tickets], format='json',
+        )
+        self.assertEqual(response.status_code, 201, response.content)
+        return reverse('order-detail', args=[response.json()['id']])
+
+    def test_fields_keep_only_the_listed_fields(self):
+        self.assertEqual(list(self.event_detail(fields='id,title,min_price')), ['id', 'title', 'min_price'])
+
+    def test_listed_relations_keep_their_default_representation(self):
+        full = self.event_detail()
+        sparse = self.event_detail(fields='id,organizer,category,tickets')
+        self.assertEqual(sparse, {name: full[name] for name in ('id', 'organizer', 'category', 'tickets')})
+
+    def test_expand_leaves_other_relations_unchanged(self):
+        full = self.event_detail()
+        self.assertEqual(self.event_detail(expand='organizer'), full)
+        self.assertEqual(self.event_detail(expand=''), full)
+        self.assertEqual(self.event_detail(expand='organizer')['category'], {'id': self.category.id, 'name': 'Concerts'})
+
+    def test_expanded_relations_are_returned_without_being_listed(self):
+        full = self.event_detail()
+        sparse = self.event_detail(fields='id', expand='available_tickets')
+        self.assertEqual(sparse, {'id': full['id'], 'available_tickets': full['available_tickets']})
+        self.assertEqual(len(sparse['available_tickets']), 2)
+
+    def test_list_pages_take_the_fieldset(self):
+        page = self.get(reverse('event-list'), fields='id,category')
+        self.assertEqual(page['results'], [{'id': self.event.id, 'category': {'id': self.category.id, 'name': 'Concerts'}}])
+
+    def test_dotted_expand_reaches_nested_relations(self):
+        url = self.place_order()
+        full = self.get(url)
+        sparse = self.get(url, fields='id', expand='order_items.ticket')
+        self.assertEqual(sparse, {'id': full['id'], 'order_items': full['order_items']})
+        self.assertEqual(sorted(sparse['order_items'][0]['ticket']), ['id', 'name', 'price', 'quantity_available'])
+        # Naming only the outer level leaves the ticket nested too
+        self.assertEqual(self.get(url, fields='id', expand='order_items')['order_items'], full['order_items'])
+
+    def test_unknown_fields_are_rejected(self):
+        body = self.event_detail(status=400, fields='id,nope')
+        self.assertEqual(body, {'fields': ['Unknown field: nope']})
+
+    def test_only_nested_relations_expand(self):
+        self.assertEqual(self.event_detail(status=400, expand='title'), {'expand': ['Cannot expand: title']})
+        self.assertEqual(
+            self.event_detail(status=400, expand='organizer.username'), {'expand': ['Cannot expand: organizer.username']}
+        )
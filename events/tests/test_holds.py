@@ -0,0 +1,91 @@
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from events import holds
+from events.models import Ticket, Order
+from events.orders import confirm_orders
+from events.reservations import reserve_order
+from .helpers import clear_caches, make_event
+
+
+class HoldTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.buyer = User.objects.create_user('buyer', password='x')
+        cls.ticket = make_event(cls.buyer, tickets=(10,)).tickets.get()
+
+    def setUp(self):
+        clear_caches()
+
+    def reserve(self, quantity=2, expired=True):
+        order = reserve_order(self.buyer, [{'ticket_id': self.ticket.id, 'quantity': quantity}])
+        if expired:
+            Order.objects.filter(pk=order.pk).update(
+                created_at=timezone.now() - settings.ORDER_HOLD_TTL - timedelta(minutes=1)
+            )
+        return order
+
+    def stock(self):
+        return Ticket.objects.get(pk=self.ticket.pk).quantity_available
+
+    def status(self, order):
+        return Order.objects.get(pk=order.pk).status
+
+    def test_expired_order_restocked_once(self):
+        order, fresh = self.reserve(), self.reserve(3, expired=False)
+        self.assertEqual(holds.release_expired_holds(batch_size=1), 1)
+        self.assertEqual((self.status(order), self.status(fresh)), ('canceled', 'pending'))
+        self.assertEqual(self.stock(), 10 - 3)
+        self.assertEqual(holds.release_expired_holds(), 0)
+        self.assertEqual(self.stock(), 10 - 3)
+
+    def test_confirmed_order_untouched(self):
+        order = self.reserve(expired=False)
+        confirm_orders([order.id])
+        Order.objects.filter(pk=order.pk).update(created_at=timezone.now() - 2 * settings.ORDER_HOLD_TTL)
+        self.assertEqual(holds.release_expired_holds(), 0)
+        self.assertEqual((self.status(order), self.stock()), ('completed', 8))
+
+    def test_confirm_between_select_and_lock(self):
+        # A confirm that lands after the sweep picked its candidates keeps its tickets
+        order, other = self.reserve(), self.reserve(3)
+
+        def confirm_first(queryset, field):
+            Order.objects.filter(pk=order.pk).update(status='completed')
+            return lock_rows(queryset, field)
+
+        lock_rows = holds.lock_rows
+        with mock.patch('events.holds.lock_rows', confirm_first):
+            self.assertEqual(holds.release_expired_holds(), 1)
+        self.assertEqual((self.status(order), self.status(other)), ('completed', 'canceled'))
+        self.assertEqual(self.stock(), 10 - 2)
+
+    def test_confirm_after_expiry_rejected(self):
+        order = self.reserve()
+        self.assertEqual(confirm_orders([order.id]), [{'order_id': order.id, 'error': 'Order hold has expired'}])
+        client = APIClient()
+        client.force_authenticate(self.buyer)
+        response = client.post(reverse('order-confirm', args=[order.id]))
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.status(order), 'pending')
+        # The sweep then releases it
+        holds.release_expired_holds()
+        self.assertEqual((self.status(order), self.stock()), ('canceled', 10))
+
+    def test_command(self):
+        self.reserve()
+        self.reserve(1, expired=False)
+        out = StringIO()
+        call_command('release_expired_orders', stdout=out)
+        self.assertEqual(out.getvalue().strip(), 'Released 1 expired orders')
+        self.assertEqual(self.stock(), 10 - 1)
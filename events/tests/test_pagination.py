@@ -0,0 +1,83 @@
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from events.models import Event
+from .helpers import clear_caches, make_event
+
+
+class KeysetPaginationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.organizer = User.objects.create_user('organizer', password='x')
+        # Ties on date, so the id tiebreaker decides the order within them
+        date = timezone.now() + timedelta(days=30)
+        cls.events = [make_event(cls.organizer, i) for i in range(4)]
+        cls.events += [make_event(cls.organizer, 10 + i, date=date) for i in range(3)]
+
+    def setUp(self):
+        clear_caches()
+        self.client = APIClient()
+
+    def get(self, url, **params):
+        clear_caches()
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.data
+
+    def expected(self):
+        return list(Event.objects.filter(id__in=[event.id for event in self.events]).order_by('-date', '-id')
+                    .values_list('id', flat=True))
+
+    def walk(self, page_size, during=None):
+        """Ids of every cursor page in turn; ``during`` runs after the first page"""
+        page = self.get(reverse('event-list'), cursor='', page_size=page_size)
+        ids = [event['id'] for event in page['results']]
+        if during:
+            during()
+        while page['next']:
+            page = self.get(page['next'])
+            ids += [event['id'] for event in page['results']]
+        return ids
+
+    def test_pages_cover_every_row_once(self):
+        self.assertEqual(self.walk(2), self.expected())
+
+    def test_rows_added_between_pages_do_not_shift_them(self):
+        expected = self.expected()
+        # Sorts ahead of the first page, which would push an OFFSET page's rows onto the next one
+        ids = self.walk(2, during=lambda: make_event(self.organizer, 100))
+        self.assertEqual(ids, expected)
+
+    def test_previous_returns_the_same_rows(self):
+        first = self.get(reverse('event-list'), cursor='', page_size=3)
+        second = self.get(first['next'])
+        self.assertEqual(self.get(second['previous'])['results'], first['results'])
+        self.assertNotIn('count', second)
+
+    def test_ordering_conflicting_with_cursor_rejected(self):
+        response = self.client.get(reverse('event-list'), {'cursor': '', 'ordering': 'date'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('cursor', response.data)
+
+    def test_search_ranking_conflicting_with_cursor_rejected(self):
+        response = self.client.get(reverse('event-list'), {'cursor': '', 'search': 'Event'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('cursor', response.data)
+
+    def test_keyset_ordering_accepted(self):
+        page = self.get(reverse('event-list'), cursor='', ordering='-date', page_size=len(self.events))
+        self.assertEqual([event['id'] for event in page['results']], self.expected())
+        # Without a ranking to follow, a search can still be paged by cursor
+        page = self.get(reverse('event-list'), cursor='', ordering='-date', search='Event')
+        self.assertTrue(page['results'])
+
+    def test_page_numbers_keep_other_orderings(self):
+        page = self.get(reverse('event-list'), ordering='date', page_size=len(self.events))
+        self.assertEqual(page['count'], len(self.events))
+        self.assertEqual([event['id'] for event in page['results']][0], self.expected()[-1])
@@ -0,0 +1,165 @@
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from events.models import Category, Ticket, Order, OrderItem
+from .helpers import clear_caches, make_event
+
+
+class QueryCountTests(TestCase):
+    """
+    Queries per request of every route in events/urls.py (bar the ASGI-only
+    live stream). The counts don't depend on how many events, tickets,
+    categories, orders or order lines a request touches, so a regression
+    to a query per row fails here.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.organizer = User.objects.create_user('organizer', password='x')
+        cls.buyer = User.objects.create_user('buyer', password='x')
+        cls.admin = User.objects.create_user('admin', password='x', is_staff=True)
+        cls.category = Category.objects.create(name='Concerts')
+        cls.events = [cls.make_event(i) for i in range(3)]
+
+    @classmethod
+    def make_event(cls, i, tickets=3):
+        return make_event(cls.organizer, i, tickets=[50 * (j % 2) for j in range(tickets)], category=cls.category)
+
+    def setUp(self):
+        clear_caches()
+        self.customer = APIClient()
+        self.customer.force_authenticate(self.buyer)
+
+    def order(self, lines=2):
+        tickets = Ticket.objects.filter(quantity_available__gt=0)[:lines]
+        response = self.customer.post(
+            reverse('order-list'), [{'ticket_id': ticket.id, 'quantity': 1} for ticket in tickets], format='json',
+        )
+        self.assertEqual(response.status_code, 201, response.content)
+        return response.json()['id']
+
+    def assertQueries(self, count, client, method, url, data=None, status=200):
+        caches['catalogue'].clear()
+        with self.assertNumQueries(count):
+            response = getattr(client, method)(url, data, format='json' if method != 'get' else None)
+        self.assertEqual(response.status_code, status, response.content)
+        return response
+
+    def test_event_list(self):
+        self.assertQueries(3, self.client, 'get', reverse('event-list'))
+        for i in range(3, 12):
+            self.make_event(i, tickets=5)
+        response = self.assertQueries(3, self.client, 'get', reverse('event-list'))
+        self.assertEqual(len(response.json()['results']), 10)
+
+    def test_event_list_filtered(self):
+        params = {'category': 'Concerts', 'min_price': 11, 'date_from': timezone.now().isoformat()}
+        self.assertQueries(3, self.client, 'get', reverse('event-list'), params)
+
+    def test_event_detail(self):
+        self.assertQueries(2, self.client, 'get', reverse('event-detail', args=[self.events[0].id]))
+
+    def test_event_tickets(self):
+        self.assertQueries(2, self.client, 'get', reverse('event-tickets', args=[self.events[0].id]))
+
+    def test_event_categories(self):
+        self.assertQueries(1, self.client, 'get', reverse('event-categories'))
+
+    def test_event_autocomplete(self):
+        self.assertQueries(1, self.client, 'get', reverse('event-autocomplete'), {'search': 'Even'})
+        for i in range(3, 12):
+            self.make_event(i)
+        response = self.assertQueries(1, self.client, 'get', reverse('event-autocomplete'), {'search': 'Even'})
+        self.assertEqual(len(response.json()), 10)
+
+    def test_event_queue(self):
+        event = make_event(self.organizer, 5, waiting_room=True)
+        url = reverse('event-queue', args=[event.id])
+        # The event's first join also creates its queue
+        first = APIClient()
+        first.force_authenticate(self.organizer)
+        first.post(url)
+        self.assertQueries(8, self.customer, 'post', url)
+        self.assertQueries(1, self.customer, 'get', url)
+
+    def test_category_list(self):
+        admin = APIClient()
+        admin.force_authenticate(self.admin)
+        self.assertQueries(2, admin, 'get', reverse('category-list'))
+        Category.objects.bulk_create([Category(name=f'Category {i}') for i in range(10)])
+        response = self.assertQueries(2, admin, 'get', reverse('category-list'))
+        self.assertEqual(response.json()['count'], 11)
+
+    def test_category_detail(self):
+        admin = APIClient()
+        admin.force_authenticate(self.admin)
+        self.assertQueries(1, admin, 'get', reverse('category-detail', args=[self.category.id]))
+
+    def test_cached_read(self):
+        url = reverse('event-detail', args=[self.events[0].id])
+        self.client.get(url)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_order_list(self):
+        self.order()
+        self.assertQueries(2, self.customer, 'get', reverse('order-list'))
+        for _ in range(4):
+            self.order(lines=3)
+        self.assertQueries(2, self.customer, 'get', reverse('order-list'))
+
+    def test_order_detail(self):
+        order_id = self.order(lines=3)
+        self.assertQueries(4, self.customer, 'get', reverse('order-detail', args=[order_id]))
+
+    def test_order_create(self):
+        # Stock is taken with a conditional UPDATE per ticket and per event
+        # (events.reservations), so only those grow with the lines
+        for lines in (1, 3):
+            tickets = Ticket.objects.filter(quantity_available__gt=0)[:lines]
+            self.assertQueries(
+                8 + 2 * lines, self.customer, 'post', reverse('order-list'),
+                [{'ticket_id': ticket.id, 'quantity': 1} for ticket in tickets], status=201,
+            )
+
+    def test_order_bulk(self):
+        # Set-based (events.reservations.reserve_orders): the same for one order or several
+        tickets = list(Ticket.objects.filter(quantity_available__gt=0))
+        for sizes in ((1,), (1, 2, 3)):
+            orders = [[{'ticket_id': ticket.id, 'quantity': 1} for ticket in tickets[:n]] for n in sizes]
+            response = self.assertQueries(13, self.customer, 'post', reverse('order-bulk'), {'orders': orders})
+            self.assertEqual(response.json()['created'], len(sizes))
+
+    def test_order_bulk_confirm(self):
+        for count in (1, 4):
+            order_ids = [self.order() for _ in range(count)]
+            response = self.assertQueries(
+                5, self.customer, 'post', reverse('order-bulk-confirm'), {'order_ids': order_ids},
+            )
+            self.assertEqual({result['status'] for result in response.json()['results']}, {'completed'})
+
+    def test_order_bulk_cancel(self):
+        for count in (1, 4):
+            order_ids = [self.order(lines=3) for _ in range(count)]
+            response = self.assertQueries(
+                10, self.customer, 'post', reverse('order-bulk-cancel'), {'order_ids': order_ids},
+            )
+            self.assertEqual({result['status'] for result in response.json()['results']}, {'canceled'})
+
+    def test_order_confirm(self):
+        order_id = self.order()
+        self.assertQueries(6, self.customer, 'post', reverse('order-confirm', args=[order_id]))
+
+    def test_order_cancel(self):
+        order_id = self.order(lines=3)
+        self.assertQueries(11, self.customer, 'post', reverse('order-cancel', args=[order_id]))
+
+    def test_order_delete(self):
+        order_id = self.order()
+        self.assertQueries(13, self.customer, 'delete', reverse('order-detail', args=[order_id]), status=204)
+        self.assertFalse(OrderItem.objects.filter(order_id=order_id).exists())
+        self.assertFalse(Order.objects.filter(pk=order_id).exists())
@@ -0,0 +1,27 @@
+from django.core.cache import caches
+from django.test import TestCase
+
+from bench.management.commands.check_query_plans import Command
+
+
+class QueryPlanTests(TestCase):
+    """
+    Every query of the hot list and detail endpoints reads events, tickets,
+    orders and order lines through an index (manage.py check_query_plans on
+    a small seeded catalogue, with statistics gathered).
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.buyer, cls.event, cls.order = Command().seed(500)
+
+    def setUp(self):
+        for alias in ('catalogue', 'throttle', 'default'):
+            caches[alias].clear()
+
+    def test_hot_queries_use_indexes(self):
+        for name, result in Command().explain(self.buyer, self.event, self.order).items():
+            with self.subTest(name):
+                plans = '\n'.join(f'{sql}\n    ' + '\n    '.join(plan) for sql, plan in result['plans'])
+                self.assertEqual(result['full_scans'], [], plans)
+                self.assertEqual(result['sorted_pages'], 0, plans)
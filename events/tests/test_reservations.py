@@ -0,0 +1,147 @@
+from django.contrib.auth.models import User
+from django.test import TestCase
+
+from events.inventory import merge_shards, shard_ticket, sync_sharded, take_stock
+from events.models import Event, Ticket, TicketShard, Order, OrderItem
+from events.orders import cancel_orders, remove_order_items
+from events.reservations import ReservationError, reserve_order, reserve_orders
+from .helpers import clear_caches, make_event
+
+
+def line(ticket, quantity):
+    return {'ticket_id': ticket.id, 'quantity': quantity}
+
+
+class ReservationTests(TestCase):
+    """reserve_order and reserve_orders on unsharded tickets; ShardedReservationTests repeats them sharded"""
+    shards = 0
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.buyer = User.objects.create_user('buyer', password='x')
+        cls.event = make_event(cls.buyer, tickets=(10, 5))
+        cls.ticket, cls.other = cls.event.tickets.order_by('id')
+        if cls.shards:
+            for ticket in (cls.ticket, cls.other):
+                shard_ticket(ticket, cls.shards)
+
+    def setUp(self):
+        clear_caches()
+
+    def stock(self, ticket):
+        return Ticket.objects.get(pk=ticket.pk).stock
+
+    def remaining(self):
+        sync_sharded()
+        return Event.objects.get(pk=self.event.pk).tickets_remaining
+
+    def test_over_remaining_stock_fails(self):
+        with self.assertRaises(ReservationError) as raised:
+            reserve_order(self.buyer, [line(self.ticket, 11)])
+        self.assertEqual(raised.exception.shortfalls, [{'ticket_id': self.ticket.id, 'requested': 11, 'available': 10}])
+        self.assertEqual(self.stock(self.ticket), 10)
+        self.assertFalse(Order.objects.exists())
+
+    def test_exact_stock_succeeds(self):
+        order = reserve_order(self.buyer, [line(self.ticket, 10)])
+        self.assertEqual((order.status, order.total_price), ('pending', 100))
+        self.assertEqual(self.stock(self.ticket), 0)
+        self.assertEqual(self.remaining(), 5)
+        with self.assertRaises(ReservationError):
+            reserve_order(self.buyer, [line(self.ticket, 1)])
+
+    def test_repeated_lines_count_together(self):
+        with self.assertRaises(ReservationError) as raised:
+            reserve_order(self.buyer, [line(self.ticket, 6), line(self.ticket, 5)])
+        self.assertEqual(raised.exception.shortfalls[0]['requested'], 11)
+        order = reserve_order(self.buyer, [line(self.ticket, 6), line(self.ticket, 4)])
+        self.assertEqual(order.order_items.count(), 2)
+        self.assertEqual(self.stock(self.ticket), 0)
+
+    def test_all_or_nothing(self):
+        reserve_order(self.buyer, [line(self.other, 4)])
+        with self.assertRaises(ReservationError):
+            reserve_order(self.buyer, [line(self.ticket, 3), line(self.other, 2)])
+        self.assertEqual((self.stock(self.ticket), self.stock(self.other)), (10, 1))
+
+    def test_take_never_oversells(self):
+        # What a reservation that checked stock before a concurrent one took it runs into
+        stale = Ticket.objects.get(pk=self.ticket.pk)
+        self.assertTrue(take_stock(Ticket.objects.get(pk=self.ticket.pk), 8))
+        self.assertFalse(take_stock(stale, 3))
+        self.assertTrue(take_stock(stale, 2))
+        self.assertEqual(self.stock(self.ticket), 0)
+
+    def test_missing_ticket(self):
+        with self.assertRaisesMessage(ReservationError, 'Ticket does not exist: 0'):
+            reserve_order(self.buyer, [{'ticket_id': 0, 'quantity': 1}])
+
+    def test_inactive_event_rejected(self):
+        Event.objects.filter(pk=self.event.pk).update(is_active=False)
+        with self.assertRaisesMessage(ReservationError, 'Event is not active'):
+            reserve_order(self.buyer, [line(self.ticket, 1)])
+        self.assertEqual(self.stock(self.ticket), 10)
+
+    def test_take_refuses_inactive_event(self):
+        # As when the event is canceled between reserve_order's lookup and its UPDATE
+        Event.objects.filter(pk=self.event.pk).update(is_active=False)
+        self.assertFalse(take_stock(Ticket.objects.get(pk=self.ticket.pk), 1))
+        self.assertEqual(self.stock(self.ticket), 10)
+
+    def test_cancel_restores_stock(self):
+        order = reserve_order(self.buyer, [line(self.ticket, 4), line(self.other, 5)])
+        self.assertEqual(cancel_orders([order.id]), [{'order_id': order.id, 'status': 'canceled'}])
+        self.assertEqual((self.stock(self.ticket), self.stock(self.other)), (10, 5))
+        self.assertEqual(self.remaining(), 15)
+        # A second cancel is refused and gives nothing back
+        self.assertIn('error', cancel_orders([order.id])[0])
+        self.assertEqual(self.stock(self.ticket), 10)
+
+    def test_remove_items_restores_stock(self):
+        order = reserve_order(self.buyer, [line(self.ticket, 4), line(self.other, 5)])
+        remove_order_items([order.order_items.get(ticket=self.ticket).id])
+        self.assertEqual((self.stock(self.ticket), self.stock(self.other)), (10, 0))
+        self.assertEqual(Order.objects.get(pk=order.pk).line_count, 1)
+        order.order_items.get().delete()
+        self.assertEqual(self.stock(self.other), 5)
+
+    def test_remove_items_of_canceled_order(self):
+        order = reserve_order(self.buyer, [line(self.ticket, 4)])
+        cancel_orders([order.id])
+        remove_order_items(list(order.order_items.values_list('id', flat=True)))
+        self.assertEqual(self.stock(self.ticket), 10)
+
+    def test_batch_allocates_in_order(self):
+        results = reserve_orders(self.buyer, [
+            [line(self.ticket, 6)], [line(self.ticket, 6)], [line(self.ticket, 4), line(self.other, 5)], [],
+        ])
+        self.assertIn('order', results[0])
+        self.assertEqual(results[1]['shortfalls'], [{'ticket_id': self.ticket.id, 'requested': 6, 'available': 4}])
+        self.assertIn('order', results[2])
+        self.assertEqual(results[3]['error'], 'Order has no items')
+        self.assertEqual((self.stock(self.ticket), self.stock(self.other)), (0, 0))
+        self.assertEqual(OrderItem.objects.count(), 3)
+
+    def test_batch_rejects_inactive_event(self):
+        event = make_event(self.buyer, 1, tickets=(5,))
+        Event.objects.filter(pk=self.event.pk).update(is_active=False)
+        results = reserve_orders(self.buyer, [[line(self.ticket, 1)], [line(event.tickets.get(), 1)]])
+        self.assertEqual(results[0]['error'], f'Event is not active for ticket: {self.ticket.id}')
+        self.assertIn('order', results[1])
+        self.assertEqual(self.stock(self.ticket), 10)
+
+
+class ShardedReservationTests(ReservationTests):
+    shards = 3
+
+    def test_takes_across_shards(self):
+        # 10 over three shards holds at most 4 in one, so this drains several
+        reserve_order(self.buyer, [line(self.ticket, 9)])
+        self.assertEqual(sorted(TicketShard.objects.filter(ticket=self.ticket).values_list('quantity', flat=True)), [0, 0, 1])
+
+    def test_merge_keeps_the_total(self):
+        reserve_order(self.buyer, [line(self.ticket, 3)])
+        ticket = Ticket.objects.get(pk=self.ticket.pk)
+        self.assertTrue(merge_shards(ticket))
+        self.assertEqual(Ticket.objects.get(pk=self.ticket.pk).quantity_available, 7)
+        self.assertFalse(TicketShard.objects.filter(ticket=self.ticket).exists())
@@ -0,0 +1,61 @@
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from events.models import Event
+from events.search import get_backend
+from .helpers import clear_caches, make_event
+
+
+class SearchTests(TestCase):
+    """The full-text index of the test database, built by the migrations like any other"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.organizer = User.objects.create_user('organizer', password='x')
+        cls.in_title = make_event(cls.organizer, 0, title='Jazz night', description='Live music downtown')
+        cls.in_description = make_event(cls.organizer, 1, title='Friday club', description='Jazz and soul')
+        cls.other = make_event(cls.organizer, 2, title='Café opera', description='Arias by candlelight')
+
+    def setUp(self):
+        clear_caches()
+
+    def search(self, text, prefix=False):
+        events = get_backend().search(Event.objects.all(), text, prefix=prefix)
+        return list(events.order_by('-search_rank', 'id').values_list('id', flat=True))
+
+    def test_every_word_must_match(self):
+        self.assertEqual(self.search('jazz soul'), [self.in_description.id])
+        self.assertEqual(self.search('jazz opera'), [])
+
+    def test_case_and_diacritics_ignored(self):
+        self.assertEqual(self.search('CAFE'), [self.other.id])
+
+    def test_prefix_only_on_last_word(self):
+        self.assertEqual(self.search('cand', prefix=True), [self.other.id])
+        self.assertEqual(self.search('cand'), [])
+        self.assertEqual(self.search('ari cand', prefix=True), [])
+
+    def test_title_match_ranks_first(self):
+        self.assertEqual(self.search('jazz'), [self.in_title.id, self.in_description.id])
+
+    def test_save_updates_index(self):
+        self.other.title = 'Blues brunch'
+        self.other.save()
+        self.assertEqual(self.search('blues'), [self.other.id])
+        self.assertEqual(self.search('opera'), [])
+
+    def test_bulk_update_and_delete_update_index(self):
+        Event.objects.filter(pk=self.in_title.pk).update(title='Rock night', description='Guitars')
+        self.assertEqual(self.search('jazz'), [self.in_description.id])
+        self.assertEqual(self.search('guitars'), [self.in_title.id])
+        self.in_description.delete()
+        self.assertEqual(self.search('jazz'), [])
+
+    def test_api_orders_by_rank(self):
+        expected = [self.in_title.id, self.in_description.id]
+        response = APIClient().get(reverse('event-list'), {'search': 'jazz'})
+        self.assertEqual([event['id'] for event in response.data['results']], expected)
+        response = APIClient().get(reverse('event-autocomplete'), {'search': 'ja'})
+        self.assertEqual([event['id'] for event in response.data], expected)
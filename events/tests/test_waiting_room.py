@@ -0,0 +1,188 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.db import OperationalError
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from events import waiting_room
+from events.models import Order, Ticket
+from .helpers import clear_caches, make_event
+
+
+class TokenTests(TestCase):
+
+    def test_round_trip(self):
+        token = waiting_room.make_token(7, 3, 12)
+        self.assertEqual(waiting_room.read_token(token, 3), (7, 12))
+
+    def test_other_user(self):
+        self.assertIsNone(waiting_room.read_token(waiting_room.make_token(7, 3, 12), 4))
+
+    def test_tampered(self):
+        token = waiting_room.make_token(7, 3, 12)
+        self.assertIsNone(waiting_room.read_token(token[:-2] + ('AA' if token[-2:] != 'AA' else 'BB'), 3))
+        self.assertIsNone(waiting_room.read_token('not-a-token', 3))
+
+    @override_settings(WAITING_ROOM_TOKEN_TTL=-1)
+    def test_expired(self):
+        self.assertIsNone(waiting_room.read_token(waiting_room.make_token(7, 3, 12), 3))
+
+
+class BackendTests:
+    """Run against each queue backend by the subclasses below"""
+    backend = None
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [User.objects.create_user(f'user{i}', password='x') for i in range(3)]
+        cls.event = make_event(cls.users[0], waiting_room=True)
+
+    def setUp(self):
+        clear_caches()
+        override = override_settings(WAITING_ROOM_BACKEND=self.backend, WAITING_ROOM_RATE=10)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.now = timezone.now()
+
+    def join(self, user, now=None):
+        return waiting_room.join(self.event.id, user.id, now or self.now)
+
+    def test_places_in_arrival_order(self):
+        entries = [self.join(user) for user in self.users]
+        self.assertEqual([entry.seq for entry in entries], [1, 2, 3])
+        for first, second in zip(entries, entries[1:]):
+            self.assertAlmostEqual((second.admit_at - first.admit_at).total_seconds(), 0.1, places=3)
+
+    def test_join_again_keeps_the_place(self):
+        entry = self.join(self.users[0])
+        self.join(self.users[1])
+        self.assertEqual(self.join(self.users[0]).seq, entry.seq)
+
+    def test_token_only_on_your_turn(self):
+        self.join(self.users[0])
+        entry = self.join(self.users[1])
+        waiting = waiting_room.queue_status(self.event.id, self.users[1].id, entry, now=self.now)
+        self.assertFalse(waiting['admitted'])
+        self.assertGreaterEqual(waiting['position'], 1)
+        self.assertNotIn('token', waiting)
+        admitted = waiting_room.queue_status(self.event.id, self.users[1].id, entry, now=entry.admit_at)
+        self.assertTrue(admitted['admitted'])
+        self.assertEqual(waiting_room.read_token(admitted['token'], self.users[1].id), (self.event.id, entry.seq))
+
+    def test_consume_once_and_release(self):
+        backend = waiting_room.get_backend()
+        entry = self.join(self.users[0])
+        self.assertTrue(backend.consume(self.event.id, self.users[0].id, entry.seq))
+        self.assertFalse(backend.consume(self.event.id, self.users[0].id, entry.seq))
+        backend.release(self.event.id, self.users[0].id, entry.seq)
+        self.assertTrue(backend.consume(self.event.id, self.users[0].id, entry.seq))
+
+    def test_used_or_expired_place_goes_to_the_back(self):
+        backend = waiting_room.get_backend()
+        entry = self.join(self.users[0])
+        self.join(self.users[1])
+        backend.consume(self.event.id, self.users[0].id, entry.seq)
+        self.assertEqual(self.join(self.users[0]).seq, 3)
+        expired = entry.admit_at + timedelta(seconds=waiting_room.settings.WAITING_ROOM_TOKEN_TTL + 1)
+        self.assertEqual(self.join(self.users[1], now=expired).seq, 4)
+
+
+class DatabaseBackendTests(BackendTests, TestCase):
+    backend = 'events.waiting_room.DatabaseQueueBackend'
+
+
+class CacheBackendTests(BackendTests, TestCase):
+    backend = 'events.waiting_room.CacheQueueBackend'
+
+
+class GatedOrderTests(TestCase):
+    """Order creation for events with a waiting room, single and bulk"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.buyer = User.objects.create_user('buyer', password='x')
+        cls.gated = make_event(cls.buyer, 0, tickets=(5, 5), waiting_room=True)
+        cls.open = make_event(cls.buyer, 1, tickets=(5,))
+        cls.ticket, cls.other_ticket = cls.gated.tickets.order_by('id')
+        cls.open_ticket = cls.open.tickets.get()
+
+    def setUp(self):
+        clear_caches()
+        self.client = APIClient()
+        self.client.force_authenticate(self.buyer)
+
+    def token(self):
+        entry = waiting_room.join(self.gated.id, self.buyer.id)
+        return waiting_room.queue_status(self.gated.id, self.buyer.id, entry, now=entry.admit_at)['token']
+
+    def order(self, items, token=None):
+        headers = {'HTTP_X_ADMISSION_TOKEN': token} if token else {}
+        return self.client.post(reverse('order-list'), items, format='json', **headers)
+
+    def bulk(self, orders, token=None):
+        headers = {'HTTP_X_ADMISSION_TOKEN': token} if token else {}
+        return self.client.post(reverse('order-bulk'), {'orders': orders}, format='json', **headers)
+
+    def test_token_required(self):
+        response = self.order([{'ticket_id': self.ticket.id, 'quantity': 1}])
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(response.json()['events'], [self.gated.id])
+        self.assertEqual(self.order([{'ticket_id': self.open_ticket.id, 'quantity': 1}]).status_code, 201)
+
+    def test_token_admits_one_order(self):
+        token = self.token()
+        self.assertEqual(self.order([{'ticket_id': self.ticket.id, 'quantity': 1}], token).status_code, 201)
+        self.assertEqual(self.order([{'ticket_id': self.ticket.id, 'quantity': 1}], token).status_code, 403)
+
+    def test_token_of_another_user(self):
+        other = User.objects.create_user('other', password='x')
+        entry = waiting_room.join(self.gated.id, other.id)
+        token = waiting_room.make_token(self.gated.id, other.id, entry.seq)
+        self.assertEqual(self.order([{'ticket_id': self.ticket.id, 'quantity': 1}], token).status_code, 403)
+
+    def test_rejected_order_gives_the_token_back(self):
+        token = self.token()
+        self.assertEqual(self.order([{'ticket_id': self.ticket.id, 'quantity': 50}], token).status_code, 400)
+        self.assertEqual(self.order([{'ticket_id': self.ticket.id, 'quantity': 1}], token).status_code, 201)
+
+    def test_failed_order_gives_the_token_back(self):
+        token = self.token()
+        self.client.raise_request_exception = False
+        with mock.patch('events.views.reserve_order', side_effect=OperationalError('database is locked')):
+            self.assertEqual(self.order([{'ticket_id': self.ticket.id, 'quantity': 1}], token).status_code, 500)
+        self.assertEqual(self.order([{'ticket_id': self.ticket.id, 'quantity': 1}], token).status_code, 201)
+
+    def test_bulk_one_order_per_admission(self):
+        token = self.token()
+        response = self.bulk([
+            [{'ticket_id': self.ticket.id, 'quantity': 1}],
+            [{'ticket_id': self.other_ticket.id, 'quantity': 1}],
+        ], token)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['events'], [self.gated.id])
+        self.assertFalse(Order.objects.exists())
+        # The token wasn't used up
+        self.assertEqual(self.order([{'ticket_id': self.ticket.id, 'quantity': 1}], token).status_code, 201)
+
+    def test_bulk_uses_the_token_of_a_created_order(self):
+        token = self.token()
+        response = self.bulk([
+            [{'ticket_id': self.ticket.id, 'quantity': 1}, {'ticket_id': self.other_ticket.id, 'quantity': 1}],
+            [{'ticket_id': self.open_ticket.id, 'quantity': 1}],
+        ], token)
+        self.assertEqual(response.json()['created'], 2)
+        self.assertEqual(self.order([{'ticket_id': self.ticket.id, 'quantity': 1}], token).status_code, 403)
+
+    def test_bulk_gives_back_the_token_of_a_failed_order(self):
+        token = self.token()
+        response = self.bulk([
+            [{'ticket_id': self.ticket.id, 'quantity': 50}],
+            [{'ticket_id': self.open_ticket.id, 'quantity': 1}],
+        ], token)
+        self.assertEqual((response.json()['created'], response.json()['failed']), (1, 1))
+        self.assertEqual(self.order([{'ticket_id': self.ticket.id, 'quantity': 1}], token).status_code, 201)
+        self.assertEqual(Ticket.objects.get(pk=self.ticket.pk).quantity_available, 4)
@@ -0,0 +1,151 @@
+"""
+Rate limits with a fixed cost per client, shared by all workers.
+
+DRF's stock throttles keep every request timestamp of the last period in
+a list per client, in the process-local default cache: memory and time
+per request grow with the rate, and each worker counts on its own.
+``SlidingWindowThrottle`` keeps two counters per client and scope, the
+requests of the current fixed window of the rate and of the one before,
+and estimates the requests of the last full period as
+
+    previous * (1 - elapsed share of the current window) + current
+
+which assumes the previous window's requests were spread evenly. A hit
+is one atomic increment and one read, so concurrent workers can't both
+take the last place.
+
+As with DRF's UserRateThrottle and ScopedRateThrottle, every request
+counts against 'anon' or 'user' (``SlidingWindowThrottle``), and actions
+a view names in ``throttle_scopes`` (catalogue reads, order creation)
+against that scope too (``ScopedSlidingWindowThrottle``), each with its
+rate in DEFAULT_THROTTLE_RATES. Counters live in a pluggable backend
+(``THROTTLE_BACKEND``): ``CacheThrottleBackend`` in the ``THROTTLE_CACHE``
+cache, i.e. Redis in production and locmem as a local stand-in, or
+``DatabaseThrottleBackend`` in a table, for deployments without a shared
+cache.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from rest_framework.throttling import SimpleRateThrottle
+
+from .models import ThrottleCounter
+
+
+class CacheThrottleBackend:
+    """Counters in the ``THROTTLE_CACHE`` cache, using only atomic ``add``/``incr``"""
+
+    def __init__(self):
+        self.cache = caches[settings.THROTTLE_CACHE]
+        # Counting doesn't leave the process, so it may run on an event loop
+        self.local = isinstance(self.cache, LocMemCache)
+
+    def hit(self, key, previous_key, timeout):
+        """Count a request under ``key``; returns the counts of ``key`` and ``previous_key``"""
+        try:
+            current = self.cache.incr(key)
+        except ValueError:
+            # First request of the window, unless another worker's add got in first
+            current = 1 if self.cache.add(key, 1, timeout=timeout) else self.cache.incr(key)
+        return current, self.cache.get(previous_key, 0)
+
+    def undo(self, key):
+        try:
+            self.cache.decr(key)
+        except ValueError:
+            pass
+
+
+class DatabaseThrottleBackend:
+    """
+    One ThrottleCounter row per client and window, bumped with a single
+    UPDATE. A window's first request creates its row and deletes the
+    expired ones, so the table holds about two rows per active client.
+    """
+    local = False
+
+    def hit(self, key, previous_key, timeout):
+        counters = ThrottleCounter.objects.filter(key=key)
+        if not counters.update(hits=F('hits') + 1):
+            now = timezone.now()
+            ThrottleCounter.objects.filter(expires_at__lte=now).delete()
+            _, created = ThrottleCounter.objects.get_or_create(
+                key=key, defaults={'hits': 1, 'expires_at': now + timedelta(seconds=timeout)},
+            )
+            if not created:
+                counters.update(hits=F('hits') + 1)
+        hits = dict(ThrottleCounter.objects.filter(key__in=[key, previous_key]).values_list('key', 'hits'))
+        return hits[key], hits.get(previous_key, 0)
+
+    def undo(self, key):
+        ThrottleCounter.objects.filter(key=key, hits__gt=0).update(hits=F('hits') - 1)
+
+
+def get_backend():
+    return import_string(settings.THROTTLE_BACKEND)()
+
+
+def wait_time(current, previous, elapsed, limit, duration):
+    """Seconds until a request after ``current`` and ``previous`` fits under ``limit`` again"""
+    # In this window, once enough of the previous window has slid out
+    if current < limit and previous:
+        share = 1 - (limit - current - 1) / previous
+        if share < 1:
+            return max(0.0, share * duration - elapsed)
+    # Else in the next one, where this window becomes the previous
+    share = max(0.0, 1 - (limit - 1) / current) if current else 0.0
+    return duration - elapsed + share * duration
+
+
+class SlidingWindowThrottle(SimpleRateThrottle):
+    """Sliding window counter of a client's requests, in the 'user' or 'anon' scope; see the module docstring"""
+
+    def __init__(self):
+        # The scope, so the rate, depends on the request: see allow_request, as in ScopedRateThrottle
+        pass
+
+    def get_scope(self, request, view):
+        return 'user' if request.user and request.user.is_authenticated else 'anon'
+
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            return f'throttle:{self.scope}:user:{request.user.pk}'
+        return f'throttle:{self.scope}:ip:{self.get_ident(request)}'
+
+    def allow_request(self, request, view):
+        self.scope = self.get_scope(request, view)
+        if self.scope is None:
+            return True
+        self.rate = self.get_rate()
+        self.num_requests, self.duration = self.parse_rate(self.rate)
+        if self.rate is None:
+            return True
+
+        self.key = self.get_cache_key(request, view)
+        now = self.timer()
+        window, elapsed = divmod(now, self.duration)
+        key = f'{self.key}:{int(window)}'
+        self.backend = get_backend()
+        # Kept through the next window, which reads it as its previous one
+        current, previous = self.backend.hit(key, f'{self.key}:{int(window) - 1}', 2 * self.duration)
+        if previous * (1 - elapsed / self.duration) + current <= self.num_requests:
+            return True
+        # Rejected requests don't count, so a client that backs off gets its share back
+        self.backend.undo(key)
+        self.retry_after = wait_time(current - 1, previous, elapsed, self.num_requests, self.duration)
+        return False
+
+    def wait(self):
+        return self.retry_after
+
+
+class ScopedSlidingWindowThrottle(SlidingWindowThrottle):
+    """The scope the view names for its action in ``throttle_scopes``, if any"""
+
+    def get_scope(self, request, view):
+        return getattr(view, 'throttle_scopes', {}).get(getattr(view, 'action', None))
@@ -1,5 +1,8 @@
+from django.conf import settings
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
+from .async_views import async_urls
+from .live import availability_stream
 from .views import EventViewSet, OrderViewSet, CategoryViewSet
 
 router = DefaultRouter()
@@ -7,6 +10,13 @@ router.register(r'events', EventViewSet)
 router.register(r'orders', OrderViewSet, basename='order')
 router.register(r'categories', CategoryViewSet)
 
-urlpatterns = [
-    path('', include(router.urls)),
-]
\ No newline at end of file
+if settings.CATALOGUE_ASYNC_VIEWS:
+    urlpatterns = [
+        # Streams need ASGI: a WSGI worker would buffer the endless response
+        path('events/<int:pk>/live/', availability_stream, name='event-live'),
+        path('', include(async_urls(router.urls))),
+    ]
+else:
+    urlpatterns = [
+        path('', include(router.urls)),
+    ]
\ No newline at end of file
@@ -3,14 +3,23 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from django_filters.rest_framework import DjangoFilterBackend
-from rest_framework.filters import SearchFilter, OrderingFilter
-from django.db.models import Q
+from django.db.models import Q, Prefetch, prefetch_related_objects
+from django.shortcuts import get_object_or_404
 from .models import Event, Ticket, Order, Category, OrderItem  # Добавлен OrderItem
 from .serializers import (
-    EventSerializer, TicketSerializer, OrderSerializer,
-    CategorySerializer, OrderCreateSerializer, UserRegistrationSerializer
+    EventSerializer, TicketSerializer, OrderSerializer, OrderSummarySerializer,
+    CategorySerializer, OrderCreateSerializer, UserRegistrationSerializer,
+    BulkOrderCreateSerializer, BulkOrderIdsSerializer
 )
-from .filters import EventFilter
+from .filters import EventFilter, EventSearchFilter, RankedOrderingFilter
+from .search import get_backend
+from .reservations import reserve_order, reserve_orders, ReservationError
+from .orders import confirm_orders, cancel_orders
+from .caching import catalogue_cached, acatalogue_cached
+from .async_views import AsyncReadMixin, fetch, gather, attach
+from .fieldsets import SparseFieldsViewMixin
+from .replicas import ReplicaReadsMixin
+from . import waiting_room
 from .permissions import IsOrganizerOrReadOnly
 
 
@@ -32,105 +41,211 @@ class UserRegistrationView(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
-class CategoryViewSet(viewsets.ModelViewSet):
-    queryset = Category.objects.all()
+class CategoryViewSet(ReplicaReadsMixin, viewsets.ModelViewSet):
+    queryset = Category.objects.order_by('name')
     serializer_class = CategorySerializer
     permission_classes = [permissions.IsAdminUser]
+    replica_actions = ('list', 'retrieve')
 
 
-class EventViewSet(viewsets.ModelViewSet):
-    queryset = Event.objects.filter(is_active=True).select_related('organizer', 'category').prefetch_related('tickets')
+class EventViewSet(ReplicaReadsMixin, SparseFieldsViewMixin, AsyncReadMixin, viewsets.ModelViewSet):
+    queryset = Event.objects.filter(is_active=True).select_related('organizer', 'category').prefetch_related(
+        Prefetch('tickets', queryset=Ticket.objects.with_stock())
+    )
     serializer_class = EventSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly, IsOrganizerOrReadOnly]
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
+    filter_backends = [DjangoFilterBackend, EventSearchFilter, RankedOrderingFilter]
     filterset_class = EventFilter
     search_fields = ['title', 'description']
-    ordering_fields = ['date', 'created_at']
+    ordering_fields = ['date', 'created_at', 'min_price']
     ordering = ['-date']
+    keyset_ordering = ('-date', '-id')
+    # Served natively under ASGI by the a<action> coroutines below (see events.async_views)
+    async_actions = ('list', 'retrieve', 'tickets', 'categories')
+    # The catalogue reads; the waiting room stays on the primary (events.replicas)
+    replica_actions = ('list', 'retrieve', 'tickets', 'autocomplete', 'categories')
+    # Browsing has a rate limit of its own on top of the anon/user one (events.throttling)
+    throttle_scopes = dict.fromkeys(replica_actions, 'catalogue')
 
     def perform_create(self, serializer):
         serializer.save(organizer=self.request.user)
 
+    @catalogue_cached(lambda view: ['events'])
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @catalogue_cached(lambda view: [f"event:{view.kwargs['pk']}"])
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
     @action(detail=True, methods=['get'])
+    @catalogue_cached(lambda view: [f"event:{view.kwargs['pk']}"])
     def tickets(self, request, pk=None):
         event = self.get_object()
-        tickets = event.tickets.filter(quantity_available__gt=0)
-        serializer = TicketSerializer(tickets, many=True)
+        serializer = TicketSerializer(event.available_tickets, many=True)
         return Response(serializer.data)
 
+    async def aevent_tickets(self, in_stock=False):
+        tickets = Ticket.objects.with_stock().filter(event_id=self.kwargs['pk'])
+        return await fetch(tickets.in_stock() if in_stock else tickets)
+
+    @acatalogue_cached(lambda view: ['events'])
+    async def alist(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = await self.apaginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(self.get_serializer(page, many=True).data)
+        return Response(self.get_serializer(await fetch(queryset), many=True).data)
+
+    @acatalogue_cached(lambda view: [f"event:{view.kwargs['pk']}"])
+    async def aretrieve(self, request, *args, **kwargs):
+        if self.fieldset is not None:
+            # The queryset already loads only the tickets the fieldset needs
+            return Response(self.get_serializer(await self.aget_object()).data)
+        # The event and its tickets are independent queries, so issue them together
+        event, tickets = await gather(
+            self.aget_object(self.get_queryset().prefetch_related(None)), self.aevent_tickets()
+        )
+        attach(event, 'tickets', tickets)
+        return Response(self.get_serializer(event).data)
+
+    @acatalogue_cached(lambda view: [f"event:{view.kwargs['pk']}"])
+    async def atickets(self, request, pk=None):
+        _, tickets = await gather(
+            self.aget_object(self.get_queryset().prefetch_related(None)), self.aevent_tickets(in_stock=True)
+        )
+        return Response(TicketSerializer(tickets, many=True).data)
+
+    # Not rate-throttled: buyers poll at the Retry-After pace, and a 429 would cost them their turn
+    @action(detail=True, methods=['get', 'post'], permission_classes=[permissions.IsAuthenticated], throttle_classes=[])
+    def queue(self, request, pk=None):
+        """Join the event's waiting room (POST) or poll your place in it (GET)"""
+        if request.method == 'POST':
+            event = get_object_or_404(Event.objects.filter(is_active=True).only('id', 'waiting_room'), pk=pk)
+            if not event.waiting_room:
+                return Response({"error": "This event has no waiting room"}, status=status.HTTP_400_BAD_REQUEST)
+            entry = waiting_room.join(event.id, request.user.id)
+        else:
+            # Polling stays off the events table
+            entry = waiting_room.get_backend().entry(int(pk), request.user.id) if pk.isdigit() else None
+            if entry is None:
+                return Response({"error": "Not in the queue"}, status=status.HTTP_404_NOT_FOUND)
+
+        data = waiting_room.queue_status(int(pk), request.user.id, entry)
+        response = Response(data)
+        if not data['admitted'] and not data.get('expired'):
+            response['Retry-After'] = str(max(1, min(30, int(data['wait_seconds']))))
+        return response
+
     @action(detail=False, methods=['get'])
+    @catalogue_cached(lambda view: ['events'])
+    def autocomplete(self, request):
+        """Top matches (id and title) for search-as-you-type; the last word is a prefix"""
+        text = request.query_params.get(EventSearchFilter.search_param, '')
+        if not text.strip():
+            return Response([])
+        events = get_backend().search(Event.objects.filter(is_active=True), text, prefix=True)
+        return Response(list(events.order_by('-search_rank', '-date').values('id', 'title')[:10]))
+
+    @action(detail=False, methods=['get'])
+    @catalogue_cached(lambda view: ['categories'])
     def categories(self, request):
         categories = Category.objects.all()
         serializer = CategorySerializer(categories, many=True)
         return Response(serializer.data)
 
+    @acatalogue_cached(lambda view: ['categories'])
+    async def acategories(self, request):
+        return Response(CategorySerializer(await fetch(Category.objects.all()), many=True).data)
+
 
-class OrderViewSet(viewsets.ModelViewSet):
+class OrderViewSet(ReplicaReadsMixin, SparseFieldsViewMixin, viewsets.ModelViewSet):
     serializer_class = OrderSerializer
     permission_classes = [permissions.IsAuthenticated]
+    keyset_ordering = ('-created_at', '-id')
+    filterset_fields = ['status']
+    # Orders are always read from the primary; purchases pin the buyer there
+    # so their next catalogue reads include the tickets they just took
+    replica_actions = ()
+    # Purchases have a rate limit of their own on top of the user one (events.throttling)
+    throttle_scopes = dict.fromkeys(('create', 'bulk'), 'orders')
 
     def get_queryset(self):
-        return Order.objects.filter(user=self.request.user).prefetch_related(
-            'order_items', 'order_items__ticket', 'order_items__ticket__event'
-        ).order_by('-created_at')
+        orders = Order.objects.filter(user_id=self.request.user.id).order_by('-created_at')
+        if self.action in ('list', 'confirm', 'cancel', 'destroy'):
+            # History pages read the summary snapshot; the others don't render the order
+            return orders
+        return orders.select_related('user').prefetch_related(
+            'order_items',
+            Prefetch('order_items__ticket', queryset=Ticket.objects.with_stock()),
+            'order_items__ticket__event',
+        )
+
+    def get_serializer_class(self):
+        if self.action == 'list':
+            return OrderSummarySerializer
+        return super().get_serializer_class()
 
     def create(self, request, *args, **kwargs):
         serializer = OrderCreateSerializer(data=request.data, many=True)
 
         if serializer.is_valid():
-            order_items_data = []
-            total_price = 0
-
-            for item_data in serializer.validated_data:
-                ticket = item_data['ticket']
-                quantity = item_data['quantity']
-
-                order_items_data.append({
-                    'ticket': ticket,
-                    'quantity': quantity
-                })
-                total_price += float(ticket.price) * quantity
-
-            # Create order with pending status
-            order = Order.objects.create(
-                user=request.user,
-                total_price=total_price,
-                status='pending'  # Changed from 'completed' to 'pending'
+            admissions, missing = waiting_room.admit(
+                request.user,
+                [item['ticket_id'] for item in serializer.validated_data],
+                request.headers.get(waiting_room.TOKEN_HEADER),
+            )
+            if missing:
+                return Response({
+                    "error": "Admission token required",
+                    "events": missing
+                }, status=status.HTTP_403_FORBIDDEN)
+            try:
+                order = reserve_order(request.user, serializer.validated_data)
+            except ReservationError as exc:
+                waiting_room.release(request.user, admissions)
+                return Response({
+                    "error": exc.message,
+                    "shortfalls": exc.shortfalls
+                }, status=status.HTTP_400_BAD_REQUEST)
+            except Exception:
+                # No order was made, e.g. a database error: the buyer keeps their place to retry
+                waiting_room.release(request.user, admissions)
+                raise
+
+            # Each line's ticket in one query, with the stock left after this order
+            prefetch_related_objects(
+                [order], 'order_items', Prefetch('order_items__ticket', queryset=Ticket.objects.with_stock()),
             )
-
-            # Create order items
-            for item_data in order_items_data:
-                OrderItem.objects.create(
-                    order=order,
-                    ticket=item_data['ticket'],
-                    quantity=item_data['quantity']
-                )
-
             order_serializer = OrderSerializer(order, context={'request': request})
             return Response(order_serializer.data, status=status.HTTP_201_CREATED)
 
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+    def perform_destroy(self, instance):
+        # Pending orders still hold stock; release it before the rows go, as the admin does
+        cancel_orders([instance.id], user=self.request.user)
+        instance.delete()
+
     @action(detail=True, methods=['post'])
     def confirm(self, request, pk=None):
         """Confirm and complete the order (simulate payment)"""
         order = self.get_object()
 
-        if order.user != request.user:
+        if order.user_id != request.user.id:
             return Response({"error": "Not your order"}, status=status.HTTP_403_FORBIDDEN)
 
-        if order.status != 'pending':
-            return Response({"error": "Order already processed"}, status=status.HTTP_400_BAD_REQUEST)
-
         # In a real application, this would integrate with a payment gateway
-        # For now, we'll just mark it as completed
-        order.status = 'completed'
-        order.save()
+        # For now, we'll just mark it as completed. confirm_orders locks the
+        # order and re-checks it, so a concurrent cancel or expiry sweep can't interleave
+        result = confirm_orders([order.id], user=request.user)[0]
+        if 'error' in result:
+            return Response({"error": result['error']}, status=status.HTTP_400_BAD_REQUEST)
 
         return Response({
             "message": "Order confirmed successfully",
             "order_id": order.id,
-            "status": order.status
+            "status": result['status']
         })
 
     @action(detail=True, methods=['post'])
@@ -138,22 +253,78 @@ class OrderViewSet(viewsets.ModelViewSet):
         """Cancel a pending order"""
         order = self.get_object()
 
-        if order.user != request.user:
+        if order.user_id != request.user.id:
             return Response({"error": "Not your order"}, status=status.HTTP_403_FORBIDDEN)
 
-        if order.status != 'pending':
-            return Response({"error": "Only pending orders can be canceled"}, status=status.HTTP_400_BAD_REQUEST)
-
-        # Restore ticket quantities
-        for order_item in order.order_items.all():
-            order_item.ticket.quantity_available += order_item.quantity
-            order_item.ticket.save()
-
-        order.status = 'canceled'
-        order.save()
+        result = cancel_orders([order.id], user=request.user)[0]
+        if 'error' in result:
+            return Response({"error": result['error']}, status=status.HTTP_400_BAD_REQUEST)
 
         return Response({
             "message": "Order canceled successfully",
             "order_id": order.id,
-            "status": order.status
-        })
\ No newline at end of file
+            "status": result['status']
+        })
+
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        """Create many orders at once; each one succeeds or fails on its own"""
+        serializer = BulkOrderCreateSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        orders = serializer.validated_data['orders']
+
+        ticket_ids = {item['ticket_id'] for items in orders for item in items}
+        gated = waiting_room.gated_tickets(ticket_ids)
+        # An admission token lets one order through, here as on the single endpoint
+        shared = waiting_room.shared_events(orders, gated)
+        if shared:
+            return Response({
+                "error": "An admission token covers a single order per event",
+                "events": shared
+            }, status=status.HTTP_400_BAD_REQUEST)
+        admissions, missing = waiting_room.admit(
+            request.user, ticket_ids, request.headers.get(waiting_room.TOKEN_HEADER), events=set(gated.values()),
+        )
+        if missing:
+            return Response({"error": "Admission token required", "events": missing}, status=status.HTTP_403_FORBIDDEN)
+
+        try:
+            reserved = reserve_orders(request.user, orders)
+        except Exception:
+            waiting_room.release(request.user, admissions)
+            raise
+        results = []
+        for index, result in enumerate(reserved):
+            if 'order' in result:
+                order = result['order']
+                results.append({
+                    "index": index,
+                    "order_id": order.id,
+                    "status": order.status,
+                    "total_price": str(order.total_price)
+                })
+            else:
+                results.append({"index": index, **result})
+
+        # Tokens of the events whose order failed go back, so the buyer can retry those
+        waiting_room.release(request.user, waiting_room.unused(admissions, orders, reserved, gated))
+        created = sum(1 for result in results if 'order_id' in result)
+        return Response({
+            "created": created,
+            "failed": len(results) - created,
+            "results": results
+        })
+
+    @action(detail=False, methods=['post'], url_path='bulk/confirm')
+    def bulk_confirm(self, request):
+        """Confirm many pending orders at once"""
+        serializer = BulkOrderIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return Response({"results": confirm_orders(serializer.validated_data['order_ids'], user=request.user)})
+
+    @action(detail=False, methods=['post'], url_path='bulk/cancel')
+    def bulk_cancel(self, request):
+        """Cancel many pending orders at once"""
+        serializer = BulkOrderIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return Response({"results": cancel_orders(serializer.validated_data['order_ids'], user=request.user)})
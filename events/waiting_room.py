@@ -0,0 +1,280 @@
+"""
+Virtual waiting room in front of order creation.
+
+For events with ``waiting_room`` set, buyers first join a per-event FIFO
+queue (``POST /api/events/{id}/queue/``) and poll it (``GET``). Places
+are handed out in arrival order, ``WAITING_ROOM_RATE`` per second, so a
+spike of arrivals becomes a steady stream of order transactions instead
+of a stampede on the ticket rows. Once a buyer's turn comes the poll
+returns a signed admission token; order creation for the event requires
+it in the ``X-Admission-Token`` header and uses it up. A token admits
+one order, also through the bulk endpoint, which refuses calls with
+several orders for the same gated event.
+
+Queue state lives in a pluggable backend (``WAITING_ROOM_BACKEND``):
+``DatabaseQueueBackend`` keeps it in two tables, ``CacheQueueBackend`` in
+a Django cache, i.e. Redis in production and locmem as a local stand-in.
+Tokens are signed with SECRET_KEY, so checking one needs no lookup.
+"""
+import math
+from collections import Counter
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import AdmissionQueue, QueueEntry, Ticket
+
+TOKEN_SALT = 'events.waiting_room'
+TOKEN_HEADER = 'X-Admission-Token'
+
+
+@dataclass
+class Entry:
+    seq: int
+    admit_at: datetime
+    used: bool = False
+
+
+class DatabaseQueueBackend:
+    """
+    One AdmissionQueue row per event hands out admission times: each join
+    pushes its ``next_admission`` one interval further with a single
+    UPDATE and holds the row lock only for that and the entry upsert, so
+    places are strictly FIFO.
+    """
+
+    def join(self, event_id, user_id, now):
+        entry = self.entry(event_id, user_id)
+        if entry is not None and not entry.used:
+            return entry
+        interval = timedelta(seconds=1 / settings.WAITING_ROOM_RATE)
+        queue = AdmissionQueue.objects.filter(event_id=event_id)
+        with transaction.atomic():
+            if not queue.update(
+                issued=F('issued') + 1,
+                next_admission=Greatest(F('next_admission'), Value(now)) + interval,
+            ):
+                AdmissionQueue.objects.get_or_create(event_id=event_id, defaults={'next_admission': now})
+                queue.update(issued=F('issued') + 1, next_admission=Greatest(F('next_admission'), Value(now)) + interval)
+            seq, next_admission = queue.values_list('issued', 'next_admission').get()
+            admit_at = next_admission - interval
+            QueueEntry.objects.bulk_create(
+                [QueueEntry(event_id=event_id, user_id=user_id, seq=seq, admit_at=admit_at)],
+                update_conflicts=True, unique_fields=['event', 'user'], update_fields=['seq', 'admit_at', 'used_at'],
+            )
+        return Entry(seq, admit_at)
+
+    def entry(self, event_id, user_id):
+        row = QueueEntry.objects.filter(event_id=event_id, user_id=user_id).values_list(
+            'seq', 'admit_at', 'used_at'
+        ).first()
+        if row is None:
+            return None
+        return Entry(row[0], row[1], used=row[2] is not None)
+
+    def consume(self, event_id, user_id, seq):
+        return bool(QueueEntry.objects.filter(
+            event_id=event_id, user_id=user_id, seq=seq, used_at=None,
+        ).update(used_at=timezone.now()))
+
+    def release(self, event_id, user_id, seq):
+        QueueEntry.objects.filter(event_id=event_id, user_id=user_id, seq=seq).update(used_at=None)
+
+
+class CacheQueueBackend:
+    """
+    Queue state in the ``WAITING_ROOM_CACHE`` cache, using only atomic
+    ``add``/``incr``: each second of the admission schedule is a counter
+    whose n-th place is admitted at ``second + (n - 1) / rate``. A join
+    takes the first place that is neither past nor beyond the rate, and a
+    hint key remembers where the full seconds end so a burst doesn't
+    rescan them.
+    """
+
+    def __init__(self):
+        self.cache = caches[settings.WAITING_ROOM_CACHE]
+        self.timeout = settings.WAITING_ROOM_STATE_TTL
+
+    def key(self, event_id, *parts):
+        return ':'.join(['waiting-room', str(event_id), *map(str, parts)])
+
+    def incr(self, key, delta=1):
+        self.cache.add(key, 0, timeout=self.timeout)
+        return self.cache.incr(key, delta)
+
+    def join(self, event_id, user_id, now):
+        entry = self.entry(event_id, user_id)
+        if entry is not None and not entry.used:
+            return entry
+
+        rate = settings.WAITING_ROOM_RATE
+        timestamp = now.timestamp()
+        seq = self.incr(self.key(event_id, 'seq'))
+        hint = self.key(event_id, 'hint')
+        second = max(int(timestamp), self.cache.get(hint, 0))
+        skipped = False
+        while True:
+            counter = self.key(event_id, 'second', second)
+            place = self.incr(counter)
+            # Places of the current second that are already past: jump over them at once
+            past = math.ceil((timestamp - second) * rate) - (place - 1)
+            if past > 0:
+                place = self.incr(counter, past)
+            if place <= rate:
+                break
+            second += 1
+            skipped = True
+        if skipped:
+            self.cache.set(hint, second, timeout=self.timeout)
+
+        admit_at = second + (place - 1) / rate
+        self.cache.set(self.key(event_id, 'user', user_id), (seq, admit_at), timeout=self.timeout)
+        return Entry(seq, datetime.fromtimestamp(admit_at, tz=dt_timezone.utc))
+
+    def entry(self, event_id, user_id):
+        value = self.cache.get(self.key(event_id, 'user', user_id))
+        if value is None:
+            return None
+        seq, admit_at = value
+        used = self.cache.get(self.key(event_id, 'used', user_id, seq)) is not None
+        return Entry(seq, datetime.fromtimestamp(admit_at, tz=dt_timezone.utc), used=used)
+
+    def consume(self, event_id, user_id, seq):
+        return self.cache.add(self.key(event_id, 'used', user_id, seq), 1, timeout=self.timeout)
+
+    def release(self, event_id, user_id, seq):
+        self.cache.delete(self.key(event_id, 'used', user_id, seq))
+
+
+def get_backend():
+    return import_string(settings.WAITING_ROOM_BACKEND)()
+
+
+def make_token(event_id, user_id, seq):
+    return signing.dumps({'e': event_id, 'u': user_id, 's': seq}, salt=TOKEN_SALT, compress=True)
+
+
+def read_token(token, user_id):
+    """``(event_id, seq)`` of a valid, unexpired token issued to ``user_id``, else None"""
+    try:
+        payload = signing.loads(token, salt=TOKEN_SALT, max_age=settings.WAITING_ROOM_TOKEN_TTL)
+    except signing.BadSignature:
+        return None
+    if payload.get('u') != user_id:
+        return None
+    return payload['e'], payload['s']
+
+
+def is_expired(entry, now):
+    """A buyer who doesn't come back within the token TTL of their turn loses the place"""
+    return now >= entry.admit_at + timedelta(seconds=settings.WAITING_ROOM_TOKEN_TTL)
+
+
+def join(event_id, user_id, now=None, backend=None):
+    now = now or timezone.now()
+    backend = backend or get_backend()
+    entry = backend.entry(event_id, user_id)
+    if entry is not None and not entry.used and not is_expired(entry, now):
+        return entry
+    if entry is not None:
+        # Used or expired: start again at the back
+        backend.consume(event_id, user_id, entry.seq)
+    return backend.join(event_id, user_id, now)
+
+
+def queue_status(event_id, user_id, entry, now=None):
+    """What the queue endpoint returns for ``entry``, with a token once it's the user's turn"""
+    now = now or timezone.now()
+    wait = (entry.admit_at - now).total_seconds()
+    status = {
+        'event_id': event_id,
+        'seq': entry.seq,
+        'position': max(0, math.ceil(wait * settings.WAITING_ROOM_RATE)),
+        'wait_seconds': max(0.0, round(wait, 1)),
+        'admitted': wait <= 0 and not entry.used,
+    }
+    if entry.used or is_expired(entry, now):
+        status['expired'] = True
+        status['admitted'] = False
+    elif status['admitted']:
+        status['token'] = make_token(event_id, user_id, entry.seq)
+        status['token_ttl'] = settings.WAITING_ROOM_TOKEN_TTL
+    return status
+
+
+def gated_tickets(ticket_ids):
+    """``{ticket_id: event_id}`` for the tickets among ``ticket_ids`` whose event has a waiting room"""
+    return dict(Ticket.objects.filter(id__in=ticket_ids, event__waiting_room=True).values_list('id', 'event_id'))
+
+
+def gated_events(ticket_ids):
+    return set(gated_tickets(ticket_ids).values())
+
+
+def _order_events(items, gated):
+    return {gated[item['ticket_id']] for item in items if item['ticket_id'] in gated}
+
+
+def shared_events(orders, gated):
+    """Gated events that more than one of ``orders`` buys from, which one admission can't cover"""
+    counts = Counter(event_id for items in orders for event_id in _order_events(items, gated))
+    return sorted(event_id for event_id, count in counts.items() if count > 1)
+
+
+def unused(admissions, orders, results, gated):
+    """The admissions of a bulk call (see ``shared_events``) whose event's order was rejected"""
+    failed = set()
+    for items, result in zip(orders, results):
+        if 'order' not in result:
+            failed |= _order_events(items, gated)
+    return [(event_id, seq) for event_id, seq in admissions if event_id in failed]
+
+
+def admit(user, ticket_ids, header, backend=None, events=None):
+    """
+    Check and use up the admission tokens in ``header`` for every gated
+    event among ``ticket_ids`` (``events``, if the caller has looked them
+    up already). Returns ``(admissions, missing_event_ids)``; hand the
+    admissions to ``release`` if the order then fails.
+    """
+    if events is None:
+        events = gated_events(ticket_ids)
+    if not events:
+        return [], []
+    backend = backend or get_backend()
+    tokens = {}
+    for token in filter(None, (part.strip() for part in (header or '').split(','))):
+        claim = read_token(token, user.id)
+        if claim is not None and claim[0] in events:
+            tokens[claim[0]] = claim[1]
+    missing = sorted(events - set(tokens))
+    if missing:
+        return [], missing
+
+    admissions = []
+    try:
+        for event_id, seq in tokens.items():
+            if not backend.consume(event_id, user.id, seq):
+                release(user, admissions, backend)
+                return [], [event_id]
+            admissions.append((event_id, seq))
+    except Exception:
+        # E.g. the backend went away halfway: don't keep the tokens used so far
+        release(user, admissions, backend)
+        raise
+    return admissions, []
+
+
+def release(user, admissions, backend=None):
+    """Give back tokens used by an order that was then rejected, so the buyer can retry"""
+    backend = backend or get_backend()
+    for event_id, seq in admissions:
+        backend.release(event_id, user.id, seq)
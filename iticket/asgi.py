@@ -2,4 +2,5 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'iticket.settings')
+os.environ.setdefault('CATALOGUE_ASYNC_VIEWS', 'True')
 application = get_asgi_application()
\ No newline at end of file
@@ -1,7 +1,8 @@
 import os
 from pathlib import Path
 from datetime import timedelta
-from decouple import config
+from decouple import config, Csv
+from django.core.exceptions import ImproperlyConfigured
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -21,6 +22,7 @@ INSTALLED_APPS = [
     # Third party apps
     'rest_framework',
     'rest_framework_simplejwt',
+    'rest_framework_simplejwt.token_blacklist',
     'corsheaders',
     'django_filters',
     'drf_spectacular',
@@ -28,9 +30,14 @@ INSTALLED_APPS = [
     # Local apps
     'events',
     'users',
+    # manage.py bench_* and the other load tools; no models
+    'bench',
 ]
 
 MIDDLEWARE = [
+    # First, so its timings cover the whole stack
+    'events.metrics.MetricsMiddleware',
+    'events.profiling.ProfilingMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -61,12 +68,72 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'iticket.wsgi.application'
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+# Database
+# DB_PROFILE picks the setup:
+# - sqlite: db.sqlite3 with SQLite's defaults, for development
+# - sqlite-wal: the same file in WAL mode with tuned pragmas, so local load
+#   tests can read while a write is in progress
+# - postgres: PostgreSQL from the DB_* variables, for production, with
+#   optional read replicas for the catalogue (events.replicas)
+DB_PROFILE = config('DB_PROFILE', default='sqlite')
+# Aliases in DATABASES that replicate 'default'
+DATABASE_REPLICAS = []
+# PRAGMAs the sqlite-wal profile runs on every new connection (events.signals)
+SQLITE_WAL_PRAGMAS = {
+    'journal_mode': 'wal',
+    # Still safe against application crashes in WAL mode; fsyncs only at checkpoints
+    'synchronous': 'normal',
+    # Milliseconds a connection waits for the write lock before "database is locked"
+    'busy_timeout': config('DB_BUSY_TIMEOUT', default=20_000, cast=int),
+    'cache_size': -64_000,  # KiB
+    'mmap_size': 256 * 1024 * 1024,
+    'temp_store': 'memory',
 }
+SQLITE_PRAGMAS = {}
+
+if DB_PROFILE == 'postgres':
+    _postgres = {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': config('DB_NAME', default='iticket'),
+        'USER': config('DB_USER', default='iticket'),
+        'PASSWORD': config('DB_PASSWORD', default=''),
+        'HOST': config('DB_HOST', default='localhost'),
+        'PORT': config('DB_PORT', default=5432, cast=int),
+        # Persistent connections: each worker thread reuses its connection
+        # for this many seconds instead of connecting per request
+        'CONN_MAX_AGE': config('DB_CONN_MAX_AGE', default=600, cast=int),
+        'CONN_HEALTH_CHECKS': True,
+        # Set when connecting through PgBouncer in transaction pooling mode,
+        # where a server-side cursor can't outlive its transaction
+        'DISABLE_SERVER_SIDE_CURSORS': config('DB_TRANSACTION_POOLING', default=False, cast=bool),
+        'OPTIONS': {
+            'connect_timeout': config('DB_CONNECT_TIMEOUT', default=5, cast=int),
+            'application_name': 'iticket',
+        },
+    }
+    DATABASES = {'default': _postgres}
+    # Comma separated hosts of streaming replicas, same port and credentials
+    for _number, _host in enumerate(config('DB_REPLICA_HOSTS', default='', cast=Csv()), 1):
+        DATABASES[f'replica{_number}'] = {**_postgres, 'HOST': _host, 'TEST': {'MIRROR': 'default'}}
+        DATABASE_REPLICAS.append(f'replica{_number}')
+elif DB_PROFILE in ('sqlite', 'sqlite-wal'):
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'db.sqlite3',
+        }
+    }
+    if DB_PROFILE == 'sqlite-wal':
+        SQLITE_PRAGMAS = SQLITE_WAL_PRAGMAS
+else:
+    raise ImproperlyConfigured(f'Unknown DB_PROFILE {DB_PROFILE!r}')
+
+DATABASE_ROUTERS = ['events.replicas.ReplicaRouter']
+# Read-your-writes: after a successful write, a user's catalogue reads stay
+# on the primary for this many seconds, longer than the replicas should lag
+REPLICA_PIN_SECONDS = config('REPLICA_PIN_SECONDS', default=5, cast=int)
+# Holds the pins; it must be shared by all workers when replicas are in use
+REPLICA_PIN_CACHE = 'default'
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -96,20 +163,29 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # DRF Configuration
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'users.authentication.StatelessJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticatedOrReadOnly',
     ),
+    'DEFAULT_RENDERER_CLASSES': (
+        'events.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
     'DEFAULT_THROTTLE_CLASSES': [
-        'rest_framework.throttling.AnonRateThrottle',
-        'rest_framework.throttling.UserRateThrottle'
+        'events.throttling.SlidingWindowThrottle',
+        'events.throttling.ScopedSlidingWindowThrottle',
     ],
+    # Every request counts against anon or user; catalogue reads and order creation
+    # (the views' throttle_scopes) against their own scope as well. Those default to
+    # the user rate, so they only bind once set lower
     'DEFAULT_THROTTLE_RATES': {
-        'anon': '50/hour',
-        'user': '200/hour'
+        'anon': config('THROTTLE_RATE_ANON', default='50/hour'),
+        'user': config('THROTTLE_RATE_USER', default='200/hour'),
+        'catalogue': config('THROTTLE_RATE_CATALOGUE', default='200/hour'),
+        'orders': config('THROTTLE_RATE_ORDERS', default='200/hour'),
     },
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    'DEFAULT_PAGINATION_CLASS': 'events.pagination.HybridPagination',
     'PAGE_SIZE': 10,
     'DEFAULT_FILTER_BACKENDS': [
         'django_filters.rest_framework.DjangoFilterBackend',
@@ -126,7 +202,114 @@ SIMPLE_JWT = {
     'REFRESH_TOKEN_LIFETIME': timedelta(days=7),
     'ROTATE_REFRESH_TOKENS': True,
     'BLACKLIST_AFTER_ROTATION': True,
+    'TOKEN_OBTAIN_SERIALIZER': 'users.serializers.TokenObtainPairSerializer',
+    'TOKEN_REFRESH_SERIALIZER': 'users.serializers.TokenRefreshSerializer',
+}
+# Seconds a user loaded by StatelessJWTAuthentication is reused, and how many are kept per process
+JWT_USER_CACHE_TTL = config('JWT_USER_CACHE_TTL', default=30, cast=int)
+JWT_USER_CACHE_SIZE = config('JWT_USER_CACHE_SIZE', default=10_000, cast=int)
+# Revoked tokens (users.revocations): the cache holding the version counter, which
+# should be shared by all workers, the seconds between reads of it, and the
+# seconds after which a worker reloads the set regardless
+JWT_REVOCATION_CACHE = 'default'
+JWT_REVOCATION_CHECK_INTERVAL = config('JWT_REVOCATION_CHECK_INTERVAL', default=2, cast=float)
+JWT_REVOCATION_RELOAD_INTERVAL = config('JWT_REVOCATION_RELOAD_INTERVAL', default=60, cast=float)
+
+# Cache Configuration
+# The catalogue cache holds public event responses; point it at Redis in production, e.g.
+# CATALOGUE_CACHE_BACKEND=django.core.cache.backends.redis.RedisCache
+# CATALOGUE_CACHE_LOCATION=redis://127.0.0.1:6379/1
+CACHES = {
+    # Also holds the replica pins (REPLICA_PIN_CACHE) and the token revocation version
+    # (JWT_REVOCATION_CACHE); point it at Redis when running several workers
+    'default': {
+        'BACKEND': config('DEFAULT_CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('DEFAULT_CACHE_LOCATION', default=''),
+    },
+    'catalogue': {
+        'BACKEND': config('CATALOGUE_CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CATALOGUE_CACHE_LOCATION', default='catalogue'),
+        'TIMEOUT': config('CATALOGUE_CACHE_TIMEOUT', default=300, cast=int),
+    },
+    # Waiting room state for CacheQueueBackend; point it at Redis in production
+    'waiting_room': {
+        'BACKEND': config('WAITING_ROOM_CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('WAITING_ROOM_CACHE_LOCATION', default='waiting-room'),
+    },
+    # Rate limit counters for CacheThrottleBackend; point it at Redis when running several workers
+    'throttle': {
+        'BACKEND': config('THROTTLE_CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('THROTTLE_CACHE_LOCATION', default='throttle'),
+    },
 }
+if CACHES['waiting_room']['BACKEND'].endswith('LocMemCache'):
+    # The local stand-in must not cull places out of a large queue
+    CACHES['waiting_room']['OPTIONS'] = {'MAX_ENTRIES': 1_000_000}
+if CACHES['throttle']['BACKEND'].endswith('LocMemCache'):
+    # Nor counters, which would hand their clients a fresh allowance
+    CACHES['throttle']['OPTIONS'] = {'MAX_ENTRIES': 1_000_000}
+
+# Serve the read-only catalogue endpoints with native async views
+# (events.async_views); iticket/asgi.py turns this on
+CATALOGUE_ASYNC_VIEWS = config('CATALOGUE_ASYNC_VIEWS', default=False, cast=bool)
+
+# Live availability stream (events.live), served when CATALOGUE_ASYNC_VIEWS is on
+# Seconds between checks of the watched events for changes
+LIVE_POLL_INTERVAL = config('LIVE_POLL_INTERVAL', default=0.5, cast=float)
+# Longest wait between checks while they keep failing (e.g. the cache is down)
+LIVE_MAX_BACKOFF = config('LIVE_MAX_BACKOFF', default=30, cast=float)
+# Seconds of silence before a keepalive comment is sent
+LIVE_HEARTBEAT = config('LIVE_HEARTBEAT', default=15, cast=int)
+# Open streams per worker; past this clients are told to poll instead
+LIVE_MAX_WATCHERS = config('LIVE_MAX_WATCHERS', default=20_000, cast=int)
+# Reconnect delay suggested to EventSource clients, in milliseconds
+LIVE_RETRY_MS = config('LIVE_RETRY_MS', default=3000, cast=int)
+
+# Serializers with FastSerializerMixin use compiled plans (events.fast_serializers)
+FAST_SERIALIZATION = config('FAST_SERIALIZATION', default=True, cast=bool)
+
+# Search
+# Dotted path to an events.search backend; empty picks one for the database vendor
+EVENT_SEARCH_BACKEND = config('EVENT_SEARCH_BACKEND', default='')
+
+# Orders
+# How long a pending order keeps its tickets before the expiry sweeper releases them
+ORDER_HOLD_TTL = timedelta(minutes=config('ORDER_HOLD_TTL_MINUTES', default=15, cast=int))
+# Most orders (or order ids) accepted by one call to the bulk order endpoints
+BULK_ORDER_LIMIT = config('BULK_ORDER_LIMIT', default=1000, cast=int)
+
+# Sharded ticket inventory (events.inventory): shards per ticket for the
+# admin action, and seconds between syncs of the cached totals after sales
+TICKET_SHARD_COUNT = config('TICKET_SHARD_COUNT', default=8, cast=int)
+TICKET_SHARD_SYNC_INTERVAL = config('TICKET_SHARD_SYNC_INTERVAL', default=1, cast=int)
+
+# Waiting room (events.waiting_room) for events with waiting_room set
+WAITING_ROOM_BACKEND = config('WAITING_ROOM_BACKEND', default='events.waiting_room.DatabaseQueueBackend')
+WAITING_ROOM_CACHE = 'waiting_room'
+# Buyers admitted per second and event
+WAITING_ROOM_RATE = config('WAITING_ROOM_RATE', default=50, cast=int)
+# Seconds an admission token stays valid after the buyer's turn comes
+WAITING_ROOM_TOKEN_TTL = config('WAITING_ROOM_TOKEN_TTL', default=600, cast=int)
+# Seconds CacheQueueBackend keeps queue state
+WAITING_ROOM_STATE_TTL = config('WAITING_ROOM_STATE_TTL', default=6 * 3600, cast=int)
+
+# Rate limits (events.throttling)
+THROTTLE_BACKEND = config('THROTTLE_BACKEND', default='events.throttling.CacheThrottleBackend')
+THROTTLE_CACHE = 'throttle'
+
+# Metrics (events.metrics)
+# Share of requests whose SQL queries and serialization are measured
+METRICS_SAMPLE_RATE = config('METRICS_SAMPLE_RATE', default=0.1, cast=float)
+# Addresses allowed to scrape /metrics
+METRICS_ALLOWED_IPS = config('METRICS_ALLOWED_IPS', default='127.0.0.1,::1', cast=Csv())
+
+# Request profiles (events.profiling), for requests with a signed X-Profile header
+# (manage.py profile_token) and PROFILE_SAMPLE_RATE of the others
+PROFILE_SAMPLE_RATE = config('PROFILE_SAMPLE_RATE', default=0.0, cast=float)
+# Seconds between stack samples; below sys.getswitchinterval() (5ms) samples bunch up
+PROFILE_INTERVAL = config('PROFILE_INTERVAL', default=0.005, cast=float)
+PROFILE_TOKEN_MAX_AGE = config('PROFILE_TOKEN_MAX_AGE', default=3600, cast=int)
+PROFILE_DIR = config('PROFILE_DIR', default=str(BASE_DIR / 'profiles'))
 
 # CORS Configuration
 CORS_ALLOWED_ORIGINS = [
@@ -2,10 +2,13 @@ from django.contrib import admin
 from django.urls import path, include
 from drf_spectacular.views import SpectacularAPIView, SpectacularRedocView, SpectacularSwaggerView
 
+from events.metrics import metrics_view
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/auth/', include('users.urls')),
     path('api/', include('events.urls')),
+    path('metrics', metrics_view, name='metrics'),
 
     # Spectacular URLs
     path('api/schema/', SpectacularAPIView.as_view(), name='schema'),
@@ -0,0 +1,15 @@
+from django.contrib import admin
+from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
+from django.contrib.auth.models import User
+from .revocations import deactivate_users
+
+admin.site.unregister(User)
+
+@admin.register(User)
+class UserAdmin(BaseUserAdmin):
+    actions = ['deactivate']
+
+    @admin.action(description='Deactivate selected users and revoke their tokens')
+    def deactivate(self, request, queryset):
+        # update() skips the signals that revoke on save (users.signals)
+        self.message_user(request, f'{deactivate_users(queryset)} user(s) deactivated')
@@ -0,0 +1,99 @@
+"""
+JWT authentication without a user query per request.
+
+simplejwt's ``JWTAuthentication`` reads the user row for every request.
+``StatelessJWTAuthentication`` instead trusts the claims the token was
+issued with (users.serializers adds username and is_staff) and hands the
+view a ``ClaimsUser``: id, pk, username and is_staff answer from the
+token, anything else (e.g. is_active, or assigning it to a foreign key)
+loads the full user through ``load_user``, which refuses inactive users.
+Loads are kept in a per-process LRU for settings.JWT_USER_CACHE_TTL
+seconds.
+
+Claims can't go stale silently: changing a user's password, active or
+staff flag revokes their tokens (users.signals, users.revocations), and
+every request checks the in-memory revocation set. ``QuerySet.update()``
+sends no signals, so bulk changes to those fields must revoke too, e.g.
+through ``users.revocations.deactivate_users``.
+"""
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.utils.functional import LazyObject
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from .revocations import revocations
+
+CLAIMS = ('username', 'is_staff')
+
+_users = OrderedDict()
+_lock = threading.Lock()
+
+
+def load_user(user_id):
+    """The active user ``user_id``, from the LRU when loaded in the last JWT_USER_CACHE_TTL seconds"""
+    now = time.monotonic()
+    with _lock:
+        cached = _users.get(user_id)
+        if cached is not None and now - cached[0] < settings.JWT_USER_CACHE_TTL:
+            _users.move_to_end(user_id)
+            # A copy each, so one request's changes don't leak into another's user
+            return copy.copy(cached[1])
+    try:
+        user = User.objects.get(pk=user_id)
+    except User.DoesNotExist:
+        raise AuthenticationFailed(_('User not found'), code='user_not_found')
+    if not user.is_active:
+        raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+    with _lock:
+        _users[user_id] = (now, user)
+        _users.move_to_end(user_id)
+        while len(_users) > settings.JWT_USER_CACHE_SIZE:
+            _users.popitem(last=False)
+    return copy.copy(user)
+
+
+def forget_user(user_id):
+    with _lock:
+        _users.pop(user_id, None)
+
+
+class ClaimsUser(LazyObject):
+    """The user of an access token; see the module docstring"""
+
+    def __init__(self, token):
+        super().__init__()
+        user_id = token[api_settings.USER_ID_CLAIM]
+        # In __dict__, so reading them doesn't set up the wrapped user
+        self.__dict__.update(
+            id=user_id, pk=user_id, username=token['username'], is_staff=token['is_staff'],
+            is_authenticated=True, is_anonymous=False,
+        )
+
+    def __bool__(self):
+        # IsAuthenticated tests bool(request.user), which LazyObject would set up for
+        return True
+
+    def _setup(self):
+        self._wrapped = load_user(self.__dict__['id'])
+
+
+class StatelessJWTAuthentication(JWTAuthentication):
+    """``JWTAuthentication`` that answers from the token's claims instead of a user query"""
+
+    def get_user(self, validated_token):
+        if api_settings.USER_ID_CLAIM not in validated_token:
+            raise InvalidToken(_('Token contained no recognizable user identification'))
+        if revocations.is_revoked(validated_token):
+            raise AuthenticationFailed(_('Token has been revoked'), code='token_revoked')
+        if not all(claim in validated_token for claim in CLAIMS):
+            # Issued before the claims were added
+            return load_user(validated_token[api_settings.USER_ID_CLAIM])
+        return ClaimsUser(validated_token)
@@ -0,0 +1,23 @@
+from django.contrib.auth.models import User
+from django.db import models
+
+
+class TokenRevocation(models.Model):
+    """
+    An access token taken back before it expires (``jti`` set), or every
+    token of ``user`` issued up to ``created_at`` (``jti`` empty). Rows can
+    go once ``expires_at`` has passed, as the tokens they name are dead then.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='token_revocations')
+    jti = models.CharField(max_length=255, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            # The revocation set loads the live rows
+            models.Index(fields=['expires_at'], name='token_revocation_expiry_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.user_id}: {self.jti or "all tokens"}'
@@ -0,0 +1,144 @@
+"""
+Revoked JWTs, checked on every authenticated request.
+
+Access tokens are accepted on their claims alone (users.authentication),
+so taking one back before it expires needs a list to check it against.
+``TokenRevocation`` rows are the source of truth. Each process keeps the
+live ones as a ``RevocationSet``: a set of revoked jtis and, per user, the
+time up to which all tokens are revoked. It reloads when the version
+counter in the cache named by settings.JWT_REVOCATION_CACHE moves, which
+it reads at most every settings.JWT_REVOCATION_CHECK_INTERVAL seconds,
+and at the latest every settings.JWT_REVOCATION_RELOAD_INTERVAL seconds,
+in case that cache isn't shared between workers.
+
+Refresh tokens also stay on simplejwt's blacklist (token_blacklist),
+which the refresh endpoint checks in the database.
+
+users.signals revokes a user's tokens when ``save()`` changes their
+password, active, staff or superuser flag. ``QuerySet.update()`` bypasses
+signals: code changing those fields in bulk calls ``revoke_users`` (or
+``deactivate_users``) itself, as the admin's deactivate action does.
+"""
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils import timezone
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import datetime_from_epoch
+
+from .models import TokenRevocation
+
+VERSION_KEY = 'jwt:revocations:version'
+
+
+def _cache():
+    return caches[settings.JWT_REVOCATION_CACHE]
+
+
+def _version():
+    cache = _cache()
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # Seeded from the clock: an evicted counter must not come back with a value already seen
+        cache.add(VERSION_KEY, time.time_ns(), timeout=None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def _bump():
+    try:
+        _cache().incr(VERSION_KEY)
+    except ValueError:
+        _cache().add(VERSION_KEY, time.time_ns(), timeout=None)
+
+
+class RevocationSet:
+    def __init__(self):
+        self.jtis = frozenset()
+        self.cutoffs = {}
+        self.version = None
+        self.checked_at = self.loaded_at = float('-inf')
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        now = time.monotonic()
+        if now - self.checked_at < settings.JWT_REVOCATION_CHECK_INTERVAL:
+            return
+        with self._lock:
+            if now - self.checked_at < settings.JWT_REVOCATION_CHECK_INTERVAL:
+                return
+            # Version first: a revocation committed during the load bumps it past this one
+            version = _version()
+            if version != self.version or now - self.loaded_at >= settings.JWT_REVOCATION_RELOAD_INTERVAL:
+                self.load()
+                self.version, self.loaded_at = version, now
+            self.checked_at = now
+
+    def load(self):
+        jtis, cutoffs = set(), {}
+        rows = TokenRevocation.objects.filter(expires_at__gt=timezone.now()).values_list('user_id', 'jti', 'created_at')
+        for user_id, jti, created_at in rows:
+            if jti:
+                jtis.add(jti)
+            else:
+                cutoffs[user_id] = max(cutoffs.get(user_id, 0), created_at.timestamp())
+        self.jtis, self.cutoffs = frozenset(jtis), cutoffs
+
+    def is_revoked(self, token):
+        self.refresh()
+        if token.get(api_settings.JTI_CLAIM) in self.jtis:
+            return True
+        cutoff = self.cutoffs.get(token.get(api_settings.USER_ID_CLAIM))
+        # iat is in whole seconds; a token from the second of the cutoff is revoked too
+        return cutoff is not None and token.get('iat', 0) <= cutoff
+
+
+revocations = RevocationSet()
+
+
+def _prune():
+    TokenRevocation.objects.filter(expires_at__lte=timezone.now()).delete()
+
+
+def revoke_token(token):
+    """Revoke one access token until it expires"""
+    _prune()
+    TokenRevocation.objects.create(
+        user_id=token[api_settings.USER_ID_CLAIM], jti=token[api_settings.JTI_CLAIM],
+        expires_at=datetime_from_epoch(token['exp']),
+    )
+    transaction.on_commit(_bump)
+
+
+def revoke_user(user):
+    """Revoke every token ``user`` holds, e.g. after a password change or losing staff status"""
+    revoke_users([user.pk])
+
+
+def revoke_users(user_ids):
+    """``revoke_user`` for many users, with one INSERT"""
+    if not user_ids:
+        return
+    _prune()
+    lifetime = max(api_settings.ACCESS_TOKEN_LIFETIME, api_settings.REFRESH_TOKEN_LIFETIME)
+    # One more second, as iat is rounded down
+    expires_at = timezone.now() + lifetime + timedelta(seconds=1)
+    TokenRevocation.objects.bulk_create([TokenRevocation(user_id=user_id, expires_at=expires_at) for user_id in user_ids])
+    transaction.on_commit(_bump)
+
+
+def deactivate_users(users):
+    """Deactivate a queryset of users with one UPDATE and revoke their tokens, which update() alone wouldn't"""
+    from .authentication import forget_user
+
+    with transaction.atomic():
+        user_ids = list(users.filter(is_active=True).values_list('pk', flat=True))
+        users.model.objects.filter(pk__in=user_ids).update(is_active=False)
+        revoke_users(user_ids)
+    for user_id in user_ids:
+        forget_user(user_id)
+    return len(user_ids)
@@ -0,0 +1,17 @@
+from drf_spectacular.contrib.rest_framework_simplejwt import (
+    SimpleJWTScheme, TokenObtainPairSerializerExtension, TokenRefreshSerializerExtension,
+)
+
+# drf-spectacular's simplejwt extensions match those exact classes, not subclasses
+
+
+class StatelessJWTScheme(SimpleJWTScheme):
+    target_class = 'users.authentication.StatelessJWTAuthentication'
+
+
+class ClaimsTokenObtainPairSerializerExtension(TokenObtainPairSerializerExtension):
+    target_class = 'users.serializers.TokenObtainPairSerializer'
+
+
+class RevocationTokenRefreshSerializerExtension(TokenRefreshSerializerExtension):
+    target_class = 'users.serializers.TokenRefreshSerializer'
@@ -0,0 +1,25 @@
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt import serializers as jwt_serializers
+from rest_framework_simplejwt.exceptions import TokenError
+
+from .revocations import revocations
+
+
+# Adds the claims StatelessJWTAuthentication answers from; access tokens copy them on refresh
+class TokenObtainPairSerializer(jwt_serializers.TokenObtainPairSerializer):
+
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        token['username'] = user.get_username()
+        token['is_staff'] = user.is_staff
+        return token
+
+
+# Refuses refresh tokens of users whose tokens were revoked
+class TokenRefreshSerializer(jwt_serializers.TokenRefreshSerializer):
+
+    def validate(self, attrs):
+        if revocations.is_revoked(self.token_class(attrs['refresh'])):
+            raise TokenError(_('Token is blacklisted'))
+        return super().validate(attrs)
@@ -0,0 +1,30 @@
+from django.contrib.auth.models import User
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from .authentication import forget_user
+from .revocations import revoke_user
+
+# Fields that tokens carry or that decide whether they should be honoured
+WATCHED = ('password', 'is_active', 'is_staff', 'is_superuser')
+
+
+@receiver(pre_save, sender=User)
+def remember_watched(sender, instance, update_fields=None, **kwargs):
+    if instance.pk is None or (update_fields is not None and not set(WATCHED) & set(update_fields)):
+        instance._watched = None
+        return
+    instance._watched = User.objects.filter(pk=instance.pk).values_list(*WATCHED).first()
+
+
+@receiver(post_save, sender=User)
+def user_changed(sender, instance, created, **kwargs):
+    forget_user(instance.pk)
+    previous = getattr(instance, '_watched', None)
+    if previous is not None and previous != tuple(getattr(instance, field) for field in WATCHED):
+        revoke_user(instance)
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    forget_user(instance.pk)
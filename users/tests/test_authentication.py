@@ -0,0 +1,139 @@
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.db.models import F
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.tokens import AccessToken
+
+from users import authentication
+from users.authentication import ClaimsUser, StatelessJWTAuthentication
+from users.models import TokenRevocation
+from users.revocations import deactivate_users, revoke_token
+from users.serializers import TokenObtainPairSerializer
+
+
+def access_token(user):
+    """An access token of ``user`` with the claims users.serializers adds"""
+    return TokenObtainPairSerializer.get_token(user).access_token
+
+
+# Check the revocation version on every request
+@override_settings(JWT_REVOCATION_CHECK_INTERVAL=0)
+class AuthenticationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('alice', email='alice@example.com', password='Str0ng-pass!x')
+
+    def setUp(self):
+        caches['default'].clear()
+        authentication._users.clear()
+
+    def get(self, token):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        return client.get(reverse('order-list'))
+
+    def test_claims_answer_without_a_query(self):
+        token = access_token(self.user)
+        StatelessJWTAuthentication().get_user(token)
+        with self.assertNumQueries(0):
+            user = StatelessJWTAuthentication().get_user(token)
+            self.assertIsInstance(user, ClaimsUser)
+            self.assertTrue(user)
+            self.assertEqual((user.id, user.username, user.is_staff), (self.user.id, 'alice', False))
+
+    def test_other_fields_load_the_user_once(self):
+        token, later = access_token(self.user), access_token(self.user)
+        user = StatelessJWTAuthentication().get_user(token)
+        with self.assertNumQueries(1):
+            self.assertEqual(user.email, 'alice@example.com')
+            self.assertEqual(user.email, 'alice@example.com')
+        # Later requests get it from the LRU
+        with self.assertNumQueries(0):
+            self.assertEqual(StatelessJWTAuthentication().get_user(later).email, 'alice@example.com')
+
+    def test_token_without_claims_loads_the_user(self):
+        user = StatelessJWTAuthentication().get_user(AccessToken.for_user(self.user))
+        self.assertIsInstance(user, User)
+        self.assertEqual(self.get(AccessToken.for_user(self.user)).status_code, 200)
+
+    def test_revoked_token_rejected(self):
+        token, other = access_token(self.user), access_token(self.user)
+        self.assertEqual(self.get(token).status_code, 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            revoke_token(token)
+        self.assertEqual(self.get(token).status_code, 401)
+        self.assertEqual(self.get(other).status_code, 200)
+
+    def test_logout_revokes_the_access_token(self):
+        refresh = TokenObtainPairSerializer.get_token(self.user)
+        # Each read of access_token makes a new one
+        access = refresh.access_token
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+        with self.captureOnCommitCallbacks(execute=True):
+            response = client.post(reverse('token-blacklist'), {'refresh': str(refresh)}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.get(access).status_code, 401)
+
+    def test_password_change_revokes_earlier_tokens(self):
+        token = access_token(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.set_password('An0ther-pass!y')
+            self.user.save()
+        self.assertEqual(self.get(token).status_code, 401)
+
+    def test_tokens_after_the_cutoff_accepted(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.set_password('An0ther-pass!y')
+            self.user.save()
+        # Tokens are stamped in whole seconds: move the change back rather than wait for the next one
+        TokenRevocation.objects.update(created_at=F('created_at') - timedelta(seconds=2))
+        self.assertEqual(self.get(access_token(self.user)).status_code, 200)
+
+    def test_unrelated_save_keeps_tokens(self):
+        token = access_token(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.first_name = 'Alice'
+            self.user.save()
+        self.assertEqual(self.get(token).status_code, 200)
+
+    def test_deactivated_user_rejected(self):
+        token = access_token(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_active = False
+            self.user.save()
+        self.assertEqual(self.get(token).status_code, 401)
+        response = APIClient().post(
+            reverse('token-obtain-pair'), {'username': 'alice', 'password': 'Str0ng-pass!x'}, format='json',
+        )
+        self.assertEqual(response.status_code, 401)
+
+    def test_bulk_deactivation_revokes(self):
+        token = access_token(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(deactivate_users(User.objects.filter(pk=self.user.pk)), 1)
+        self.assertEqual(self.get(token).status_code, 401)
+
+    def test_is_active_comes_from_the_user(self):
+        user = StatelessJWTAuthentication().get_user(access_token(self.user))
+        self.assertNotIn('is_active', user.__dict__)
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        with self.assertRaises(AuthenticationFailed):
+            user.is_active
+
+    def test_admin_deactivation_revokes(self):
+        token = access_token(self.user)
+        self.client.force_login(User.objects.create_superuser('admin', password='x'))
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                reverse('admin:auth_user_changelist'), {'action': 'deactivate', '_selected_action': [self.user.pk]},
+            )
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(User.objects.get(pk=self.user.pk).is_active)
+        self.assertEqual(self.get(token).status_code, 401)
@@ -2,9 +2,23 @@ from rest_framework import generics, status
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny
 from django.contrib.auth.models import User
+from rest_framework_simplejwt.views import TokenBlacklistView
 from events.serializers import UserRegistrationSerializer
+from .authentication import StatelessJWTAuthentication
+from .revocations import revoke_token
 
 class UserRegistrationView(generics.CreateAPIView):
     queryset = User.objects.all()
     permission_classes = [AllowAny]
-    serializer_class = UserRegistrationSerializer
\ No newline at end of file
+    serializer_class = UserRegistrationSerializer
+
+
+class LogoutView(TokenBlacklistView):
+    """Blacklist the refresh token sent, and revoke the access token the request is made with"""
+    authentication_classes = [StatelessJWTAuthentication]
+
+    def post(self, request, *args, **kwargs):
+        response = super().post(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK and request.auth is not None:
+            revoke_token(request.auth)
+        return response
\ No newline at end of file